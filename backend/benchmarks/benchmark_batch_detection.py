@@ -0,0 +1,96 @@
+"""
+Batch Detection Benchmark
+Throughput of the /detect-disease/batch pipeline against the single-image path
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_batch_detection --images 500
+    python -m benchmarks.benchmark_batch_detection --images 500 --random-weights
+
+The single-image path decodes and predicts one photo at a time, as 500 separate
+/detect-disease calls would. The batch path is stream_batch_detection, the code
+behind /detect-disease/batch, with a parallel decode pool and batched inference.
+"""
+
+import argparse
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from model_loader import decode_image  # noqa: E402
+from services.batch_detection import stream_batch_detection  # noqa: E402
+from benchmarks.benchmark_batching import build_detector  # noqa: E402
+
+
+def make_jpegs(count: int, width: int = 1600, height: int = 1200):
+    """Distinct synthetic photos encoded as JPEG"""
+    rng = np.random.default_rng(0)
+    base = np.linspace(0, 255, width * height * 3, dtype=np.float32).reshape(height, width, 3)
+    entries = []
+    for index in range(count):
+        pixels = np.clip(base + rng.integers(-20, 20), 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+        entries.append((f"leaf_{index:04d}.jpg", buffer.getvalue()))
+    return entries
+
+
+def single_path(detector, entries) -> float:
+    start = time.perf_counter()
+    for _, data in entries:
+        detector.predict(decode_image(data))
+    return time.perf_counter() - start
+
+
+async def batch_path(detector, entries, batch_size: int, decode_workers: int) -> float:
+    loop = asyncio.get_running_loop()
+    inference_pool = ThreadPoolExecutor(max_workers=1)
+    decode_pool = ThreadPoolExecutor(max_workers=decode_workers)
+
+    async def predict_batch(images):
+        return await loop.run_in_executor(inference_pool, detector.predict_batch, images)
+
+    start = time.perf_counter()
+    count = 0
+    async for _ in stream_batch_detection(entries, decode_image, predict_batch, decode_pool, batch_size):
+        count += 1
+    elapsed = time.perf_counter() - start
+    inference_pool.shutdown()
+    decode_pool.shutdown()
+    assert count == len(entries)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch vs single-image disease detection throughput")
+    parser.add_argument("--images", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--decode-workers", type=int, default=8)
+    parser.add_argument("--random-weights", action="store_true",
+                        help="Use untrained ResNet50s instead of the checkpoints in models/")
+    args = parser.parse_args()
+
+    detector = build_detector(args.random_weights)
+    entries = make_jpegs(args.images)
+    detector.predict_batch([decode_image(entries[0][1])])  # Load and warm up
+
+    single = single_path(detector, entries)
+    batch = asyncio.run(batch_path(detector, entries, args.batch_size, args.decode_workers))
+
+    print(f"\n{args.images} images")
+    print(f"{'path':<8} {'seconds':>9} {'img/s':>8}")
+    print(f"{'single':<8} {single:>9.1f} {args.images / single:>8.2f}")
+    print(f"{'batch':<8} {batch:>9.1f} {args.images / batch:>8.2f}")
+    print(f"speedup  {single / batch:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Batch Crop Recommendation Benchmark
+Compares N single-row /predict scorings with one vectorized /batch-predict scoring
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_batch_predict --samples 1000 2000 5000
+
+Samples are drawn from the feature ranges of data/Crop_recommendation.csv. The
+single-row path repeats what /predict does per request (predict, predict_proba
+and an argsort); the batch path is CropScorer.score's single probability pass
+plus argpartition.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.crop_scoring import SOIL_FEATURES, CropScorer  # noqa: E402
+from services.weight_storage import load_joblib  # noqa: E402
+
+MODEL_PATH = BACKEND_DIR.parent / "models" / "crop_model.pkl"
+DATA_PATH = BACKEND_DIR.parent / "data" / "Crop_recommendation.csv"
+FEATURES = list(SOIL_FEATURES)
+
+
+def single_row(model, row: np.ndarray):
+    """The per-request /predict work"""
+    input_data = row.reshape(1, -1)
+    prediction = model.predict(input_data)[0]
+    probabilities = model.predict_proba(input_data)[0]
+    classes = model.classes_
+    confidence = float(probabilities[np.where(classes == prediction)[0][0]])
+    top_indices = np.argsort(probabilities)[-5:][::-1]
+    return confidence, {str(classes[i]): float(probabilities[i]) for i in top_indices}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single vs batch crop recommendation")
+    parser.add_argument("--samples", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--single-limit", type=int, default=200,
+                        help="Time at most this many single calls and extrapolate")
+    args = parser.parse_args()
+
+    model = load_joblib(MODEL_PATH)
+    scorer = CropScorer(model)
+    data = pd.read_csv(DATA_PATH)[FEATURES]
+    rng = np.random.default_rng(0)
+    low, high = data.min().to_numpy(), data.max().to_numpy()
+
+    # Warm up both paths
+    warm = rng.uniform(low, high, (8, len(FEATURES)))
+    single_row(model, warm[0])
+    scorer.score(warm)
+
+    print(f"{'samples':>8} {'single ms':>10} {'batch ms':>9} {'speedup':>8} {'single calls':>13}")
+    for count in args.samples:
+        features = rng.uniform(low, high, (count, len(FEATURES)))
+
+        timed = min(count, args.single_limit)
+        start = time.perf_counter()
+        for row in features[:timed]:
+            single_row(model, row)
+        single_ms = (time.perf_counter() - start) * 1000 * count / timed
+        per_call_ms = single_ms / count
+
+        start = time.perf_counter()
+        scorer.score(features)
+        batch_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{count:>8} {single_ms:>10.1f} {batch_ms:>9.1f} {single_ms / batch_ms:>7.1f}x "
+              f"{batch_ms / per_call_ms:>13.1f}")
+    print("\n'single calls' is the batch time expressed in single /predict scorings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Micro-Batching Benchmark for MultiModelDetector
+Reports latency and throughput of the disease detectors at several batch sizes
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_batching --batch-sizes 1 2 4 8 16 --images 64
+    python -m benchmarks.benchmark_batching --random-weights --concurrency 32
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from model_loader import (  # noqa: E402
+    PlantDocModelLoader, MaizeModelLoader, RiceModelLoader, MultiModelDetector
+)
+from services.inference_batcher import InferenceBatcher  # noqa: E402
+
+MODELS_DIR = BACKEND_DIR.parent / "models"
+
+
+def build_detector(random_weights: bool) -> MultiModelDetector:
+    """Build the three-model detector, optionally with untrained ResNet50 weights"""
+    loaders = [
+        PlantDocModelLoader(str(MODELS_DIR / "plantdoc_resnet50_finetuned.pth")),
+        MaizeModelLoader(str(MODELS_DIR / "maize_resnet50.pth")),
+        RiceModelLoader(str(MODELS_DIR / "rice_resnet50.pth")),
+    ]
+    if random_weights:
+        from torch import nn
+        from torchvision import models
+
+        for loader in loaders:
+            model = models.resnet50(weights=None)
+            model.fc = nn.Linear(model.fc.in_features, len(loader.classes))
+            loader._model = model.to(loader.device).eval()
+    return MultiModelDetector(*loaders)
+
+
+def make_images(count: int, size: int = 640) -> List[Image.Image]:
+    """Synthetic RGB photos; content does not affect ResNet50 cost"""
+    rng = np.random.default_rng(0)
+    return [
+        Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+        for _ in range(count)
+    ]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def bench_direct(detector: MultiModelDetector, images: List[Image.Image],
+                 batch_size: int) -> Dict:
+    """Call predict_batch directly with fixed-size batches"""
+    batch_latencies = []
+    start = time.perf_counter()
+    for offset in range(0, len(images), batch_size):
+        chunk = images[offset:offset + batch_size]
+        t0 = time.perf_counter()
+        detector.predict_batch(chunk)
+        batch_latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    return {
+        'batch_size': batch_size,
+        'batch_p50_ms': percentile(batch_latencies, 50),
+        'batch_p95_ms': percentile(batch_latencies, 95),
+        'per_image_ms': elapsed * 1000 / len(images),
+        'images_per_sec': len(images) / elapsed
+    }
+
+
+def bench_batcher(detector: MultiModelDetector, images: List[Image.Image],
+                  max_batch_size: int, max_wait_ms: float, concurrency: int) -> Dict:
+    """Drive the InferenceBatcher from concurrent clients, like the API does"""
+    batcher = InferenceBatcher(
+        detector.predict_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms
+    )
+    batcher.start()
+
+    def one_request(image):
+        t0 = time.perf_counter()
+        batcher.submit(image).result()
+        return (time.perf_counter() - t0) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one_request, images))
+    elapsed = time.perf_counter() - start
+    stats = batcher.stats()
+    batcher.stop()
+    return {
+        'batch_size': max_batch_size,
+        'request_p50_ms': percentile(latencies, 50),
+        'request_p99_ms': percentile(latencies, 99),
+        'mean_batch_size': stats['mean_batch_size'],
+        'images_per_sec': len(images) / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--random-weights", action="store_true",
+                        help="Use untrained ResNet50s instead of the checkpoints in models/")
+    args = parser.parse_args()
+
+    detector = build_detector(args.random_weights)
+    images = make_images(args.images)
+
+    # Warm up: load weights and let the allocator settle
+    detector.predict_batch(images[:2])
+
+    print("\nDirect predict_batch")
+    print(f"{'batch':>6} {'p50 ms':>10} {'p95 ms':>10} {'ms/img':>10} {'img/s':>10}")
+    for batch_size in args.batch_sizes:
+        r = bench_direct(detector, images, batch_size)
+        print(f"{r['batch_size']:>6} {r['batch_p50_ms']:>10.1f} {r['batch_p95_ms']:>10.1f} "
+              f"{r['per_image_ms']:>10.1f} {r['images_per_sec']:>10.2f}")
+
+    print(f"\nInferenceBatcher with {args.concurrency} concurrent clients, "
+          f"max_wait_ms={args.max_wait_ms}")
+    print(f"{'max bs':>6} {'p50 ms':>10} {'p99 ms':>10} {'mean bs':>10} {'img/s':>10}")
+    for batch_size in args.batch_sizes:
+        r = bench_batcher(detector, images, batch_size, args.max_wait_ms, args.concurrency)
+        print(f"{r['batch_size']:>6} {r['request_p50_ms']:>10.1f} {r['request_p99_ms']:>10.1f} "
+              f"{r['mean_batch_size']:>10.2f} {r['images_per_sec']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
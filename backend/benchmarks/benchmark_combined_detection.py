@@ -0,0 +1,114 @@
+"""
+Combined Detection Benchmark
+Compares sequential and concurrent execution of the three disease models plus the pest model
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_combined_detection --requests 20
+    python -m benchmarks.benchmark_combined_detection --random-weights --skip-pest
+
+Sequential mode gives every model all cores and runs them one after another, as
+/detect-combined did before; concurrent mode partitions the intra-op threads and
+runs the models side by side on the model pool. Per-model latencies are reported
+so the concurrent figure can be compared with the slowest single model.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import torch
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from model_loader import (  # noqa: E402
+    CONCURRENT_MODELS, TORCH_THREADS_PER_MODEL, PestModelLoader, preprocess_for_models
+)
+from benchmarks.benchmark_batching import build_detector, make_images, percentile  # noqa: E402
+
+MODELS_DIR = BACKEND_DIR.parent / "models"
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_models(detector, pest, images) -> Dict[str, float]:
+    """p50 latency of each model on its own"""
+    latencies = {}
+    for key, model in detector.models.items():
+        runs = [
+            timed(model.predict_tensor, preprocess_for_models(image, [model])[model.transform_signature])
+            for image in images
+        ]
+        latencies[key] = percentile(runs, 50)
+    if pest is not None:
+        latencies['pest'] = percentile([timed(pest.predict, image) for image in images], 50)
+    return latencies
+
+
+def bench_combined(detector, pest, images, pool: ThreadPoolExecutor = None) -> List[float]:
+    """End-to-end latency of disease + pest detection per image"""
+    latencies = []
+    for image in images:
+        start = time.perf_counter()
+        if pool is None:
+            detector.predict(image)
+            if pest is not None:
+                pest.predict(image)
+        else:
+            pest_future = pool.submit(pest.predict, image) if pest is not None else None
+            detector.predict(image)
+            if pest_future is not None:
+                pest_future.result()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs concurrent /detect-combined inference")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--random-weights", action="store_true", help="Use untrained ResNet50s")
+    parser.add_argument("--skip-pest", action="store_true", help="Leave out the legacy pest model")
+    parser.add_argument("--threads-per-model", type=int, default=TORCH_THREADS_PER_MODEL)
+    args = parser.parse_args()
+
+    detector = build_detector(args.random_weights)
+    pest = None if args.skip_pest else PestModelLoader(str(MODELS_DIR / "resnet50_0.497.pkl"))
+    images = make_images(args.requests)
+
+    # Warm every model once so loading is not measured
+    detector.predict(images[0])
+    if pest is not None:
+        pest.predict(images[0])
+
+    cores = os.cpu_count() or 1
+    print(f"{cores} cores, {args.threads_per_model} intra-op threads per model in concurrent mode\n")
+
+    torch.set_num_threads(cores)
+    model_latencies = bench_models(detector, pest, images[:5])
+    sequential = bench_combined(detector, pest, images)
+
+    torch.set_num_threads(args.threads_per_model)
+    with ThreadPoolExecutor(max_workers=CONCURRENT_MODELS) as model_pool, \
+            ThreadPoolExecutor(max_workers=1) as pest_pool:
+        detector.pool = model_pool
+        concurrent = bench_combined(detector, pest, images, pool=pest_pool)
+
+    for key, latency in model_latencies.items():
+        print(f"{key:<10} alone (all cores)  p50 {latency:8.1f} ms")
+    print(f"{'sum of models':<29} {sum(model_latencies.values()):8.1f} ms")
+    print(f"{'slowest model':<29} {max(model_latencies.values()):8.1f} ms\n")
+    print(f"{'mode':<12} {'p50 ms':>9} {'p95 ms':>9}")
+    for mode, latencies in (('sequential', sequential), ('concurrent', concurrent)):
+        print(f"{mode:<12} {percentile(latencies, 50):>9.1f} {percentile(latencies, 95):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
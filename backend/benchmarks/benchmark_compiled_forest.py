@@ -0,0 +1,86 @@
+"""
+Compiled Forest Benchmark
+Cold load, single-row latency and batch throughput of the crop model: sklearn pickle vs compiled forest
+
+Usage (from the backend directory):
+    python -m services.compiled_forest compile
+    python -m benchmarks.benchmark_compiled_forest --batch-sizes 1 32 256 5000
+
+Both are scored through CropScorer, as /predict and /batch-predict use them, and
+the probabilities are compared bit for bit.
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.compiled_forest import CompiledForest, compiled_forest_path  # noqa: E402
+from services.crop_scoring import SOIL_FEATURES, CropScorer  # noqa: E402
+from services.weight_storage import load_joblib  # noqa: E402
+
+MODEL_PATH = BACKEND_DIR.parent / "models" / "crop_model.pkl"
+DATA_PATH = BACKEND_DIR.parent / "data" / "Crop_recommendation.csv"
+
+
+def timed_ms(fn, repeats: int) -> np.ndarray:
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings[i] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled crop forest against sklearn")
+    parser.add_argument("--model", default=str(MODEL_PATH))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256, 5000])
+    parser.add_argument("--requests", type=int, default=1000, help="Single-row calls for p50/p99")
+    args = parser.parse_args()
+
+    forest_path = compiled_forest_path(args.model)
+    if not forest_path.exists():
+        print(f"⚠️ {forest_path.name} not found; run python -m services.compiled_forest compile first")
+        return 1
+
+    load_pickle = timed_ms(lambda: load_joblib(args.model), 3)
+    load_forest = timed_ms(lambda: CompiledForest.load(forest_path), 3)
+    print(f"cold load: pickle {np.median(load_pickle):.1f} ms, compiled {np.median(load_forest):.2f} ms\n")
+
+    sklearn_scorer = CropScorer(load_joblib(args.model))
+    compiled_scorer = CropScorer(CompiledForest.load(forest_path))
+
+    data = pd.read_csv(DATA_PATH)[list(SOIL_FEATURES)]
+    rng = np.random.default_rng(0)
+    samples = rng.uniform(data.min().to_numpy(), data.max().to_numpy(), (max(args.batch_sizes + [args.requests]), 7))
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    identical = np.array_equal(sklearn_scorer.predict_proba(samples), compiled_scorer.predict_proba(samples))
+    print(f"bit-identical probabilities on {len(samples)} rows: {identical}\n")
+
+    print(f"{'single row':<12} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, scorer in (('sklearn', sklearn_scorer), ('compiled', compiled_scorer)):
+        rows = iter(samples[:args.requests].tolist())
+        timings = timed_ms(lambda: scorer.score_one(next(rows)), args.requests)
+        print(f"{name:<12} {np.percentile(timings, 50):>8.3f} {np.percentile(timings, 99):>8.3f}")
+
+    print(f"\n{'batch':>6} {'sklearn ms':>11} {'compiled ms':>12}")
+    for size in args.batch_sizes:
+        batch = samples[:size]
+        repeats = 20 if size <= 256 else 3
+        sk = np.median(timed_ms(lambda: sklearn_scorer.score(batch), repeats))
+        compiled = np.median(timed_ms(lambda: compiled_scorer.score(batch), repeats))
+        print(f"{size:>6} {sk:>11.2f} {compiled:>12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
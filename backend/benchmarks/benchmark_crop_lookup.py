@@ -0,0 +1,92 @@
+"""
+Crop Lookup Benchmark
+Hit rate and p50/p99 latency of /predict scoring with the quantized-reading LRU
+(and optionally the suitability grid) vs the forest alone
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_crop_lookup --requests 5000 --district-readings 2000
+    python -m benchmarks.benchmark_crop_lookup --grid
+
+Traffic is simulated as one district: a pool of soil card readings (training
+rows plus noise, at card precision) requested with Zipf-like popularity.
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.compiled_forest import load_compiled_forest  # noqa: E402
+from services.crop_lookup import CropLookup, SuitabilityGrid  # noqa: E402
+from services.crop_scoring import SOIL_FEATURES, CropScorer  # noqa: E402
+from services.result_cache import DetectionResultCache, model_version  # noqa: E402
+from services.weight_storage import load_joblib  # noqa: E402
+
+MODEL_PATH = BACKEND_DIR.parent / "models" / "crop_model.pkl"
+DATA_PATH = BACKEND_DIR.parent / "data" / "Crop_recommendation.csv"
+
+
+def district_traffic(data: np.ndarray, readings: int, requests: int, rng) -> np.ndarray:
+    """Requests drawn from `readings` distinct soil card values with Zipf(1.1) popularity"""
+    base = data[rng.integers(0, len(data), readings)]
+    noisy = base + rng.normal(0, 0.02, base.shape) * (data.max(axis=0) - data.min(axis=0))
+    pool = np.column_stack([np.round(noisy[:, :3]), np.round(noisy[:, 3], 1), np.round(noisy[:, 4]),
+                            np.round(noisy[:, 5], 1), np.round(noisy[:, 6])])
+    popularity = 1.0 / np.arange(1, readings + 1) ** 1.1
+    return pool[rng.choice(readings, requests, p=popularity / popularity.sum())]
+
+
+def latencies_ms(fn, rows) -> np.ndarray:
+    timings = np.empty(len(rows))
+    for i, values in enumerate(rows):
+        start = time.perf_counter()
+        fn(values)
+        timings[i] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crop lookup cache")
+    parser.add_argument("--model", default=str(MODEL_PATH))
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--district-readings", type=int, default=2000)
+    parser.add_argument("--cache-size", type=int, default=4096)
+    parser.add_argument("--grid", action="store_true", help="Also use the grid built by build-grid")
+    args = parser.parse_args()
+
+    model = load_compiled_forest(args.model) or load_joblib(args.model)
+    scorer = CropScorer(model)
+    version = model_version(args.model)
+    grid = SuitabilityGrid.load(args.model, version) if args.grid else None
+    if args.grid and grid is None:
+        print("⚠️ No grid for this model; run python -m services.crop_lookup build-grid first")
+        return 1
+    lookup = CropLookup(scorer, DetectionResultCache(max_entries=args.cache_size, ttl_seconds=86400),
+                        version, grid=grid)
+
+    data = pd.read_csv(DATA_PATH)[list(SOIL_FEATURES)].to_numpy(dtype=np.float64)
+    rows = district_traffic(data, args.district_readings, args.requests, np.random.default_rng(0)).tolist()
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    print(f"{type(model).__name__}, {args.requests} requests over {args.district_readings} readings\n")
+    print(f"{'path':<12} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, fn in (('forest', scorer.score_one), ('lookup', lookup.score_one)):
+        timings = latencies_ms(fn, rows)
+        print(f"{name:<12} {np.percentile(timings, 50):>8.3f} {np.percentile(timings, 99):>8.3f} "
+              f"{timings.mean():>8.3f}")
+
+    stats = lookup.stats()
+    print(f"\ncache hit rate {stats['cache']['hit_rate']:.1%}, grid answers {stats['grid']['answers']}, "
+          f"answered without the forest {stats['answered_without_forest']:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
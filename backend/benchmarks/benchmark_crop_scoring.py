@@ -0,0 +1,88 @@
+"""
+Crop Scoring Microbenchmark
+p50/p99 latency of one /predict scoring: the original predict + predict_proba path vs CropScorer
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_crop_scoring --requests 2000
+
+Samples are drawn from the feature ranges of data/Crop_recommendation.csv. Both
+paths are also checked for identical labels, confidences and top-5 lists.
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.crop_scoring import SOIL_FEATURES, CropScorer  # noqa: E402
+from services.weight_storage import load_joblib  # noqa: E402
+
+MODEL_PATH = BACKEND_DIR.parent / "models" / "crop_model.pkl"
+DATA_PATH = BACKEND_DIR.parent / "data" / "Crop_recommendation.csv"
+
+
+def legacy_predict(model, values) -> Dict:
+    """The pre-refactor /predict body"""
+    input_data = np.array([values])
+    prediction = model.predict(input_data)[0]
+    probabilities = model.predict_proba(input_data)[0]
+    classes = model.classes_
+    confidence = float(probabilities[np.where(classes == prediction)[0][0]])
+    top_indices = np.argsort(probabilities)[-5:][::-1]
+    return {'crop': str(prediction), 'confidence': confidence,
+            'all_predictions': {str(classes[i]): float(probabilities[i]) for i in top_indices}}
+
+
+def latencies_ms(fn: Callable, samples: List[List[float]]) -> np.ndarray:
+    timings = np.empty(len(samples))
+    for i, values in enumerate(samples):
+        start = time.perf_counter()
+        fn(values)
+        timings[i] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-sample crop scoring")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    model = load_joblib(MODEL_PATH)
+    scorer = CropScorer(model)
+    data = pd.read_csv(DATA_PATH)[list(SOIL_FEATURES)]
+    rng = np.random.default_rng(0)
+    samples = rng.uniform(data.min().to_numpy(), data.max().to_numpy(), (args.requests, len(SOIL_FEATURES))).tolist()
+
+    # The legacy path warns about feature names on every call when the model was fitted on a DataFrame
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    mismatches = 0
+    for values in samples[:200]:
+        before, after = legacy_predict(model, values), scorer.score_one(values)
+        same_top = list(before['all_predictions'].values()) == list(after['all_predictions'].values())
+        if before['crop'] != after['crop'] or before['confidence'] != after['confidence'] or not same_top:
+            mismatches += 1
+    print(f"Direct tree walk: {scorer.direct_trees}; mismatches in 200 samples: {mismatches}\n")
+
+    for warm in samples[:20]:
+        legacy_predict(model, warm)
+        scorer.score_one(warm)
+
+    print(f"{'path':<22} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, fn in (('predict + predict_proba', lambda v: legacy_predict(model, v)),
+                     ('CropScorer', scorer.score_one)):
+        timings = latencies_ms(fn, samples)
+        print(f"{name:<22} {np.percentile(timings, 50):>8.2f} {np.percentile(timings, 99):>8.2f} "
+              f"{timings.mean():>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Image Decode Benchmark
+Compares full JPEG decode against the draft-mode decode used by load_image_from_bytes
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_image_decode --sizes 1600x1200 4000x3000 4624x3468
+
+Reports decode time (median of several runs) and the size of the decoded pixel
+buffer, which dominates peak memory per request.
+"""
+
+import argparse
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from model_loader import decode_image  # noqa: E402
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    """Smooth synthetic photo; noise would make the JPEG unrealistically large"""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def time_decode(fn, data: bytes, runs: int):
+    timings = []
+    image = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        image = fn(data)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), image
+
+
+def full_decode(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs draft-mode JPEG decode")
+    parser.add_argument("--sizes", nargs="+", default=["1600x1200", "4000x3000", "4624x3468"])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"\n{'photo':>11} {'jpeg MB':>8} {'full ms':>8} {'full MB':>8} "
+          f"{'draft ms':>9} {'draft MB':>9} {'draft size':>11}")
+    for spec in args.sizes:
+        width, height = (int(v) for v in spec.split("x"))
+        data = make_jpeg(width, height)
+        full_ms, full = time_decode(full_decode, data, args.runs)
+        draft_ms, draft = time_decode(decode_image, data, args.runs)
+        full_mb = full.width * full.height * len(full.getbands()) / 1e6
+        draft_mb = draft.width * draft.height * len(draft.getbands()) / 1e6
+        print(f"{spec:>11} {len(data) / 1e6:>8.2f} {full_ms:>8.1f} {full_mb:>8.1f} "
+              f"{draft_ms:>9.1f} {draft_mb:>9.2f} {draft.width}x{draft.height:>5}")
+
+
+if __name__ == "__main__":
+    main()
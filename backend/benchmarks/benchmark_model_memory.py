@@ -0,0 +1,102 @@
+"""
+Model Memory Benchmark
+Measures cold-start load time and per-worker memory with copied vs memory-mapped weights
+
+Usage (from the backend directory):
+    python -m services.weight_storage convert       # once, creates *.weights.pt
+    python -m benchmarks.benchmark_model_memory --workers 4
+
+Each worker process loads the three ResNet50 disease models plus crop_model.pkl,
+then waits until every worker has finished loading so the numbers reflect pages
+shared between workers. PSS (proportional set size) splits shared pages between
+the processes that map them, so it is the per-worker cost to compare.
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+MODELS_DIR = BACKEND_DIR.parent / "models"
+RESNET_CHECKPOINTS = ["plantdoc_resnet50_finetuned.pth", "maize_resnet50.pth", "rice_resnet50.pth"]
+
+
+def memory_mb() -> Dict[str, float]:
+    """RSS and PSS of the current process from /proc (Linux only)"""
+    values = {'rss_mb': 0.0, 'pss_mb': 0.0}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    values['rss_mb'] = int(line.split()[1]) / 1024
+                elif line.startswith("Pss:"):
+                    values['pss_mb'] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+def worker(mode: str, barrier, results):
+    # Must be set before the loaders are imported; "copy" is the original behaviour
+    os.environ['SHARED_WEIGHTS'] = '1' if mode == "mmap" else '0'
+
+    import torch
+    from model_loader import PlantDocModelLoader, MaizeModelLoader, RiceModelLoader
+    from services.weight_storage import load_joblib
+
+    start = time.perf_counter()
+    loaders = [
+        PlantDocModelLoader(str(MODELS_DIR / RESNET_CHECKPOINTS[0])),
+        MaizeModelLoader(str(MODELS_DIR / RESNET_CHECKPOINTS[1])),
+        RiceModelLoader(str(MODELS_DIR / RESNET_CHECKPOINTS[2])),
+    ]
+    for loader in loaders:
+        loader.device = torch.device("cpu")
+        loader.get_model()
+    crop_model = load_joblib(MODELS_DIR / "crop_model.pkl")
+    load_seconds = time.perf_counter() - start
+
+    # Touch every weight once, as inference would
+    with torch.no_grad():
+        for loader in loaders:
+            loader.warmup()
+
+    barrier.wait()
+    results.put({'load_seconds': load_seconds, **memory_mb()})
+    barrier.wait()
+    del crop_model
+
+
+def measure(mode: str, workers: int) -> Dict[str, float]:
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(mode, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {key: sum(sample[key] for sample in samples) / workers for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare copied vs memory-mapped model weights")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"\n{args.workers} workers, averages per worker")
+    print(f"{'mode':<6} {'load s':>8} {'RSS MB':>9} {'PSS MB':>9}")
+    for mode in ("copy", "mmap"):
+        r = measure(mode, args.workers)
+        print(f"{mode:<6} {r['load_seconds']:>8.2f} {r['rss_mb']:>9.1f} {r['pss_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Near-Duplicate Index Benchmark
+Hit rate and false matches of the perceptual-hash index on simulated camera frames
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_near_duplicate --scenes 50 --frames 20
+    python -m benchmarks.benchmark_near_duplicate --method phash --inference-ms 180
+
+Each scene is a smooth synthetic "leaf" image; its frames are small random
+shifts, brightness changes and JPEG re-encodes of it, as a hand-held camera
+produces. For each distance the index is filled with the first frame of every
+scene, and the remaining frames are looked up: a hit on the right scene is a
+reuse, a hit on another scene is a false match. `--inference-ms` turns the hit
+count into an estimate of compute saved.
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.near_duplicate import HASH_METHODS, NearDuplicateIndex  # noqa: E402
+
+
+def make_scene(rng: np.random.Generator, size: int = 480) -> Image.Image:
+    """Low-frequency colour field with a few blotches, so hashes have structure to latch on to"""
+    coarse = rng.integers(0, 256, (6, 6, 3), dtype=np.uint8)
+    image = Image.fromarray(coarse).resize((size, size), Image.BICUBIC)
+    pixels = np.asarray(image).copy()
+    for _ in range(rng.integers(3, 8)):
+        y, x = rng.integers(0, size, 2)
+        radius = rng.integers(size // 20, size // 8)
+        yy, xx = np.ogrid[:size, :size]
+        pixels[(yy - y) ** 2 + (xx - x) ** 2 <= radius ** 2] = rng.integers(0, 256, 3)
+    return Image.fromarray(pixels)
+
+
+def jitter(scene: Image.Image, rng: np.random.Generator, max_shift: int, quality: int) -> Image.Image:
+    """A camera frame of the scene: shifted crop, brightness change, JPEG re-encode"""
+    width, height = scene.size
+    dx, dy = rng.integers(-max_shift, max_shift + 1, 2)
+    margin = max_shift
+    frame = scene.crop((margin + dx, margin + dy, width - margin + dx, height - margin + dy))
+    frame = ImageEnhance.Brightness(frame).enhance(float(rng.uniform(0.9, 1.1)))
+    buffer = io.BytesIO()
+    frame.save(buffer, format="JPEG", quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer).convert("RGB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate reuse on jittered frames")
+    parser.add_argument("--scenes", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=20, help="Frames per scene")
+    parser.add_argument("--max-shift", type=int, default=12, help="Maximum camera shift in pixels")
+    parser.add_argument("--quality", type=int, default=75, help="JPEG quality of the frames")
+    parser.add_argument("--method", choices=HASH_METHODS, default="dhash")
+    parser.add_argument("--distances", type=int, nargs="+", default=[0, 2, 4, 6, 8, 12])
+    parser.add_argument("--inference-ms", type=float, default=150.0, help="Assumed cost of one inference")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    scenes = [make_scene(rng) for _ in range(args.scenes)]
+    frames: List[List[Image.Image]] = [
+        [jitter(scene, rng, args.max_shift, args.quality) for _ in range(args.frames)] for scene in scenes
+    ]
+
+    probe = NearDuplicateIndex(method=args.method)
+    start = time.perf_counter()
+    hashes = [[probe.hash(frame) for frame in scene_frames] for scene_frames in frames]
+    hash_us = (time.perf_counter() - start) * 1e6 / (args.scenes * args.frames)
+    print(f"{args.scenes} scenes x {args.frames} frames, {args.method}, {hash_us:.0f} us per hash\n")
+
+    print(f"{'distance':>8} {'hit rate':>9} {'false':>7} {'saved s':>8} {'lookup us':>10}")
+    for distance in args.distances:
+        index = NearDuplicateIndex(max_entries=args.scenes, max_distance=distance, method=args.method)
+        for scene_id, scene_hashes in enumerate(hashes):
+            index.add("bench", scene_hashes[0], {'success': True, 'confidence': 1.0, 'scene': scene_id})
+
+        hits = false_matches = lookups = 0
+        start = time.perf_counter()
+        for scene_id, scene_hashes in enumerate(hashes):
+            for frame_hash in scene_hashes[1:]:
+                result = index.lookup("bench", frame_hash)
+                lookups += 1
+                if result is None:
+                    continue
+                if result['scene'] == scene_id:
+                    hits += 1
+                else:
+                    false_matches += 1
+        lookup_us = (time.perf_counter() - start) * 1e6 / max(lookups, 1)
+
+        saved_s = hits * args.inference_ms / 1000
+        print(f"{distance:>8} {hits / max(lookups, 1):>9.1%} {false_matches:>7} {saved_s:>8.1f} {lookup_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
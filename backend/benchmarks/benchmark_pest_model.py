@@ -0,0 +1,87 @@
+"""
+Pest Model Benchmark
+Compares the original float64 predict + predict_proba path with the batched float32 path
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_pest_model --images 64 --batch-sizes 1 8 32
+
+Reports CPU time per image and peak Python-tracked allocation per call.
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from model_loader import PestModelLoader  # noqa: E402
+from benchmarks.benchmark_batching import make_images  # noqa: E402
+
+MODELS_DIR = BACKEND_DIR.parent / "models"
+
+
+def legacy_predict(model, image) -> Dict:
+    """The pre-batching PestModelLoader.predict body"""
+    image = image.convert('RGB').resize((224, 224))
+    img_normalized = np.array(image).flatten().reshape(1, -1) / 255.0
+    prediction = model.predict(img_normalized)[0]
+    probabilities = model.predict_proba(img_normalized)[0]
+    classes = model.classes_
+    confidence = float(probabilities[np.where(classes == prediction)[0][0]])
+    top_indices = np.argsort(probabilities)[-5:][::-1]
+    return {'prediction': str(prediction), 'confidence': confidence,
+            'all_predictions': {str(classes[i]): float(probabilities[i]) for i in top_indices}}
+
+
+def measure(calls: List[Callable], images_per_call: int) -> Dict:
+    tracemalloc.start()
+    peak = 0
+    start = time.process_time()
+    for call in calls:
+        tracemalloc.reset_peak()
+        call()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    cpu = time.process_time() - start
+    tracemalloc.stop()
+    return {
+        'cpu_ms_per_image': cpu * 1000 / (len(calls) * images_per_call),
+        'peak_mb_per_call': peak / 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the legacy pest model paths")
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--model-path", default=str(MODELS_DIR / "resnet50_0.497.pkl"))
+    args = parser.parse_args()
+
+    loader = PestModelLoader(args.model_path)
+    model = loader.get_model()
+    images = make_images(args.images)
+    loader.predict_batch(images[:max(args.batch_sizes)])  # Allocate the feature buffer up front
+
+    # Same answers from both paths
+    for image in images[:4]:
+        old, new = legacy_predict(model, image), loader.predict(image)
+        assert old['prediction'] == new['prediction'], (old, new)
+
+    rows = [('legacy', measure([lambda image=image: legacy_predict(model, image) for image in images], 1))]
+    for batch_size in args.batch_sizes:
+        chunks = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+        stats = measure([lambda chunk=chunk: loader.predict_batch(chunk) for chunk in chunks], batch_size)
+        rows.append((f"batched x{batch_size}", stats))
+
+    print(f"\n{'path':<14} {'CPU ms/image':>13} {'peak MB/call':>13}")
+    for name, stats in rows:
+        print(f"{name:<14} {stats['cpu_ms_per_image']:>13.2f} {stats['peak_mb_per_call']:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
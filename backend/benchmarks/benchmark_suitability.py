@@ -0,0 +1,76 @@
+"""
+Crop Suitability Raster Benchmark
+Cells per second and peak memory of services.crop_suitability on a synthetic
+district, for several worker counts
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_suitability --rows 2000 --cols 2000 --workers 1 4 8
+
+The layers are training rows from data/Crop_recommendation.csv laid out as
+16 x 16-cell fields with per-cell noise, written as a (7, rows, cols) .npy stack
+in a temp directory.
+"""
+
+import argparse
+import resource
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.crop_scoring import SOIL_FEATURES  # noqa: E402
+from services.crop_suitability import BLOCK_CELLS, generate_suitability, layer_sources  # noqa: E402
+
+MODEL_PATH = BACKEND_DIR.parent / "models" / "crop_model.pkl"
+DATA_PATH = BACKEND_DIR.parent / "data" / "Crop_recommendation.csv"
+
+
+def synthetic_stack(path: Path, rows: int, cols: int, seed: int = 0):
+    """Write the layer stack band by band, so building it never holds more than one layer"""
+    data = pd.read_csv(DATA_PATH)[list(SOIL_FEATURES)].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    fields = rng.integers(0, len(data), (rows // 16 + 1, cols // 16 + 1)).repeat(16, 0).repeat(16, 1)[:rows, :cols]
+    stack = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(len(SOIL_FEATURES), rows, cols))
+    spread = data.max(axis=0) - data.min(axis=0)
+    for band in range(len(SOIL_FEATURES)):
+        stack[band] = data[fields, band] + rng.normal(0, 0.01 * spread[band], (rows, cols))
+    stack.flush()
+
+
+def peak_rss_mb(who) -> float:
+    return resource.getrusage(who).ru_maxrss / 1024  # kB on Linux
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crop suitability raster generation")
+    parser.add_argument("--model", default=str(MODEL_PATH))
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--cols", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--block-cells", type=int, default=BLOCK_CELLS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stack_path = Path(tmp) / "stack.npy"
+        synthetic_stack(stack_path, args.rows, args.cols)
+        print(f"{args.rows} x {args.cols} = {args.rows * args.cols:,} cells, "
+              f"{stack_path.stat().st_size / 1e6:.0f} MB of layers\n")
+
+        print(f"{'workers':>7} {'seconds':>8} {'cells/s':>10} {'windows':>8}")
+        for workers in args.workers:
+            summary = generate_suitability(layer_sources(str(stack_path)), Path(tmp) / f"out-{workers}",
+                                           args.model, workers=workers, block_cells=args.block_cells)
+            print(f"{workers:>7} {summary['seconds']:>8.1f} {summary['cells_per_second']:>10,} "
+                  f"{summary['windows']:>8}")
+
+    print(f"\npeak RSS: parent {peak_rss_mb(resource.RUSAGE_SELF):.0f} MB, "
+          f"largest worker {peak_rss_mb(resource.RUSAGE_CHILDREN):.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Crop Router Evaluation
+Compares the routed MultiModelDetector against the run-all detector on the validation folders
+
+Usage (from the backend directory):
+    python -m benchmarks.evaluate_crop_router \
+        --plantdoc-val ../PlantDoc_Organized/val --maize-val ../Maize_Organized/val \
+        --rice-val ../Rice_Organized/val --threshold 0.8
+
+Reports per-family and overall top-1 accuracy for both modes, router accuracy,
+fallback rate, estimated GFLOPs per image and wall time.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from model_loader import (  # noqa: E402
+    PlantDocModelLoader, MaizeModelLoader, RiceModelLoader, CropRouterLoader, MultiModelDetector
+)
+
+MODELS_DIR = BACKEND_DIR.parent / "models"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".jfif", ".webp"}
+
+# Forward-pass cost per image (GFLOPs). ResNet50 scales with input area.
+GFLOPS = {
+    'PlantDoc': 4.09,
+    'Maize': 4.09,
+    'Rice': 4.09 * (256 / 224) ** 2,
+    'CropRouter': 0.06,
+}
+FAMILY_MODEL_NAMES = {'plantdoc': 'PlantDoc', 'maize': 'Maize', 'rice': 'Rice'}
+
+
+def load_samples(val_dirs: Dict[str, str], limit: int) -> List[Tuple[str, str, Path]]:
+    """(family, class name, image path) for every image in the ImageFolder-style val dirs"""
+    samples = []
+    for family, root in val_dirs.items():
+        paths = sorted(
+            (class_dir.name, path)
+            for class_dir in Path(root).iterdir() if class_dir.is_dir()
+            for path in class_dir.iterdir() if path.suffix.lower() in IMAGE_SUFFIXES
+        )
+        samples.extend((family, class_name, path) for class_name, path in paths[:limit or None])
+    return samples
+
+
+def run(detector: MultiModelDetector, samples, batch_size: int) -> Tuple[List[Dict], float]:
+    results = []
+    start = time.perf_counter()
+    for offset in range(0, len(samples), batch_size):
+        chunk = samples[offset:offset + batch_size]
+        images = [Image.open(path) for _, _, path in chunk]
+        results.extend(detector.predict_batch(images))
+    return results, time.perf_counter() - start
+
+
+def is_correct(result: Dict, family: str, class_name: str) -> bool:
+    return (
+        result.get('success', False)
+        and result.get('selected_model') == FAMILY_MODEL_NAMES[family]
+        and str(result.get('prediction', '')).lower() == class_name.lower()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the crop-family router")
+    parser.add_argument("--plantdoc-val", required=True)
+    parser.add_argument("--maize-val", required=True)
+    parser.add_argument("--rice-val", required=True)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--limit-per-class", type=int, default=0, help="0 = all images")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    specialists = (
+        PlantDocModelLoader(str(MODELS_DIR / "plantdoc_resnet50_finetuned.pth")),
+        MaizeModelLoader(str(MODELS_DIR / "maize_resnet50.pth")),
+        RiceModelLoader(str(MODELS_DIR / "rice_resnet50.pth")),
+    )
+    router = CropRouterLoader(str(MODELS_DIR / "crop_router_mobilenetv3.pth"))
+    run_all = MultiModelDetector(*specialists)
+    routed = MultiModelDetector(*specialists, router=router, router_threshold=args.threshold)
+
+    samples = load_samples(
+        {'plantdoc': args.plantdoc_val, 'maize': args.maize_val, 'rice': args.rice_val},
+        args.limit_per_class
+    )
+    all_results, all_seconds = run(run_all, samples, args.batch_size)
+    routed_results, routed_seconds = run(routed, samples, args.batch_size)
+
+    per_family: Dict[str, Dict[str, int]] = {}
+    routed_gflops = 0.0
+    fallbacks = 0
+    router_correct = 0
+    for (family, class_name, _), full, fast in zip(samples, all_results, routed_results):
+        stats = per_family.setdefault(family, {'images': 0, 'run_all': 0, 'routed': 0})
+        stats['images'] += 1
+        stats['run_all'] += is_correct(full, family, class_name)
+        stats['routed'] += is_correct(fast, family, class_name)
+
+        routed_gflops += GFLOPS['CropRouter']
+        if fast.get('routed'):
+            routed_gflops += GFLOPS[fast['selected_model']]
+            router_correct += fast['selected_model'] == FAMILY_MODEL_NAMES[family]
+        else:
+            fallbacks += 1
+            routed_gflops += sum(GFLOPS[name] for name in FAMILY_MODEL_NAMES.values())
+
+    total = max(len(samples), 1)
+    run_all_gflops = sum(GFLOPS[name] for name in FAMILY_MODEL_NAMES.values())
+
+    print(f"\n{'family':<10} {'images':>7} {'run-all acc':>12} {'routed acc':>11}")
+    for family, stats in sorted(per_family.items()):
+        print(f"{family:<10} {stats['images']:>7} {stats['run_all'] / stats['images']:>12.4f} "
+              f"{stats['routed'] / stats['images']:>11.4f}")
+    overall_all = sum(s['run_all'] for s in per_family.values()) / total
+    overall_routed = sum(s['routed'] for s in per_family.values()) / total
+    print(f"{'overall':<10} {total:>7} {overall_all:>12.4f} {overall_routed:>11.4f}")
+
+    routed_count = total - fallbacks
+    print(f"\nthreshold             {args.threshold}")
+    print(f"accuracy delta        {overall_routed - overall_all:+.4f}")
+    print(f"fallback rate         {fallbacks / total:.4f}")
+    print(f"router accuracy       {router_correct / routed_count if routed_count else 0:.4f} (on routed images)")
+    print(f"GFLOPs/image run-all  {run_all_gflops:.2f}")
+    print(f"GFLOPs/image routed   {routed_gflops / total:.2f} "
+          f"({run_all_gflops / (routed_gflops / total):.2f}x fewer)")
+    print(f"wall time run-all     {all_seconds:.1f}s")
+    print(f"wall time routed      {routed_seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,22 +5,49 @@ from pathlib import Path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 import fastapi
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-import joblib
 import numpy as np
 import pandas as pd
 import os
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 import google.generativeai as genai
 from twilio.rest import Client
 from dotenv import load_dotenv
 from model_loader import (
-    PlantDocModelLoader, MaizeModelLoader, RiceModelLoader,
-    MultiModelDetector, PestModelLoader,
-    load_image_from_base64, load_image_from_bytes
+    MultiModelDetector, PestModelLoader, CascadeModelLoader, TierStats, build_loader,
+    load_image_from_base64, load_image_from_bytes, ImageTooLargeError,
+    decode_image, MAX_IMAGE_BYTES,
+    INFERENCE_BACKEND, QUANTIZED_INFERENCE,
+    configure_torch_threads, get_model_pool, PARALLEL_MODELS, thread_settings
 )
+from services.inference_batcher import InferenceBatcher
+from services.inference_executor import InferenceExecutor, InferenceSaturatedError
+from services.model_lifecycle import ModelLifecycleManager
+from services.model_registry import MANIFEST_DIR, ModelRegistry
+from services.weight_storage import load_joblib
+from services.result_cache import DetectionResultCache, image_digest, model_version
+from services.batch_detection import (
+    BatchLimitError, extract_zip_images, ndjson_line, stream_batch_detection
+)
+from services.upload_spool import UploadTooLargeError, spool_body, upload_chunks
+from services.live_detection import LiveDetectionSession
+from services.near_duplicate import NearDuplicateIndex, NearDuplicateStats
+from services.crop_scoring import SOIL_FEATURES, CropScorer
+from services.compiled_forest import load_compiled_forest
+from services.crop_lookup import CropLookup, SuitabilityGrid, parse_steps
+from services.crop_suitability import SuitabilityLimitError, generate_suitability, layer_sources
 
 # Import satellite analytics routers
 # Import routers individually to prevent one failure from blocking all
@@ -93,85 +120,400 @@ async def root_path_middleware(request: fastapi.Request, call_next):
 # Load the ML model (crop recommendation - keep eager loading for this small model)
 MODEL_PATH = Path(__file__).parent.parent / "models" / "crop_model.pkl"
 try:
-    model = joblib.load(MODEL_PATH)
-    print(f"✅ Model loaded successfully from {MODEL_PATH}")
+    # The compiled flat-array forest (python -m services.compiled_forest compile) when
+    # current: a header parse plus mmap, and microsecond-scale single rows
+    model = load_compiled_forest(MODEL_PATH)
+    if model is None:
+        model = load_joblib(MODEL_PATH)  # NumPy arrays memory-mapped, shared across workers
+    print(f"✅ Model loaded successfully from {MODEL_PATH} ({type(model).__name__})")
 except Exception as e:
     print(f"❌ Error loading model: {e}")
     model = None
 
-# Model paths for lazy loading
-PLANTDOC_MODEL_PATH = Path(__file__).parent.parent / "models" / "plantdoc_resnet50_finetuned.pth"
-MAIZE_MODEL_PATH = Path(__file__).parent.parent / "models" / "maize_resnet50.pth"
-RICE_MODEL_PATH = Path(__file__).parent.parent / "models" / "rice_resnet50.pth"
+# One probability pass per request, shared by /predict and /batch-predict
+crop_scorer = CropScorer(model) if model is not None else None
+
+# Memoized crop recommendations on readings rounded to soil card precision
+# (CROP_LOOKUP_SIZE=0 scores the exact readings with the forest, as before)
+CROP_LOOKUP_SIZE = int(os.getenv('CROP_LOOKUP_SIZE', '4096'))
+CROP_LOOKUP_STEPS = parse_steps(os.getenv('CROP_LOOKUP_STEPS', ''))
+# Precomputed suitability grid (python -m services.crop_lookup build-grid); its
+# confidences are interpolated, so it is opt-in
+CROP_LOOKUP_GRID = os.getenv('CROP_LOOKUP_GRID', '0').lower() in ('1', 'true', 'yes')
+CROP_GRID_MAX_SPREAD = float(os.getenv('CROP_GRID_MAX_SPREAD', '0.25'))
+
+crop_lookup = None
+if crop_scorer is not None and (CROP_LOOKUP_SIZE > 0 or CROP_LOOKUP_GRID):
+    crop_model_version = model_version(MODEL_PATH)
+    crop_grid = None
+    if CROP_LOOKUP_GRID and crop_scorer.has_proba:
+        crop_grid = SuitabilityGrid.load(MODEL_PATH, crop_model_version, max_spread=CROP_GRID_MAX_SPREAD)
+        if crop_grid is not None:
+            print(f"✅ Crop suitability grid loaded ({' x '.join(map(str, crop_grid.shape))} points)")
+        else:
+            print("⚠️ CROP_LOOKUP_GRID is set but no grid matches the crop model; scoring with the forest")
+    crop_lookup = CropLookup(
+        crop_scorer,
+        DetectionResultCache(max_entries=CROP_LOOKUP_SIZE, ttl_seconds=86400),
+        crop_model_version, steps=CROP_LOOKUP_STEPS, grid=crop_grid
+    )
+crop_recommender = crop_lookup or crop_scorer
+MAX_BATCH_SAMPLES = int(os.getenv('MAX_BATCH_SAMPLES', '10000'))
+
+# Suitability rasters: one job at a time, on its own pool of worker processes
+SUITABILITY_WORKERS = int(os.getenv('SUITABILITY_WORKERS', str(os.cpu_count() or 1)))
+MAX_SUITABILITY_CELLS = int(os.getenv('MAX_SUITABILITY_CELLS', '25000000'))
+_suitability_slot = threading.BoundedSemaphore(1)
+
+# Model paths for lazy loading; the image models are described by manifests
 LEGACY_PEST_MODEL_PATH = Path(__file__).parent.parent / "models" / "resnet50_0.497.pkl"
+MODEL_MANIFEST_DIR = Path(os.getenv('MODEL_MANIFEST_DIR', str(MANIFEST_DIR)))
+
+# Seconds between checks for new model versions (0 = only on POST /models/reload)
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', '0'))
+DISEASE_MODEL_NAMES = ['plantdoc', 'maize', 'rice']
+
+# Detection tier: "accurate" runs the ResNet50 teachers; "fast" runs the distilled
+# students (<name>_fast manifests) and escalates images they are unsure about to
+# the teacher. FAST_TIER_THRESHOLD overrides each student's escalation_threshold.
+DETECTION_TIER = os.getenv('DETECTION_TIER', 'accurate').lower()
+FAST_TIER_THRESHOLD = float(os.environ['FAST_TIER_THRESHOLD']) if os.getenv('FAST_TIER_THRESHOLD') else None
+DEFAULT_ESCALATION_THRESHOLD = 0.85
+
+# Crop-family router: run only the matching specialist when the router is confident
+CROP_ROUTER_ENABLED = os.getenv('CROP_ROUTER_ENABLED', '0').lower() in ('1', 'true', 'yes')
+CROP_ROUTER_THRESHOLD = float(os.getenv('CROP_ROUTER_THRESHOLD', '0.8'))
+
+# Micro-batching settings for /detect-disease and /detect-pest
+DETECTION_MAX_BATCH_SIZE = int(os.getenv('DETECTION_MAX_BATCH_SIZE', '8'))
+DETECTION_MAX_WAIT_MS = float(os.getenv('DETECTION_MAX_WAIT_MS', '10'))
+
+# Inference executor settings (keeps model inference off the event loop)
+INFERENCE_EXECUTOR_KIND = os.getenv('INFERENCE_EXECUTOR_KIND', 'thread')
+INFERENCE_MAX_WORKERS = int(os.getenv('INFERENCE_MAX_WORKERS', '2'))
+INFERENCE_MAX_QUEUE = int(os.getenv('INFERENCE_MAX_QUEUE', '32'))
+
+# Concurrently running models each get a share of the cores (PARALLEL_MODELS, TORCH_THREADS_PER_MODEL)
+TORCH_INTRA_OP_THREADS = configure_torch_threads()
+
+# Startup preload: load and warm models in the background so /ready can gate traffic
+MODEL_PRELOAD = os.getenv('MODEL_PRELOAD', '0').lower() in ('1', 'true', 'yes')
+MODEL_WARMUP = os.getenv('MODEL_WARMUP', '1').lower() in ('1', 'true', 'yes')
+READY_MODELS = [name.strip() for name in os.getenv('READY_MODELS', 'plantdoc,maize,rice').split(',') if name.strip()]
+
+# Memory budget for resident models (0 = unlimited); beyond it the least recently used are evicted
+MODEL_MEMORY_BUDGET_MB = float(os.getenv('MODEL_MEMORY_BUDGET_MB', '0'))
 
-# Global variables for lazy-loaded models (initialized to None)
-_plantdoc_model = None
-_maize_model = None
-_rice_model = None
-_multi_model_detector = None
-_pest_model = None
+# Batch detection endpoint limits and parallel decode pool size
+MAX_BATCH_IMAGES = int(os.getenv('MAX_BATCH_IMAGES', '500'))
+# Total image bytes per batch request (uploaded parts, or an archive's uncompressed members)
+MAX_BATCH_BYTES = int(os.getenv('MAX_BATCH_BYTES', str(200 * 1024 * 1024)))
+BATCH_INFERENCE_SIZE = int(os.getenv('BATCH_INFERENCE_SIZE', '16'))
+DECODE_WORKERS = int(os.getenv('DECODE_WORKERS', str(min(8, os.cpu_count() or 2))))
 
-# Lazy loading getter functions
+# Raw image bodies up to this size stay in memory; larger ones spool to a temp file
+UPLOAD_SPOOL_MEMORY = int(os.getenv('UPLOAD_SPOOL_MEMORY', str(4 * 1024 * 1024)))
+
+# Near-duplicate reuse for the upload endpoints: images whose 64-bit perceptual hash is
+# within this many bits of a confidently detected image reuse its result. The index is
+# shared by all clients, so a different farmer's similar-looking photo can match; it is
+# opt-in (set NEAR_DUPLICATE_INDEX_SIZE, e.g. 2048). Live camera sessions keep their own index.
+NEAR_DUPLICATE_INDEX_SIZE = int(os.getenv('NEAR_DUPLICATE_INDEX_SIZE', '0'))
+NEAR_DUPLICATE_DISTANCE = int(os.getenv('NEAR_DUPLICATE_DISTANCE', '4'))
+NEAR_DUPLICATE_MIN_CONFIDENCE = float(os.getenv('NEAR_DUPLICATE_MIN_CONFIDENCE', '0.6'))
+NEAR_DUPLICATE_TTL = float(os.getenv('NEAR_DUPLICATE_TTL', '600'))
+NEAR_DUPLICATE_HASH = os.getenv('NEAR_DUPLICATE_HASH', 'dhash')
+
+# Live camera streaming: a per-session index with a looser distance (consecutive frames
+# of one scene); LIVE_SMOOTHING_ALPHA weights the newest frame
+LIVE_INDEX_SIZE = int(os.getenv('LIVE_INDEX_SIZE', '64'))
+LIVE_DUPLICATE_DISTANCE = int(os.getenv('LIVE_DUPLICATE_DISTANCE', '8'))
+LIVE_SMOOTHING_ALPHA = float(os.getenv('LIVE_SMOOTHING_ALPHA', '0.5'))
+
+# Detection result cache (DETECTION_CACHE_SIZE=0 disables it)
+DETECTION_CACHE_SIZE = int(os.getenv('DETECTION_CACHE_SIZE', '1024'))
+DETECTION_CACHE_TTL = float(os.getenv('DETECTION_CACHE_TTL', '3600'))
+
+# Version tags in the cache keys: replacing a checkpoint or switching backend invalidates entries
+PEST_MODEL_VERSION = model_version(LEGACY_PEST_MODEL_PATH)
+
+detection_cache = DetectionResultCache(max_entries=DETECTION_CACHE_SIZE, ttl_seconds=DETECTION_CACHE_TTL)
+near_duplicate_index = NearDuplicateIndex(
+    max_entries=NEAR_DUPLICATE_INDEX_SIZE, max_distance=NEAR_DUPLICATE_DISTANCE,
+    min_confidence=NEAR_DUPLICATE_MIN_CONFIDENCE, ttl_seconds=NEAR_DUPLICATE_TTL, method=NEAR_DUPLICATE_HASH
+)
+live_duplicate_stats = NearDuplicateStats()  # Totals over all live camera sessions
+
+# Global variables for lazily created helpers (initialized to None)
+_detection_batcher = None
+_pest_batcher = None
+_inference_executor = None
+_decode_pool = None
+
+# Every model goes through the lifecycle manager: one load per model, even when
+# concurrent first requests arrive, with per-model state reported by /ready
+model_lifecycle = ModelLifecycleManager(memory_budget_bytes=int(MODEL_MEMORY_BUDGET_MB * 1e6))
+model_lifecycle.register('pest', lambda: PestModelLoader(str(LEGACY_PEST_MODEL_PATH)), warmup=MODEL_WARMUP)
+
+# The disease models and router come from their manifests; new versions are
+# loaded and warmed in the background, then swapped in without a restart
+model_registry = ModelRegistry(model_lifecycle, build_loader, manifest_dir=MODEL_MANIFEST_DIR, warmup=MODEL_WARMUP)
+model_registry.register_all(DISEASE_MODEL_NAMES + [f"{name}_fast" for name in DISEASE_MODEL_NAMES] + ['router'])
+
+# Teacher name -> student name, for the teachers that have a distilled student
+FAST_TIER_STUDENTS = {}
+if DETECTION_TIER == 'fast':
+    for name in DISEASE_MODEL_NAMES:
+        student = model_registry.manifests.get(f"{name}_fast")
+        if student is not None and student.teacher == name:
+            FAST_TIER_STUDENTS[name] = student.name
+        else:
+            print(f"⚠️ WARNING: No distilled student for {name}, serving the full model")
+fast_tier_stats = {name: TierStats() for name in FAST_TIER_STUDENTS}
+
+# In the fast tier the students, not the teachers, must be warm before /ready passes
+if 'READY_MODELS' not in os.environ:
+    READY_MODELS = [FAST_TIER_STUDENTS.get(name, name) for name in READY_MODELS]
+
+def build_multi_model_detector():
+    """The detector over whichever disease models loaded; missing ones are skipped"""
+    return MultiModelDetector(
+        with_fast_tier('plantdoc', get_plantdoc_model),
+        with_fast_tier('maize', get_maize_model),
+        with_fast_tier('rice', get_rice_model),
+        router=get_crop_router(), router_threshold=CROP_ROUTER_THRESHOLD,
+        pool=get_model_pool()
+    )
+
+# Teachers behind a student are loaded on the first escalation, not with the detector
+DETECTOR_DEPENDENCIES = (
+    tuple(FAST_TIER_STUDENTS.get(name, name) for name in DISEASE_MODEL_NAMES)
+    + (('router',) if CROP_ROUTER_ENABLED else ())
+)
+model_lifecycle.register('detector', build_multi_model_detector, warmup=False, depends_on=DETECTOR_DEPENDENCIES)
+
+if model is not None:
+    # The crop model counts against the memory budget but stays pinned (it serves /predict)
+    model_lifecycle.register('crop', lambda: model, warmup=False, evictable=False)
+    model_lifecycle.get('crop')
+
+def get_lifecycle_model(name: str, label: str):
+    """Return a loaded model from the lifecycle manager, as an HTTP error on failure"""
+    try:
+        return model_lifecycle.get(name)
+    except Exception as e:
+        print(f"❌ Error loading {label} model: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to load {label} model: {str(e)}")
+
+def get_optional_model(name: str, label: str):
+    """Return a loaded model, or None when it failed to load (/ready reports the error)"""
+    try:
+        return model_lifecycle.get(name)
+    except Exception as e:
+        print(f"⚠️ WARNING: {label} model unavailable, serving without it: {e}")
+        return None
+
+# Lazy loading getter functions; a model that fails to load comes back as None and
+# the detector serves with the others
 def get_plantdoc_model():
-    """Lazy load PlantDoc model on first request"""
-    global _plantdoc_model
-    if _plantdoc_model is None:
-        try:
-            _plantdoc_model = PlantDocModelLoader(str(PLANTDOC_MODEL_PATH))
-        except Exception as e:
-            print(f"❌ Error loading PlantDoc model: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to load PlantDoc model: {str(e)}")
-    return _plantdoc_model
+    """Load PlantDoc model on first request (or at startup when preloading)"""
+    return get_optional_model('plantdoc', 'PlantDoc')
 
 def get_maize_model():
-    """Lazy load Maize model on first request"""
-    global _maize_model
-    if _maize_model is None:
-        try:
-            _maize_model = MaizeModelLoader(str(MAIZE_MODEL_PATH))
-        except Exception as e:
-            print(f"❌ Error loading Maize model: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to load Maize model: {str(e)}")
-    return _maize_model
+    """Load Maize model on first request (or at startup when preloading)"""
+    return get_optional_model('maize', 'Maize')
 
 def get_rice_model():
-    """Lazy load Rice model on first request"""
-    global _rice_model
-    if _rice_model is None:
-        try:
-            _rice_model = RiceModelLoader(str(RICE_MODEL_PATH))
-        except Exception as e:
-            print(f"❌ Error loading Rice model: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to load Rice model: {str(e)}")
-    return _rice_model
+    """Load Rice model on first request (or at startup when preloading)"""
+    return get_optional_model('rice', 'Rice')
+
+def with_fast_tier(name: str, get_teacher):
+    """The teacher, or in the fast tier its student escalating unsure images to it"""
+    student_name = FAST_TIER_STUDENTS.get(name)
+    if student_name is None:
+        return get_teacher()
+    manifest = model_registry.manifests[student_name]
+    threshold = FAST_TIER_THRESHOLD
+    if threshold is None:
+        threshold = manifest.escalation_threshold or DEFAULT_ESCALATION_THRESHOLD
+    student = get_optional_model(student_name, f"{manifest.display_name} student")
+    if student is None:
+        return get_teacher()  # The full model serves until the student loads
+    return CascadeModelLoader(student, get_teacher, threshold=threshold, stats=fast_tier_stats[name])
+
+def get_crop_router():
+    """Load the crop-family router when enabled; without it every model runs"""
+    if not CROP_ROUTER_ENABLED:
+        return None
+    try:
+        return model_lifecycle.get('router')
+    except Exception as e:
+        print(f"⚠️ WARNING: Crop router unavailable, running all models: {e}")
+        return None
 
 def get_multi_model_detector():
-    """Lazy load multi-model detector on first request"""
-    global _multi_model_detector
-    if _multi_model_detector is None:
-        try:
-            # Load individual models
-            plantdoc = get_plantdoc_model()
-            maize = get_maize_model()
-            rice = get_rice_model()
-            _multi_model_detector = MultiModelDetector(plantdoc, maize, rice)
-            print(f"✅ Multi-model detector initialized")
-        except Exception as e:
-            print(f"❌ Error initializing multi-model detector: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to initialize multi-model detector: {str(e)}")
-    return _multi_model_detector
+    """Build the multi-model detector on top of the three disease models"""
+    return get_lifecycle_model('detector', 'multi-model detector')
+
+def get_inference_executor():
+    """Create the pool that runs model inference off the event loop"""
+    global _inference_executor
+    if _inference_executor is None:
+        _inference_executor = InferenceExecutor(
+            max_workers=INFERENCE_MAX_WORKERS,
+            max_queue=INFERENCE_MAX_QUEUE,
+            kind=INFERENCE_EXECUTOR_KIND,
+            name="inference"
+        )
+    return _inference_executor
+
+def get_decode_pool():
+    """Thread pool for parallel image decodes (Pillow releases the GIL while decoding)"""
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="decode")
+    return _decode_pool
+
+def get_detection_batcher():
+    """Create the micro-batcher that stacks concurrent disease detection requests"""
+    global _detection_batcher
+    if _detection_batcher is None:
+        # Models load on the executor inside the first batch, never on the event loop
+        _detection_batcher = InferenceBatcher(
+            run_disease_detection_batch,
+            max_batch_size=DETECTION_MAX_BATCH_SIZE,
+            max_wait_ms=DETECTION_MAX_WAIT_MS,
+            name="disease-detection",
+            executor=get_inference_executor(),
+            max_queue=INFERENCE_MAX_QUEUE
+        )
+    return _detection_batcher
+
+def get_pest_batcher():
+    """Create the micro-batcher that scores concurrent pest requests in one predict_proba call"""
+    global _pest_batcher
+    if _pest_batcher is None:
+        _pest_batcher = InferenceBatcher(
+            run_pest_detection_batch,
+            max_batch_size=DETECTION_MAX_BATCH_SIZE,
+            max_wait_ms=DETECTION_MAX_WAIT_MS,
+            name="pest-detection",
+            executor=get_inference_executor(),
+            max_queue=INFERENCE_MAX_QUEUE
+        )
+    return _pest_batcher
 
 def get_pest_model():
-    """Lazy load legacy pest model on first request"""
-    global _pest_model
-    if _pest_model is None:
-        try:
-            _pest_model = PestModelLoader(str(LEGACY_PEST_MODEL_PATH))
-        except Exception as e:
-            print(f"❌ Error loading legacy pest model: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to load pest model: {str(e)}")
-    return _pest_model
+    """Load legacy pest model on first request (or at startup when preloading)"""
+    return get_optional_model('pest', 'Legacy pest')
+
+# Inference tasks submitted to the executor. These are module-level functions so
+# they can also be pickled to a process pool, where each worker keeps its own models.
+def run_disease_detection_batch(images):
+    return get_multi_model_detector().predict_batch(images)
+
+def run_pest_detection_batch(images):
+    pest_detector = get_pest_model()
+    if pest_detector is None:
+        # A failed result per image, not a 500: /detect-combined still serves the disease half
+        error = model_lifecycle.status()['pest']['error']
+        return [{'success': False, 'error': error} for _ in images]
+    return pest_detector.predict_batch(images)
+
+_disease_version = (None, None)
+
+def disease_model_version() -> str:
+    """Cache-key version of the disease models; changes with every hot swap"""
+    global _disease_version
+    generation, version = _disease_version
+    if generation != model_registry.generation:
+        names = DISEASE_MODEL_NAMES + list(FAST_TIER_STUDENTS.values()) + (['router'] if CROP_ROUTER_ENABLED else [])
+        manifests = [model_registry.manifests[name] for name in names if name in model_registry.manifests]
+        version = model_version(
+            *(manifest.path for manifest in manifests),
+            extra=f"{INFERENCE_BACKEND}:{QUANTIZED_INFERENCE}:{CROP_ROUTER_ENABLED}:{CROP_ROUTER_THRESHOLD}:"
+                  f"{DETECTION_TIER}:{FAST_TIER_THRESHOLD}:"
+                  + ",".join(f"{manifest.name}={manifest.version}" for manifest in manifests)
+        )
+        _disease_version = (model_registry.generation, version)
+    return version
+
+def image_fingerprint(img) -> Tuple[str, Optional[int]]:
+    """Exact pixel digest plus perceptual hash (None when the near-duplicate index is off)"""
+    return image_digest(img), near_duplicate_index.hash(img) if near_duplicate_index.enabled else None
+
+async def cached_detection(kind: str, version: str, fingerprint: Tuple[str, Optional[int]], compute):
+    """
+    Serve a detection result from the exact cache or the near-duplicate index,
+    or compute it, caching successes and indexing confident results
+    """
+    digest, perceptual = fingerprint
+    key = detection_cache.make_key(kind, version, digest)
+    cached = detection_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    namespace = f"{kind}:{version}"
+    if perceptual is not None:
+        similar = near_duplicate_index.lookup(namespace, perceptual)
+        if similar is not None:
+            return {**similar, 'near_duplicate': True}
+    
+    started = time.perf_counter()
+    result = await compute()
+    if result.get('success'):
+        detection_cache.put(key, result)
+    if perceptual is not None:
+        near_duplicate_index.add(namespace, perceptual, result, (time.perf_counter() - started) * 1000)
+    return result
+
+async def detect_disease_cached(img, fingerprint: Tuple[str, Optional[int]]):
+    return await cached_detection(
+        'disease', disease_model_version(), fingerprint,
+        lambda: get_detection_batcher().predict(img)
+    )
+
+async def detect_pest_cached(img, fingerprint: Tuple[str, Optional[int]]):
+    return await cached_detection(
+        'pest', PEST_MODEL_VERSION, fingerprint,
+        lambda: get_pest_batcher().predict(img)
+    )
+
+RAW_IMAGE_CONTENT_TYPES = ("application/octet-stream", "image/")
+
+async def read_detection_image(request: fastapi.Request, image: UploadFile, image_base64: str):
+    """
+    Decode the request image off the event loop, enforcing the size limits
+    
+    Preferred: the raw encoded image as the request body (Content-Type image/* or
+    application/octet-stream), streamed into a spooled buffer the decoder reads in
+    place. Multipart `image` uploads are decoded straight from their spooled file;
+    `image_base64` form fields are still accepted for older clients.
+    """
+    content_type = request.headers.get("content-type", "").lower()
+    try:
+        if content_type.startswith(RAW_IMAGE_CONTENT_TYPES):
+            declared = request.headers.get("content-length")
+            body = await spool_body(
+                request.stream(), MAX_IMAGE_BYTES, UPLOAD_SPOOL_MEMORY,
+                content_length=int(declared) if declared and declared.isdigit() else None
+            )
+            try:
+                return await asyncio.to_thread(load_image_from_bytes, body)
+            finally:
+                if not isinstance(body, memoryview):
+                    body.close()
+        elif image:
+            return await asyncio.to_thread(load_image_from_bytes, image.file)
+        elif image_base64:
+            return await asyncio.to_thread(load_image_from_base64, image_base64)
+    except (ImageTooLargeError, UploadTooLargeError) as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    raise HTTPException(status_code=400, detail="No image provided")
+
+def saturated_response(e: InferenceSaturatedError) -> HTTPException:
+    """503 with Retry-After so clients and load balancers back off"""
+    return HTTPException(status_code=503, detail=f"Server busy: {str(e)}", headers={"Retry-After": "1"})
 
 # Include satellite analytics routers
 # Include satellite analytics routers
@@ -199,6 +541,9 @@ class CropRecommendation(BaseModel):
     confidence: float
     all_predictions: dict
 
+class BatchCropRecommendation(BaseModel):
+    predictions: List[CropRecommendation]
+
 class ChatRequest(BaseModel):
     message: str
 
@@ -240,39 +585,152 @@ async def root():
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 only once the required models are loaded and warmed"""
+    ready = model_lifecycle.is_ready(READY_MODELS)
+    body = {"ready": ready, "required": READY_MODELS, "models": model_lifecycle.status()}
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@app.on_event("startup")
+async def preload_models():
+    if MODEL_PRELOAD:
+        print(f"🔄 Preloading models in the background: {', '.join(READY_MODELS)}")
+        model_lifecycle.preload(READY_MODELS)
+    if MODEL_WATCH_INTERVAL > 0:
+        print(f"🔄 Watching {MODEL_MANIFEST_DIR} for new model versions every {MODEL_WATCH_INTERVAL:g}s")
+        model_registry.start_watching(MODEL_WATCH_INTERVAL)
+
+@app.get("/models")
+async def list_models():
+    """Serving version, manifest details and lifecycle state of every model"""
+    return {"registry": model_registry.status(), "lifecycle": model_lifecycle.status()}
+
+@app.post("/models/reload")
+async def reload_models():
+    """Roll out changed manifests or checkpoints: load and warm in the background, then swap atomically"""
+    swapped = await asyncio.to_thread(model_registry.check_for_updates)
+    return {"swapped": swapped, "versions": model_registry.versions()}
+
+@app.get("/inference/stats")
+async def inference_stats():
+    return {
+        "executor": _inference_executor.stats() if _inference_executor else None,
+        "disease_batcher": _detection_batcher.stats() if _detection_batcher else None,
+        "pest_batcher": _pest_batcher.stats() if _pest_batcher else None,
+        "result_cache": detection_cache.stats(),
+        "near_duplicate": near_duplicate_index.snapshot(),
+        "live_near_duplicate": live_duplicate_stats.snapshot(),
+        "model_memory": model_lifecycle.memory_stats(),
+        "crop_lookup": crop_lookup.stats() if crop_lookup else None,
+        "detection_tier": {
+            "tier": DETECTION_TIER,
+            "students": {name: stats.snapshot() for name, stats in fast_tier_stats.items()}
+        },
+        "model_parallelism": {
+            "parallel_models": PARALLEL_MODELS,
+            "torch_threads_per_model": TORCH_INTRA_OP_THREADS,
+            "thread_settings": thread_settings
+        }
+    }
+
+@app.on_event("shutdown")
+async def shutdown_inference():
+    model_registry.stop_watching()
+    if _detection_batcher is not None:
+        _detection_batcher.stop()
+    if _pest_batcher is not None:
+        _pest_batcher.stop()
+    if _inference_executor is not None:
+        _inference_executor.shutdown(wait=False)
+    if _decode_pool is not None:
+        _decode_pool.shutdown(wait=False)
+
 @app.post("/predict", response_model=CropRecommendation)
 async def predict_crop(soil_data: SoilData):
     if model is None:
         raise HTTPException(status_code=500, detail="Model not loaded")
     
     try:
-        input_data = np.array([[
-            soil_data.N, soil_data.P, soil_data.K,
-            soil_data.temperature, soil_data.humidity,
-            soil_data.ph, soil_data.rainfall
-        ]])
-        
-        prediction = model.predict(input_data)[0]
-        
-        confidence = 0.85
-        all_predictions = {}
-        
-        if hasattr(model, 'predict_proba'):
-            probabilities = model.predict_proba(input_data)[0]
-            classes = model.classes_
-            pred_idx = np.where(classes == prediction)[0][0]
-            confidence = float(probabilities[pred_idx])
-            top_indices = np.argsort(probabilities)[-5:][::-1]
-            all_predictions = {str(classes[i]): float(probabilities[i]) for i in top_indices}
-        
-        return CropRecommendation(
-            crop=str(prediction),
-            confidence=confidence,
-            all_predictions=all_predictions
+        # Probabilities once; the label, confidence and top 5 all come from them
+        result = crop_recommender.score_one([getattr(soil_data, name) for name in SOIL_FEATURES])
+        return CropRecommendation(**result)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+@app.post("/batch-predict", response_model=BatchCropRecommendation)
+async def batch_predict_crops(samples: List[SoilData]):
+    """Crop recommendations for many soil samples, scored as one matrix"""
+    if model is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    if len(samples) > MAX_BATCH_SAMPLES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SAMPLES} samples per request")
+    if not samples:
+        return {"predictions": []}
+    
+    try:
+        features = np.array(
+            [[getattr(sample, name) for name in SOIL_FEATURES] for sample in samples], dtype=np.float64
         )
+        # Thousands of rows through 200 trees take a while; keep the event loop free
+        predictions = await asyncio.to_thread(crop_recommender.score, features)
+        return {"predictions": predictions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+def run_suitability_job(stack_path: Path, workdir: Path) -> Path:
+    """Score an uploaded layer stack and zip the rasters and summary"""
+    output_dir = workdir / "suitability"
+    generate_suitability(
+        layer_sources(str(stack_path)), output_dir, MODEL_PATH,
+        workers=SUITABILITY_WORKERS, max_cells=MAX_SUITABILITY_CELLS
+    )
+    archive_path = workdir / "suitability.zip"
+    with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for path in sorted(output_dir.iterdir()):
+            archive.write(path, path.name)
+    return archive_path
+
+@app.post("/suitability-raster")
+async def suitability_raster(stack: UploadFile = File(...)):
+    """
+    Best-crop and confidence rasters for a region. `stack` is a 7-band GeoTIFF or
+    a (7, rows, cols) .npy with the N, P, K, temperature, humidity, ph and rainfall
+    layers in that order; the response is a zip of best_crop, confidence and
+    suitability.json (legend and per-crop cell counts).
+    """
+    if model is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    suffix = Path(stack.filename or "").suffix.lower()
+    if suffix not in ('.tif', '.tiff', '.npy'):
+        raise HTTPException(status_code=400, detail="Send a GeoTIFF (.tif) or NumPy (.npy) layer stack")
+    if not _suitability_slot.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="A suitability raster is already being generated",
+                            headers={"Retry-After": "30"})
+
+    workdir = Path(tempfile.mkdtemp(prefix="suitability-"))
+    try:
+        stack_path = workdir / f"stack{suffix}"
+        with open(stack_path, 'wb') as handle:
+            await asyncio.to_thread(shutil.copyfileobj, stack.file, handle, 1024 * 1024)
+        archive_path = await asyncio.to_thread(run_suitability_job, stack_path, workdir)
+    except SuitabilityLimitError as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=f"Invalid layer stack: {str(e)}")
+    except Exception as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise HTTPException(status_code=500, detail=f"Suitability raster error: {str(e)}")
+    finally:
+        _suitability_slot.release()
+
+    return FileResponse(
+        archive_path, media_type="application/zip", filename="suitability.zip",
+        background=BackgroundTask(shutil.rmtree, workdir, ignore_errors=True)
+    )
+
 # --- Gemini Endpoints ---
 
 @app.post("/chat")
@@ -408,85 +866,209 @@ async def analyze_image(
 
 @app.post("/detect-disease")
 async def detect_disease(
+    request: fastapi.Request,
     image: UploadFile = File(None),
     image_base64: str = Form(None)
 ):
     """Detect plant diseases using multi-model system with automatic best-model selection"""
     try:
-        # Load image from either upload or base64
-        if image:
-            content = await image.read()
-            img = load_image_from_bytes(content)
-        elif image_base64:
-            img = load_image_from_base64(image_base64)
-        else:
-            raise HTTPException(status_code=400, detail="No image provided")
+        # Load image from the raw body, an upload or base64
+        img = await read_detection_image(request, image, image_base64)
         
-        # Get multi-model detector (lazy load on first call)
-        detector = get_multi_model_detector()
+        # Hash the decoded pixels off the event loop; repeats and near-duplicates are served from the cache
+        fingerprint = await asyncio.to_thread(image_fingerprint, img)
         
-        # Run multi-model prediction
-        result = detector.predict(img)
+        # Run multi-model prediction, batched with concurrent requests
+        result = await detect_disease_cached(img, fingerprint)
         return result
+    except HTTPException:
+        raise
+    except InferenceSaturatedError as e:
+        raise saturated_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Disease detection error: {str(e)}")
 
+@app.post("/detect-disease/batch")
+async def detect_disease_batch(
+    images: List[UploadFile] = File(None),
+    archive: UploadFile = File(None)
+):
+    """
+    Detect plant diseases on many images at once, sent as a multipart list of
+    `images` or as a zip `archive`. Images are decoded in parallel, run through the
+    disease models in real batches and streamed back as NDJSON, one line per image
+    (with its `index` and `filename`) as soon as its batch completes.
+    """
+    if len(images or []) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=413, detail=f"{len(images)} images sent; the limit is {MAX_BATCH_IMAGES}")
+
+    # Parts are read in chunks against the byte limits, so oversized uploads are
+    # rejected while reading instead of being pulled into memory first
+    entries = []
+    remaining = MAX_BATCH_BYTES
+    try:
+        if archive:
+            data = await spool_body(upload_chunks(archive), MAX_BATCH_BYTES, UPLOAD_SPOOL_MEMORY, archive.size)
+            try:
+                entries.extend(await asyncio.to_thread(
+                    extract_zip_images, data, MAX_BATCH_IMAGES, MAX_IMAGE_BYTES, MAX_BATCH_BYTES
+                ))
+            finally:
+                if hasattr(data, 'close'):
+                    data.close()
+            remaining -= sum(len(image) for _, image in entries)
+        for upload in images or []:
+            limit = min(MAX_IMAGE_BYTES, remaining)
+            if upload.size is not None and upload.size > limit:
+                raise UploadTooLargeError(f"{upload.filename} is {upload.size} bytes; {limit} bytes are left")
+            image = await spool_body(upload_chunks(upload), limit, MAX_IMAGE_BYTES)
+            remaining -= len(image)
+            entries.append((upload.filename, image))
+    except (BatchLimitError, UploadTooLargeError) as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Archive is not a valid zip file")
+    
+    if not entries:
+        raise HTTPException(status_code=400, detail="No images provided")
+    if len(entries) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=413, detail=f"{len(entries)} images sent; the limit is {MAX_BATCH_IMAGES}")
+    
+    async def predict_batch(batch_images):
+        return await get_inference_executor().run(run_disease_detection_batch, batch_images)
+    
+    async def ndjson_stream():
+        async for record in stream_batch_detection(
+            entries, decode_image, predict_batch, get_decode_pool(), batch_size=BATCH_INFERENCE_SIZE
+        ):
+            yield ndjson_line(record)
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
 @app.post("/detect-pest")
 async def detect_pest(
+    request: fastapi.Request,
     image: UploadFile = File(None),
     image_base64: str = Form(None)
 ):
     """Detect pests using the ResNet50-based model"""
     try:
-        # Load image from either upload or base64
-        if image:
-            content = await image.read()
-            img = load_image_from_bytes(content)
-        elif image_base64:
-            img = load_image_from_base64(image_base64)
-        else:
-            raise HTTPException(status_code=400, detail="No image provided")
+        # Load image from the raw body, an upload or base64
+        img = await read_detection_image(request, image, image_base64)
         
-        # Get pest model (lazy load on first call)
-        pest_detector = get_pest_model()
+        # Hash the decoded pixels off the event loop; repeats and near-duplicates are served from the cache
+        fingerprint = await asyncio.to_thread(image_fingerprint, img)
         
-        # Predict
-        result = pest_detector.predict(img)
+        # Predict on the inference executor (the model loads there on first call)
+        result = await detect_pest_cached(img, fingerprint)
         return result
+    except HTTPException:
+        raise
+    except InferenceSaturatedError as e:
+        raise saturated_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Pest detection error: {str(e)}")
 
 @app.post("/detect-combined")
 async def detect_combined(
+    request: fastapi.Request,
     image: UploadFile = File(None),
     image_base64: str = Form(None)
 ):
     """Run both multi-model disease detection and legacy pest detection on the same image"""
     try:
-        # Load image from either upload or base64
-        if image:
-            content = await image.read()
-            img = load_image_from_bytes(content)
-        elif image_base64:
-            img = load_image_from_base64(image_base64)
-        else:
-            raise HTTPException(status_code=400, detail="No image provided")
+        # Load image from the raw body, an upload or base64
+        img = await read_detection_image(request, image, image_base64)
         
-        # Get models (lazy load on first call)
-        detector = get_multi_model_detector()
-        pest_detector = get_pest_model()
+        # Hash once; both halves share cache entries with /detect-disease and /detect-pest
+        fingerprint = await asyncio.to_thread(image_fingerprint, img)
         
-        # Run both predictions
-        disease_result = detector.predict(img)
-        pest_result = pest_detector.predict(img)
+        # Run both predictions concurrently on the inference executor (models load
+        # there on first call); the disease models also fan out across the model pool
+        disease_result, pest_result = await asyncio.gather(
+            detect_disease_cached(img, fingerprint),
+            detect_pest_cached(img, fingerprint)
+        )
         
         return {
             "disease": disease_result,
             "pest": pest_result
         }
+    except HTTPException:
+        raise
+    except InferenceSaturatedError as e:
+        raise saturated_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Combined detection error: {str(e)}")
 
+@app.websocket("/ws/detect-disease")
+async def live_disease_detection(websocket: WebSocket):
+    """
+    Stream camera frames for live disease detection
+    
+    The client sends each frame as a binary message (encoded JPEG/PNG) and gets one
+    JSON message per analysed frame. A frame arriving while inference is busy
+    replaces the waiting one, so there is at most one frame in flight per session.
+    Frames that are perceptual near-duplicates of a recently analysed frame reuse
+    its result (`duplicate: true`), and
+    predictions are smoothed across frames (`smoothed_*` fields). Send the text
+    message `reset` to clear the smoothing, e.g. when pointing at a new plant.
+    """
+    await websocket.accept()
+    session = LiveDetectionSession(
+        NearDuplicateIndex(
+            max_entries=LIVE_INDEX_SIZE, max_distance=LIVE_DUPLICATE_DISTANCE,
+            min_confidence=NEAR_DUPLICATE_MIN_CONFIDENCE, ttl_seconds=NEAR_DUPLICATE_TTL,
+            method=NEAR_DUPLICATE_HASH, shared_stats=live_duplicate_stats
+        ),
+        smoothing_alpha=LIVE_SMOOTHING_ALPHA
+    )
+    
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                session.offer(message["bytes"])
+            elif message.get("text") == "reset":
+                session.smoother.reset()
+    
+    async def analyse_frames():
+        while True:
+            frame = await session.next_frame()
+            try:
+                img = await asyncio.to_thread(load_image_from_bytes, frame)
+            except Exception as e:
+                await websocket.send_json({"success": False, "error": f"Decode error: {str(e)}"})
+                continue
+            
+            similar = await asyncio.to_thread(session.match, img, disease_model_version())
+            if similar is not None:
+                await websocket.send_json({**similar, "duplicate": True, "stats": session.stats()})
+                continue
+            
+            started = time.perf_counter()
+            try:
+                result = await get_detection_batcher().predict(img)
+            except InferenceSaturatedError:
+                await websocket.send_json({"success": False, "busy": True, "error": "Server busy, frame skipped"})
+                continue
+            smoothed = session.record(result, (time.perf_counter() - started) * 1000)
+            await websocket.send_json({**smoothed, "duplicate": False, "stats": session.stats()})
+    
+    tasks = [asyncio.create_task(receive_frames()), asyncio.create_task(analyse_frames())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, (WebSocketDisconnect, RuntimeError)):
+                print(f"❌ Live detection session failed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        print(f"📷 Live detection session closed: {session.stats()}")
+
 @app.post("/disease-treatment")
 async def get_disease_treatment(disease_name: str = Form(...)):
     """Generate treatment recommendations for a detected disease using Gemini AI"""
@@ -1,350 +1,713 @@
 """
 Multi-Model Loader for Plant Disease and Pest Detection
-Supports PlantDoc, Maize, and Rice ResNet50 models with automatic best-model selection
+Supports PlantDoc, Maize, and Rice ResNet50 models with automatic best-model selection,
+optionally fronted by distilled students as a fast tier
 """
 import torch
 from torch import nn
-from torchvision import transforms, models
-import joblib
+from torchvision import models
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageOps
 import io
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Callable, Dict, List, Tuple, Optional
 import base64
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+from services.inference_backends import OnnxRuntimeModel, load_backend_model, onnx_available
+from services.model_registry import IMAGENET_NORMALIZE, ModelManifest, load_manifest
+from services.result_cache import model_version
+from services.thread_tuning import ensure_profile, load_profile, serving_streams, threads_for
+from services.weight_storage import has_shared_weights, load_joblib, load_state_dict
 
-class PlantDocModelLoader:
-    """Loads and manages the PlantDoc ResNet50 model (29 classes) - Lazy Loading"""
+
+# Opt-in INT8 inference using artifacts built by services/model_quantization.py
+QUANTIZED_INFERENCE = os.getenv('QUANTIZED_INFERENCE', '0').lower() in ('1', 'true', 'yes')
+QUANTIZED_ENGINE = os.getenv('QUANTIZED_ENGINE', 'fbgemm')
+
+# Serving backend for the disease models: eager, onnx or torchscript
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'eager').lower()
+if INFERENCE_BACKEND == 'onnx' and not onnx_available():
+    print("⚠️ WARNING: INFERENCE_BACKEND=onnx but onnx/onnxruntime are not installed "
+          "(pip install -r requirements-onnx.txt); serving TorchScript instead")
+
+# Image ingestion limits and decode resolution (the largest model input is 256)
+MAX_IMAGE_BYTES = int(os.getenv('MAX_IMAGE_BYTES', str(20 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', '50000000'))
+DECODE_TARGET_SIZE = 256
+DECODE_DRAFT = os.getenv('DECODE_DRAFT', '1').lower() in ('1', 'true', 'yes')
+EXIF_ORIENTATION_TAG = 0x0112
+
+# Concurrent model execution: the disease models (and the pest model in /detect-combined)
+# run side by side, each with a share of the cores instead of all of them
+PARALLEL_MODELS = os.getenv('PARALLEL_MODELS', '1').lower() in ('1', 'true', 'yes')
+CONCURRENT_MODELS = 4  # PlantDoc, Maize, Rice and pest
+TORCH_THREADS_PER_MODEL = int(os.getenv(
+    'TORCH_THREADS_PER_MODEL', str(max(1, (os.cpu_count() or 1) // CONCURRENT_MODELS))
+))
+
+# Thread counts tuned for this host by `python -m services.thread_tuning tune`;
+# an explicit TORCH_THREADS_PER_MODEL wins. THREAD_AUTOTUNE=1 tunes at startup
+# when the host has no profile yet. WEB_CONCURRENCY is uvicorn's worker count.
+THREAD_AUTOTUNE = os.getenv('THREAD_AUTOTUNE', '0').lower() in ('1', 'true', 'yes')
+UVICORN_WORKERS = int(os.getenv('WEB_CONCURRENCY', '1'))
+MODEL_STREAMS = serving_streams()  # Forward passes one request runs at once (3 with PARALLEL_MODELS)
+thread_settings: Dict = {'source': 'torch default'}
+
+IMAGENET_MEAN, IMAGENET_STD = IMAGENET_NORMALIZE
+
+
+_model_pool = None
+_model_pool_lock = threading.Lock()
+
+
+def configure_torch_threads() -> int:
+    """
+    Partition intra-op threads between models that run concurrently
     
-    def __init__(self, model_path: str):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self._model = None  # Lazy loading - model not loaded yet
-        self.model_path = model_path
-        self.model_name = "PlantDoc"
-        
-        # 29 PlantDoc classes
-        self.classes = [
-            "Apple Scab Leaf", "Apple leaf", "Apple rust leaf", "Bell_pepper leaf", "Bell_pepper leaf spot",
-            "Blueberry leaf", "Cherry leaf", "Corn Gray leaf spot", "Corn leaf blight", "Corn rust leaf",
-            "grape leaf", "grape leaf black rot", "Peach leaf", "Potato leaf", "Potato leaf early blight",
-            "Potato leaf late blight", "Raspberry leaf", "Soyabean leaf", "Soybean leaf",
-            "Squash Powdery mildew leaf", "Strawberry leaf", "Tomato Early blight leaf", "Tomato leaf",
-            "Tomato leaf bacterial spot", "Tomato leaf late blight", "Tomato leaf mosaic virus",
-            "Tomato leaf yellow virus", "Tomato mold leaf", "Tomato Septoria leaf spot"
-        ]
-        
-        # Define preprocessing transforms
-        self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-        ])
+    Every thread that calls into torch gets its own team of `torch.get_num_threads()`
+    workers, so N models running at once with the default (all cores each) would
+    start N x cores threads. With parallel execution each model gets its share.
+    A thread profile tuned on this host for the running worker count takes
+    precedence over the share, and also sets the inter-op pool. Returns the
+    intra-op thread count in effect.
+    """
+    tuned = None
+    if 'TORCH_THREADS_PER_MODEL' not in os.environ:
+        # Tune the shape this server runs, or threads_for finds no matching layout
+        profile = ensure_profile(streams=MODEL_STREAMS) if THREAD_AUTOTUNE else load_profile()
+        if profile is not None:
+            tuned = threads_for(profile, UVICORN_WORKERS, MODEL_STREAMS)
+            if tuned is None:
+                print(f"⚠️ WARNING: Thread profile has no layout for {UVICORN_WORKERS} workers x "
+                      f"{MODEL_STREAMS} models; re-run python -m services.thread_tuning tune")
     
-    def _load_model(self):
-        """Load the ResNet50 model (called on first use)"""
+    if tuned is not None:
+        torch.set_num_threads(tuned['threads'])
         try:
-            print(f"🔄 Loading {self.model_name} model for the first time...")
-            model = models.resnet50(weights=None)
-            model.fc = nn.Linear(model.fc.in_features, len(self.classes))
-            model.load_state_dict(torch.load(self.model_path, map_location=self.device))
-            model.to(self.device)
-            model.eval()
-            print(f"✅ {self.model_name} model loaded successfully with {len(self.classes)} classes")
+            torch.set_num_interop_threads(tuned['interop_threads'])
+        except RuntimeError:
+            pass  # Only settable before the first inter-op parallel work
+        thread_settings.update(source='profile', workers=UVICORN_WORKERS, streams=MODEL_STREAMS,
+                               tuned_images_per_second=tuned['images_per_second'])
+        print(f"🧵 Thread profile: {tuned['threads']} intra-op threads for {UVICORN_WORKERS} workers")
+    elif PARALLEL_MODELS:
+        torch.set_num_threads(TORCH_THREADS_PER_MODEL)
+        thread_settings['source'] = 'TORCH_THREADS_PER_MODEL'
+    thread_settings.update(intra_op=torch.get_num_threads(), interop=torch.get_num_interop_threads())
+    return torch.get_num_threads()
+
+
+def get_model_pool() -> Optional[ThreadPoolExecutor]:
+    """Shared pool that runs the disease models' forward passes side by side (None when disabled)"""
+    global _model_pool
+    if not PARALLEL_MODELS:
+        return None
+    if _model_pool is None:
+        with _model_pool_lock:
+            if _model_pool is None:
+                _model_pool = ThreadPoolExecutor(max_workers=CONCURRENT_MODELS, thread_name_prefix="model")
+    return _model_pool
+
+
+def to_rgb(image: Image.Image) -> Image.Image:
+    """Convert to RGB only when needed"""
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def image_to_tensor(image: Image.Image, size: int,
+                    normalize: Optional[Tuple[Tuple[float, ...], Tuple[float, ...]]] = None) -> torch.Tensor:
+    """
+    uint8 fast path equivalent to Resize((size, size)) + ToTensor (+ Normalize)
+    
+    The resize runs on the 8-bit RGB image, then a single float conversion and
+    in-place scaling produce the 1 x 3 x size x size input tensor.
+    """
+    if image.size != (size, size):
+        image = image.resize((size, size), Image.BILINEAR)
+    img_tensor = torch.from_numpy(np.array(image, dtype=np.uint8))
+    img_tensor = img_tensor.permute(2, 0, 1).unsqueeze(0).float().div_(255)
+    if normalize is not None:
+        mean, std = normalize
+        img_tensor.sub_(torch.tensor(mean).view(1, 3, 1, 1)).div_(torch.tensor(std).view(1, 3, 1, 1))
+    return img_tensor
+
+
+def preprocess_for_models(image: Image.Image, loaders) -> Dict[Tuple, torch.Tensor]:
+    """
+    Preprocess one image for several loaders, computing each distinct tensor once
+    
+    Loaders are grouped by transform signature; the RGB conversion happens once and
+    each resized uint8 image is shared by every signature with the same input size.
+    """
+    rgb = to_rgb(image)
+    resized = {}
+    tensors = {}
+    for loader in loaders:
+        signature = loader.transform_signature
+        if signature in tensors:
+            continue
+        size, normalize = signature
+        if size not in resized:
+            resized[size] = rgb if rgb.size == (size, size) else rgb.resize((size, size), Image.BILINEAR)
+        tensors[signature] = image_to_tensor(resized[size], size, normalize)
+    return tensors
+
+
+def quantized_model_path(model_path: str) -> Path:
+    """Location of the INT8 TorchScript artifact for a checkpoint"""
+    path = Path(model_path)
+    return path.with_name(f"{path.stem}_int8.pt")
+
+
+def quantized_source_path(model_path: str) -> Path:
+    """Record of the checkpoint and manifest version an INT8 artifact was built from"""
+    path = Path(model_path)
+    return path.with_name(f"{path.stem}_int8.json")
+
+
+def quantized_source_tag(model_path: str, version: str) -> str:
+    """Changes when the checkpoint is replaced or its manifest version is bumped"""
+    return model_version(model_path, extra=version)
+
+
+def write_quantized_source(model_path: str, version: str):
+    """Stamp a freshly built INT8 artifact with what it was quantized from"""
+    quantized_source_path(model_path).write_text(json.dumps({
+        'checkpoint': Path(model_path).name,
+        'version': version,
+        'source': quantized_source_tag(model_path, version)
+    }, indent=2), encoding="utf-8")
+
+
+def load_quantized_model(model_path: str, version: str):
+    """
+    Load the INT8 artifact for a checkpoint, or return None if it was never built
+    or was built from another checkpoint or manifest version
+    """
+    path = quantized_model_path(model_path)
+    if not path.exists():
+        print(f"⚠️ WARNING: {path.name} not found, falling back to FP32")
+        return None
+    try:
+        built_from = json.loads(quantized_source_path(model_path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        built_from = {}
+    if built_from.get('source') != quantized_source_tag(model_path, version):
+        print(f"⚠️ WARNING: {path.name} is stale (built from {built_from.get('checkpoint', 'an unknown checkpoint')} "
+              f"version {built_from.get('version', '?')}, serving version {version}); re-run "
+              f"services.model_quantization, falling back to FP32")
+        return None
+    torch.backends.quantized.engine = QUANTIZED_ENGINE
+    model = torch.jit.load(str(path), map_location="cpu")
+    model.eval()
+    return model
+
+
+def load_serving_model(loader):
+    """
+    Load a disease model for serving, in order of preference: the INT8 artifact
+    (when QUANTIZED_INFERENCE is set), the exported ONNX/TorchScript artifact (when
+    INFERENCE_BACKEND is not eager) and finally the eager PyTorch checkpoint
+    """
+    print(f"🔄 Loading {loader.model_name} model for the first time...")
+    
+    if QUANTIZED_INFERENCE:
+        quantized = load_quantized_model(loader.model_path, loader.version)
+        if quantized is not None:
+            loader.device = torch.device("cpu")  # INT8 kernels are CPU-only
+            print(f"✅ {loader.model_name} INT8 model loaded with {len(loader.classes)} classes")
+            return quantized
+    
+    if INFERENCE_BACKEND != 'eager':
+        model = load_backend_model(
+            loader.model_path, INFERENCE_BACKEND, loader.input_size,
+            loader._load_eager_model, device=loader.device
+        )
+        if model is not None:
+            if isinstance(model, OnnxRuntimeModel):
+                loader.device = torch.device("cpu")
+            print(f"✅ {loader.model_name} model loaded via {type(model).__name__} with {len(loader.classes)} classes")
             return model
-        except Exception as e:
-            print(f"❌ Error loading {self.model_name} model: {e}")
-            raise
     
-    def get_model(self):
-        """Get model instance, loading it if necessary (lazy loading)"""
-        if self._model is None:
-            self._model = self._load_model()
-        return self._model
+    model = loader._load_eager_model()
+    print(f"✅ {loader.model_name} model loaded successfully with {len(loader.classes)} classes")
+    return model
+
+
+def predict_tensor_batch(model, img_tensor: torch.Tensor, model_name: str,
+                         classes: List[str]) -> List[Dict]:
+    """Run one forward pass over an N x C x H x W batch and build a result per image"""
+    with torch.no_grad():
+        outputs = model(img_tensor)
+        probabilities = torch.nn.functional.softmax(outputs, dim=1)
     
-    def preprocess_image(self, image: Image.Image) -> torch.Tensor:
-        """Preprocess PIL Image for model input"""
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        return self.transform(image).unsqueeze(0).to(self.device)
+    confidences, predicted_idx = torch.max(probabilities, 1)
+    top5_prob, top5_idx = torch.topk(probabilities, min(5, len(classes)), dim=1)
     
-    def predict(self, image: Image.Image) -> Dict:
-        """Predict disease/pest from image"""
-        try:
-            model = self.get_model()  # Lazy load on first prediction
-            img_tensor = self.preprocess_image(image)
-            
-            with torch.no_grad():
-                outputs = model(img_tensor)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)[0]
-            
-            confidence, predicted_idx = torch.max(probabilities, 0)
-            predicted_class = self.classes[predicted_idx.item()]
-            
-            # Get top 5 predictions
-            top5_prob, top5_idx = torch.topk(probabilities, min(5, len(self.classes)))
-            top5_predictions = {
-                self.classes[idx.item()]: float(prob.item()) 
-                for idx, prob in zip(top5_idx, top5_prob)
-            }
-            
-            return {
-                'success': True,
-                'model': self.model_name,
-                'prediction': predicted_class,
-                'confidence': float(confidence.item()),
-                'all_predictions': top5_predictions
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'model': self.model_name,
-                'error': str(e)
-            }
+    results = []
+    for row in range(probabilities.shape[0]):
+        # Get top 5 predictions
+        top5_predictions = {
+            classes[idx]: float(prob)
+            for idx, prob in zip(top5_idx[row].tolist(), top5_prob[row].tolist())
+        }
+        results.append({
+            'success': True,
+            'model': model_name,
+            'prediction': classes[predicted_idx[row].item()],
+            'confidence': float(confidences[row].item()),
+            'all_predictions': top5_predictions
+        })
+    return results
+
+
+def build_resnet50(num_classes: int) -> nn.Module:
+    model = models.resnet50(weights=None)
+    model.fc = nn.Linear(model.fc.in_features, num_classes)
+    return model
+
+
+def build_mobilenet_v3_small(num_classes: int) -> nn.Module:
+    model = models.mobilenet_v3_small(weights=None)
+    model.classifier[3] = nn.Linear(model.classifier[3].in_features, num_classes)
+    return model
+
 
+def build_mobilenet_v3_large(num_classes: int) -> nn.Module:
+    model = models.mobilenet_v3_large(weights=None)
+    model.classifier[3] = nn.Linear(model.classifier[3].in_features, num_classes)
+    return model
 
-class MaizeModelLoader:
-    """Loads and manages the Maize ResNet50 model (11 classes) - Lazy Loading"""
+
+def build_efficientnet_b0(num_classes: int) -> nn.Module:
+    model = models.efficientnet_b0(weights=None)
+    model.classifier[1] = nn.Linear(model.classifier[1].in_features, num_classes)
+    return model
+
+
+# Architectures a manifest can name, built untrained with the manifest's class count
+ARCHITECTURES = {
+    'resnet50': build_resnet50,
+    'mobilenet_v3_small': build_mobilenet_v3_small,
+    'mobilenet_v3_large': build_mobilenet_v3_large,
+    'efficientnet_b0': build_efficientnet_b0,
+}
+
+
+class ManifestModelLoader:
+    """
+    Loads and serves an image classifier described by a model manifest - Lazy Loading
     
-    def __init__(self, model_path: str):
+    The manifest (models/manifests/<name>.json) supplies the checkpoint path,
+    architecture, class list, preprocessing and version; see services/model_registry.py.
+    """
+    
+    manifest_name: Optional[str] = None  # Default manifest for subclasses
+    
+    def __init__(self, model_path: Optional[str] = None, manifest: Optional[ModelManifest] = None):
+        if manifest is None:
+            if self.manifest_name is None:
+                raise ValueError("A manifest is required")
+            manifest = load_manifest(self.manifest_name)
+        self.manifest = manifest
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self._model = None  # Lazy loading - model not loaded yet
-        self.model_path = model_path
-        self.model_name = "Maize"
-        
-        # 11 Maize classes
-        self.classes = [
-            'fall army worm', 'healthy', 'herbicide burn', 'magnesium deficiency',
-            'maize streak', 'multiple', 'nitrogen deficiency', 'potassium deficiency',
-            'stalk borer', 'sulphur deficiency', 'zinc deficiency'
-        ]
+        self._load_lock = threading.Lock()  # Single-flight: one load even under concurrent first requests
+        self.reload_hook: Optional[Callable[[], Any]] = None  # Set by ModelLifecycleManager on eviction
+        self.model_path = model_path or str(manifest.path)
+        self.model_name = manifest.display_name
+        self.version = manifest.version
+        self.classes = manifest.classes
         
-        # Define preprocessing transforms
-        self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-        ])
+        # Preprocessing: Resize((input_size, input_size)) + ToTensor (+ Normalize)
+        self.input_size = manifest.input_size
+        self.normalize = manifest.normalize
     
     def _load_model(self):
-        """Load the full ResNet50 model (called on first use)"""
+        """Load the model with the configured inference backend (called on first use)"""
+        return load_serving_model(self)
+    
+    def _load_eager_model(self):
+        """Load the checkpoint as a PyTorch module"""
         try:
-            print(f"🔄 Loading {self.model_name} model for the first time...")
-            # Load full model (saved with torch.save(model, ...))
-            model = torch.load(self.model_path, map_location=self.device, weights_only=False)
+            if self.manifest.checkpoint_format == 'full_module' and not has_shared_weights(self.model_path):
+                # Full model saved with torch.save(model, ...)
+                model = torch.load(self.model_path, map_location=self.device, weights_only=False)
+            else:
+                if self.manifest.architecture not in ARCHITECTURES:
+                    raise ValueError(f"Unknown architecture {self.manifest.architecture!r}")
+                model = ARCHITECTURES[self.manifest.architecture](len(self.classes))
+                # Converted state dicts are memory-mapped on CPU
+                state_dict, mmapped = load_state_dict(self.model_path, self.device)
+                model.load_state_dict(state_dict, assign=mmapped)
             model.to(self.device)
             model.eval()
-            print(f"✅ {self.model_name} model loaded successfully with {len(self.classes)} classes")
             return model
         except Exception as e:
             print(f"❌ Error loading {self.model_name} model: {e}")
             raise
     
+    def load_fp32(self):
+        """
+        The eager FP32 checkpoint, whatever QUANTIZED_INFERENCE and INFERENCE_BACKEND
+        say; for tools that need the reference weights rather than the serving model
+        """
+        return self._load_eager_model()
+    
     def get_model(self):
         """Get model instance, loading it if necessary (lazy loading)"""
         if self._model is None:
-            self._model = self._load_model()
+            # Evicted by the lifecycle manager: reload through it so its memory
+            # budget and reload counters see the weights come back
+            reload_hook, self.reload_hook = self.reload_hook, None
+            if reload_hook is not None:
+                reload_hook()
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load_model()
         return self._model
     
+    def unload(self):
+        """Drop the weights to free memory; the next prediction loads them again"""
+        with self._load_lock:
+            self._model = None
+    
+    @property
+    def transform_signature(self) -> Tuple:
+        """Models with equal signatures can share one preprocessed tensor"""
+        return (self.input_size, self.normalize)
+    
+    def warmup(self):
+        """Run a dummy forward pass so the first real request does not pay for lazy init"""
+        self.predict_tensor(torch.zeros(1, 3, self.input_size, self.input_size))
+    
     def preprocess_image(self, image: Image.Image) -> torch.Tensor:
         """Preprocess PIL Image for model input"""
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        return self.transform(image).unsqueeze(0).to(self.device)
+        return image_to_tensor(to_rgb(image), self.input_size, self.normalize).to(self.device)
     
     def predict(self, image: Image.Image) -> Dict:
-        """Predict maize disease/pest from image"""
+        """Predict disease/pest from image"""
+        return self.predict_batch([image])[0]
+    
+    def predict_batch(self, images: List[Image.Image]) -> List[Dict]:
+        """Predict a list of images with a single batched forward pass"""
+        try:
+            img_tensor = torch.cat([self.preprocess_image(image) for image in images])
+        except Exception as e:
+            return [
+                {'success': False, 'model': self.model_name, 'error': str(e)}
+                for _ in images
+            ]
+        return self.predict_tensor(img_tensor)
+    
+    def predict_tensor(self, img_tensor: torch.Tensor) -> List[Dict]:
+        """Predict an already preprocessed N x C x H x W batch"""
         try:
             model = self.get_model()  # Lazy load on first prediction
-            img_tensor = self.preprocess_image(image)
-            
-            with torch.no_grad():
-                outputs = model(img_tensor)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)[0]
-            
-            confidence, predicted_idx = torch.max(probabilities, 0)
-            predicted_class = self.classes[predicted_idx.item()]
-            
-            # Get top 5 predictions
-            top5_prob, top5_idx = torch.topk(probabilities, min(5, len(self.classes)))
-            top5_predictions = {
-                self.classes[idx.item()]: float(prob.item()) 
-                for idx, prob in zip(top5_idx, top5_prob)
-            }
-            
-            return {
-                'success': True,
-                'model': self.model_name,
-                'prediction': predicted_class,
-                'confidence': float(confidence.item()),
-                'all_predictions': top5_predictions
-            }
+            results = predict_tensor_batch(model, img_tensor.to(self.device), self.model_name, self.classes)
+            for result in results:
+                result['model_version'] = self.version
+            return results
         except Exception as e:
+            return [
+                {'success': False, 'model': self.model_name, 'error': str(e)}
+                for _ in range(img_tensor.shape[0])
+            ]
+
+
+class PlantDocModelLoader(ManifestModelLoader):
+    """PlantDoc ResNet50 model (29 classes)"""
+    manifest_name = "plantdoc"
+
+
+class MaizeModelLoader(ManifestModelLoader):
+    """Maize ResNet50 model (11 classes), stored as a full pickled module"""
+    manifest_name = "maize"
+
+
+class RiceModelLoader(ManifestModelLoader):
+    """Rice ResNet50 model (10 classes), 256 px input without normalization"""
+    manifest_name = "rice"
+
+
+class CropRouterLoader(ManifestModelLoader):
+    """MobileNetV3-Small crop-family router (maize / plantdoc / rice)"""
+    manifest_name = "router"
+    
+    def warmup(self):
+        """Run a dummy forward pass so the first real request does not pay for lazy init"""
+        self.route(torch.zeros(1, 3, self.input_size, self.input_size))
+    
+    def route(self, img_tensor: torch.Tensor) -> List[Tuple[str, float]]:
+        """Predict the crop family and its probability for each image in the batch"""
+        model = self.get_model()
+        with torch.no_grad():
+            probabilities = torch.nn.functional.softmax(model(img_tensor.to(self.device)), dim=1)
+        confidences, indices = torch.max(probabilities, 1)
+        return [
+            (self.classes[index], float(confidence))
+            for index, confidence in zip(indices.tolist(), confidences.tolist())
+        ]
+
+
+def build_loader(manifest: ModelManifest) -> ManifestModelLoader:
+    """Loader for a manifest, by its kind"""
+    if manifest.kind == 'router':
+        return CropRouterLoader(manifest=manifest)
+    return ManifestModelLoader(manifest=manifest)
+
+
+class TierStats:
+    """Images answered by a fast-tier student vs escalated to its teacher"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.escalated = 0
+        self.teacher_failures = 0
+    
+    def record(self, images: int, escalated: int, teacher_failed: bool = False):
+        with self._lock:
+            self.images += images
+            self.escalated += escalated
+            self.teacher_failures += teacher_failed
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
             return {
-                'success': False,
-                'model': self.model_name,
-                'error': str(e)
+                'images': self.images,
+                'escalated': self.escalated,
+                'escalation_rate': round(self.escalated / self.images, 4) if self.images else 0.0,
+                'teacher_failures': self.teacher_failures
             }
 
 
-class RiceModelLoader:
-    """Loads and manages the Rice ResNet50 model (10 classes) - Lazy Loading"""
+class CascadeModelLoader:
+    """
+    Fast tier: a distilled student answers, its teacher only when the student is unsure
     
-    def __init__(self, model_path: str):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self._model = None  # Lazy loading - model not loaded yet
-        self.model_path = model_path
-        self.model_name = "Rice"
-        
-        # 10 Rice classes
-        self.classes = [
-            'bacterial_leaf_blight',
-            'bacterial_leaf_streak',
-            'bacterial_panicle_blight',
-            'blast',
-            'brown_spot',
-            'dead_heart',
-            'downy_mildew',
-            'hispa',
-            'normal',
-            'tungro'
-        ]
-        
-        # Define preprocessing transforms
-        self.transform = transforms.Compose([
-            transforms.Resize((256, 256)),
-            transforms.ToTensor(),
-        ])
+    The student (a MobileNetV3/EfficientNet-B0 distilled from the ResNet50 teacher,
+    see models/Context/distill_student.py) runs on every image. Images whose
+    student confidence is below `threshold` are re-run through the teacher, and the
+    teacher's answer replaces the student's. The teacher comes from `get_teacher`
+    on each escalation, so it is only loaded once something escalates and can be
+    evicted or hot-swapped independently. Both must share classes and
+    preprocessing so the preprocessed batch can go to either.
+    """
     
-    def _load_model(self):
-        """Load the ResNet50 model (called on first use)"""
-        try:
-            print(f"🔄 Loading {self.model_name} model for the first time...")
-            model = models.resnet50(weights=None)
-            model.fc = nn.Linear(model.fc.in_features, len(self.classes))
-            model.load_state_dict(torch.load(self.model_path, map_location=self.device))
-            model.to(self.device)
-            model.eval()
-            print(f"✅ {self.model_name} model loaded successfully with {len(self.classes)} classes")
-            return model
-        except Exception as e:
-            print(f"❌ Error loading {self.model_name} model: {e}")
-            raise
+    def __init__(self, student: ManifestModelLoader, get_teacher: Callable[[], ManifestModelLoader],
+                 threshold: float = 0.85, stats: Optional[TierStats] = None):
+        self.student = student
+        self.get_teacher = get_teacher
+        self.threshold = threshold
+        self.stats = stats or TierStats()
+        self.model_name = student.model_name
+        self.classes = student.classes
+        self.version = student.version
     
-    def get_model(self):
-        """Get model instance, loading it if necessary (lazy loading)"""
-        if self._model is None:
-            self._model = self._load_model()
-        return self._model
+    @property
+    def transform_signature(self) -> Tuple:
+        return self.student.transform_signature
+    
+    def warmup(self):
+        self.student.warmup()
     
     def preprocess_image(self, image: Image.Image) -> torch.Tensor:
-        """Preprocess PIL Image for model input"""
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        return self.transform(image).unsqueeze(0).to(self.device)
+        return self.student.preprocess_image(image)
     
     def predict(self, image: Image.Image) -> Dict:
-        """Predict rice disease/pest from image"""
+        return self.predict_batch([image])[0]
+    
+    def predict_batch(self, images: List[Image.Image]) -> List[Dict]:
         try:
-            model = self.get_model()  # Lazy load on first prediction
-            img_tensor = self.preprocess_image(image)
-            
-            with torch.no_grad():
-                outputs = model(img_tensor)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)[0]
-            
-            confidence, predicted_idx = torch.max(probabilities, 0)
-            predicted_class = self.classes[predicted_idx.item()]
-            
-            # Get top 5 predictions
-            top5_prob, top5_idx = torch.topk(probabilities, min(5, len(self.classes)))
-            top5_predictions = {
-                self.classes[idx.item()]: float(prob.item()) 
-                for idx, prob in zip(top5_idx, top5_prob)
-            }
-            
-            return {
-                'success': True,
-                'model': self.model_name,
-                'prediction': predicted_class,
-                'confidence': float(confidence.item()),
-                'all_predictions': top5_predictions
-            }
+            img_tensor = torch.cat([self.preprocess_image(image) for image in images])
         except Exception as e:
-            return {
-                'success': False,
-                'model': self.model_name,
-                'error': str(e)
-            }
+            return [
+                {'success': False, 'model': self.model_name, 'error': str(e)}
+                for _ in images
+            ]
+        return self.predict_tensor(img_tensor)
+    
+    def predict_tensor(self, img_tensor: torch.Tensor) -> List[Dict]:
+        """Student pass over the batch, then one teacher pass over the unsure rows"""
+        results = self.student.predict_tensor(img_tensor)
+        unsure = [
+            row for row, result in enumerate(results)
+            if not result.get('success') or result['confidence'] < self.threshold
+        ]
+        for result in results:
+            result['tier'] = 'fast'
+        if not unsure:
+            self.stats.record(len(results), 0)
+            return results
+        
+        try:
+            teacher = self.get_teacher()
+            if teacher is None:
+                raise RuntimeError("it failed to load")
+            if teacher.transform_signature != self.transform_signature or teacher.classes != self.classes:
+                raise ValueError(f"{teacher.model_name} does not match its student's classes or preprocessing")
+            escalated = teacher.predict_tensor(img_tensor[unsure])
+        except Exception as e:
+            # The student's answers stand; a failed student row stays failed
+            print(f"⚠️ WARNING: Teacher for {self.model_name} unavailable, keeping student results: {e}")
+            self.stats.record(len(results), 0, teacher_failed=True)
+            return results
+        
+        for row, result in zip(unsure, escalated):
+            if result.get('success'):
+                results[row] = {**result, 'tier': 'escalated', 'student_confidence': results[row].get('confidence')}
+        self.stats.record(len(results), len(unsure))
+        return results
 
 
 class MultiModelDetector:
-    """Runs inference on all models and selects the best prediction"""
+    """
+    Runs inference on all models and selects the best prediction
+    
+    With a crop router attached, each image first goes through the router; when it
+    is confident enough only the matching specialist runs, otherwise all models
+    run as before. A model passed as None (it failed to load) is skipped and the
+    others serve. With a `pool` the models' forward passes run concurrently
+    (torch releases the GIL inside its kernels), so latency approaches the
+    slowest model rather than the sum of all three.
+    """
     
-    def __init__(self, plantdoc_model, maize_model, rice_model):
+    def __init__(self, plantdoc_model, maize_model, rice_model,
+                 router=None, router_threshold: float = 0.8,
+                 pool: Optional[ThreadPoolExecutor] = None):
         self.models = {
             'plantdoc': plantdoc_model,
             'maize': maize_model,
             'rice': rice_model
         }
+        self.router = router
+        self.router_threshold = router_threshold
+        self.pool = pool
     
     def predict(self, image: Image.Image) -> Dict:
         """
         Run inference on all models and return the prediction with highest confidence
         """
+        return self.predict_batch([image])[0]
+    
+    def predict_batch(self, images: List[Image.Image]) -> List[Dict]:
+        """
+        Run inference for a list of images, stacking the images routed to each model
+        into one tensor per model, and return the best prediction for each image
+        """
         try:
-            results = []
+            per_image_results = [[] for _ in images]
+            loaders = {key: model for key, model in self.models.items() if model is not None}
             
-            # Run prediction on all models
-            for model_key, model in self.models.items():
-                if model is not None:
-                    result = model.predict(image)
-                    if result.get('success'):
-                        results.append(result)
+            # Decode and preprocess each image once per distinct transform signature
+            preprocessors = list(loaders.values()) + ([self.router] if self.router is not None else [])
+            shared = [preprocess_for_models(image, preprocessors) for image in images]
             
-            if not results:
-                return {
-                    'success': False,
-                    'error': 'No models produced valid predictions'
-                }
+            # Decide which models each image needs
+            routes = self._route(shared, loaders)
             
-            # Select the result with highest confidence
-            best_result = max(results, key=lambda x: x.get('confidence', 0))
+            # One batched forward pass per model over the images routed to it
+            jobs = []
+            for key, model in loaders.items():
+                indices = [index for index, route in enumerate(routes) if route is None or route[0] == key]
+                if not indices:
+                    continue
+                signature = model.transform_signature
+                batch = torch.cat([shared[index][signature] for index in indices])
+                jobs.append((indices, model, batch))
             
-            # Add information about all model predictions
-            all_model_results = {
-                result['model']: {
-                    'prediction': result['prediction'],
-                    'confidence': result['confidence']
-                }
-                for result in results
-            }
+            # Side by side on the model pool when more than one model has work
+            if self.pool is not None and len(jobs) > 1:
+                futures = [self.pool.submit(model.predict_tensor, batch) for _, model, batch in jobs]
+                outputs = [future.result() for future in futures]
+            else:
+                outputs = [model.predict_tensor(batch) for _, model, batch in jobs]
             
-            best_result['all_model_results'] = all_model_results
-            best_result['selected_model'] = best_result['model']
+            for (indices, _, _), results in zip(jobs, outputs):
+                for index, result in zip(indices, results):
+                    if result.get('success'):
+                        per_image_results[index].append(result)
             
-            return best_result
+            best = [self._select_best(results) for results in per_image_results]
+            if self.router is not None:
+                for result, route in zip(best, routes):
+                    result['routed'] = route is not None
+                    if route is not None:
+                        result['router_confidence'] = route[1]
+            return best
             
         except Exception as e:
+            return [
+                {'success': False, 'error': f'Multi-model prediction error: {str(e)}'}
+                for _ in images
+            ]
+    
+    def _route(self, shared: List[Dict], loaders: Dict) -> List[Optional[Tuple[str, float]]]:
+        """(family, confidence) per image, or None where all models must run"""
+        if self.router is None:
+            return [None] * len(shared)
+        try:
+            batch = torch.cat([tensors[self.router.transform_signature] for tensors in shared])
+            decisions = self.router.route(batch)
+        except Exception as e:
+            print(f"⚠️ WARNING: Crop router failed, running all models: {e}")
+            return [None] * len(shared)
+        return [
+            (family, confidence)
+            if confidence >= self.router_threshold and family in loaders else None
+            for family, confidence in decisions
+        ]
+    
+    @staticmethod
+    def _select_best(results: List[Dict]) -> Dict:
+        """Pick the most confident model result and attach the per-model summary"""
+        if not results:
             return {
                 'success': False,
-                'error': f'Multi-model prediction error: {str(e)}'
+                'error': 'No models produced valid predictions'
+            }
+        
+        # Select the result with highest confidence
+        best_result = dict(max(results, key=lambda x: x.get('confidence', 0)))
+        
+        # Add information about all model predictions
+        all_model_results = {
+            result['model']: {
+                'prediction': result['prediction'],
+                'confidence': result['confidence']
             }
+            for result in results
+        }
+        
+        best_result['all_model_results'] = all_model_results
+        best_result['selected_model'] = best_result['model']
+        
+        return best_result
 
 
 # Legacy class for backward compatibility
 class PestModelLoader:
     """Legacy pest detection model (scikit-learn) - Lazy Loading"""
     
+    input_size = 224
+    
     def __init__(self, model_path: str):
         self._model = None  # Lazy loading - model not loaded yet
+        self._load_lock = threading.Lock()  # Single-flight: one load even under concurrent first requests
+        self.reload_hook: Optional[Callable[[], Any]] = None  # Set by ModelLifecycleManager on eviction
+        self._buffers = threading.local()  # Feature matrices, one per inference thread
         self.model_path = model_path
     
     def _load_model(self):
         """Load the scikit-learn model (called on first use)"""
         try:
             print(f"🔄 Loading Legacy Pest model for the first time...")
-            model = joblib.load(self.model_path)
+            model = load_joblib(self.model_path)  # NumPy arrays memory-mapped, shared across workers
             print(f"✅ Legacy Pest model loaded successfully")
             return model
         except Exception as e:
@@ -354,49 +717,163 @@ class PestModelLoader:
     def get_model(self):
         """Get model instance, loading it if necessary (lazy loading)"""
         if self._model is None:
-            self._model = self._load_model()
+            # Evicted by the lifecycle manager: reload through it so its memory
+            # budget and reload counters see the weights come back
+            reload_hook, self.reload_hook = self.reload_hook, None
+            if reload_hook is not None:
+                reload_hook()
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load_model()
         return self._model
     
+    def unload(self):
+        """Drop the weights to free memory; the next prediction loads them again"""
+        with self._load_lock:
+            self._model = None
+    
+    def warmup(self):
+        """Run a dummy prediction so the first real request does not pay for lazy init"""
+        self.predict(Image.new('RGB', (self.input_size, self.input_size)))
+    
+    def _input_buffer(self, count: int) -> np.ndarray:
+        """Per-thread float32 feature matrix, grown on demand and reused across calls"""
+        buffer = getattr(self._buffers, 'features', None)
+        if buffer is None or buffer.shape[0] < count:
+            buffer = np.empty((count, self.input_size * self.input_size * 3), dtype=np.float32)
+            self._buffers.features = buffer
+        return buffer[:count]
+    
     def predict(self, image: Image.Image) -> Dict:
         """Predict pest from image"""
+        return self.predict_batch([image])[0]
+    
+    def predict_batch(self, images: List[Image.Image]) -> List[Dict]:
+        """
+        Predict pests for several images with one pass over the model
+        
+        Pixels are scaled into a reused float32 feature matrix (one row per image)
+        and a single predict_proba call gives both the prediction (its argmax, which
+        is what predict returns for a classifier) and the confidences.
+        """
+        if not images:
+            return []
         try:
             model = self.get_model()  # Lazy load on first prediction
             
-            image = image.convert('RGB')
-            image = image.resize((224, 224))
-            
-            img_array = np.array(image)
-            img_flattened = img_array.flatten().reshape(1, -1)
-            img_normalized = img_flattened / 255.0
+            features = self._input_buffer(len(images))
+            for row, image in zip(features, images):
+                image = to_rgb(image)
+                if image.size != (self.input_size, self.input_size):
+                    image = image.resize((self.input_size, self.input_size))
+                pixels = np.asarray(image, dtype=np.uint8).reshape(-1)
+                np.divide(pixels, np.float32(255.0), out=row, dtype=np.float32)
             
-            prediction = model.predict(img_normalized)[0]
+            if not hasattr(model, 'predict_proba'):
+                return [
+                    {'success': True, 'prediction': str(prediction), 'confidence': 0.85, 'all_predictions': {}}
+                    for prediction in model.predict(features)
+                ]
             
-            confidence = 0.85
-            all_predictions = {}
+            probabilities = model.predict_proba(features)
+            classes = model.classes_
+            best = probabilities.argmax(axis=1)
+            top = np.argsort(probabilities, axis=1)[:, -5:][:, ::-1]
             
-            if hasattr(model, 'predict_proba'):
-                probabilities = model.predict_proba(img_normalized)[0]
-                classes = model.classes_
-                pred_idx = np.where(classes == prediction)[0][0]
-                confidence = float(probabilities[pred_idx])
-                
-                top_indices = np.argsort(probabilities)[-5:][::-1]
-                all_predictions = {
-                    str(classes[i]): float(probabilities[i]) 
-                    for i in top_indices
+            return [
+                {
+                    'success': True,
+                    'prediction': str(classes[best[i]]),
+                    'confidence': float(probabilities[i, best[i]]),
+                    'all_predictions': {
+                        str(classes[j]): float(probabilities[i, j])
+                        for j in top[i]
+                    }
                 }
-            
-            return {
-                'success': True,
-                'prediction': str(prediction),
-                'confidence': confidence,
-                'all_predictions': all_predictions
-            }
+                for i in range(len(images))
+            ]
         except Exception as e:
-            return {
-                'success': False,
-                'error': str(e)
-            }
+            return [
+                {'success': False, 'error': str(e)}
+                for _ in images
+            ]
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an upload exceeds the byte or pixel limits"""
+
+
+class MemoryviewReader(io.RawIOBase):
+    """Read-only, seekable file over a memoryview, so Pillow can decode without a copy"""
+    
+    def __init__(self, view: memoryview):
+        self._view = view.cast('B') if view.format != 'B' else view
+        self._pos = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+    
+    def readinto(self, target) -> int:
+        count = min(len(target), len(self._view) - self._pos)
+        if count <= 0:
+            return 0
+        target[:count] = self._view[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+
+def decode_image(source, target_size: Optional[int] = DECODE_TARGET_SIZE) -> Image.Image:
+    """
+    Decode an uploaded image once, with limits, at the resolution the models need
+    
+    `source` is the encoded image as bytes, a memoryview (read in place) or a
+    seekable binary file such as a spooled upload.
+    
+    Byte and pixel limits are checked before any pixel data is decoded (the pixel
+    count comes from the header). JPEGs are decoded in draft mode, letting libjpeg
+    scale by 1/2, 1/4 or 1/8 in the DCT so both sides stay >= target_size; a 12 MP
+    photo is then decoded at about 0.2-0.75 MP. EXIF orientation is applied here
+    once so every model sees an upright image.
+    """
+    if hasattr(source, 'read'):
+        stream = source
+        size = stream.seek(0, io.SEEK_END)
+        stream.seek(0)
+    elif isinstance(source, memoryview):
+        stream = MemoryviewReader(source)
+        size = source.nbytes
+    else:
+        stream = io.BytesIO(source)  # Shares the buffer of a bytes object
+        size = len(source)
+    
+    if size > MAX_IMAGE_BYTES:
+        raise ImageTooLargeError(f"Image is {size} bytes; the limit is {MAX_IMAGE_BYTES}")
+    
+    image = Image.open(stream)
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ImageTooLargeError(f"Image is {width}x{height} pixels; the limit is {MAX_IMAGE_PIXELS} pixels")
+    
+    if DECODE_DRAFT and target_size and image.format == 'JPEG':
+        image.draft('RGB', (target_size, target_size))
+    
+    orientation = image.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    if orientation != 1:
+        image = ImageOps.exif_transpose(image)
+    else:
+        image.load()
+    return image
 
 
 def load_image_from_base64(base64_string: str) -> Image.Image:
@@ -404,11 +881,14 @@ def load_image_from_base64(base64_string: str) -> Image.Image:
     if ',' in base64_string:
         base64_string = base64_string.split(',')[1]
     
+    # Reject oversized payloads before allocating the decoded bytes
+    if len(base64_string) * 3 // 4 > MAX_IMAGE_BYTES:
+        raise ImageTooLargeError(f"Image exceeds the {MAX_IMAGE_BYTES} byte limit")
+    
     image_data = base64.b64decode(base64_string)
-    image = Image.open(io.BytesIO(image_data))
-    return image
+    return decode_image(image_data)
 
 
-def load_image_from_bytes(image_bytes: bytes) -> Image.Image:
-    """Convert bytes to PIL Image"""
-    return Image.open(io.BytesIO(image_bytes))
+def load_image_from_bytes(image_bytes) -> Image.Image:
+    """Convert bytes (or a memoryview / binary file over them) to PIL Image"""
+    return decode_image(image_bytes)
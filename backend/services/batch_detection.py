@@ -0,0 +1,133 @@
+"""
+Batch Detection Pipeline
+Parallel decode and batched inference for many images, streamed per image as results complete
+"""
+
+import asyncio
+import io
+import json
+import logging
+import zipfile
+from concurrent.futures import Executor
+from pathlib import PurePosixPath
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+from .inference_executor import InferenceSaturatedError
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".jfif", ".tif", ".tiff"}
+
+
+class BatchLimitError(ValueError):
+    """Raised when a batch upload exceeds the image count or size limits"""
+
+
+def extract_zip_images(
+    data: Union[bytes, memoryview, BinaryIO],
+    max_images: int,
+    max_image_bytes: int,
+    max_total_bytes: Optional[int] = None
+) -> List[Tuple[str, bytes]]:
+    """
+    Read image members from a zip archive, checking limits before decompressing
+
+    Sizes come from the zip directory, so an archive with too many or too large
+    members, or more uncompressed bytes than `max_total_bytes`, is rejected
+    without inflating it. `data` is the archive's bytes or a seekable file.
+    """
+    source = data if hasattr(data, 'read') else io.BytesIO(data)
+    with zipfile.ZipFile(source) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and PurePosixPath(info.filename).suffix.lower() in IMAGE_SUFFIXES
+            and not PurePosixPath(info.filename).name.startswith(".")
+        ]
+        if len(members) > max_images:
+            raise BatchLimitError(f"Archive holds {len(members)} images; the limit is {max_images}")
+        oversized = [info.filename for info in members if info.file_size > max_image_bytes]
+        if oversized:
+            raise BatchLimitError(f"{oversized[0]} exceeds the {max_image_bytes} byte limit")
+        total = sum(info.file_size for info in members)
+        if max_total_bytes is not None and total > max_total_bytes:
+            raise BatchLimitError(f"Archive images total {total} bytes; the limit is {max_total_bytes}")
+        return [(info.filename, archive.read(info)) for info in members]
+
+
+def ndjson_line(record: Dict) -> bytes:
+    return (json.dumps(record) + "\n").encode()
+
+
+async def stream_batch_detection(
+    entries: List[Tuple[str, bytes]],
+    decode_fn: Callable,
+    predict_batch: Callable[[List], Awaitable[List[Dict]]],
+    decode_pool: Executor,
+    batch_size: int = 16
+) -> AsyncIterator[Dict]:
+    """
+    Decode entries in parallel and run them through `predict_batch` in batches
+
+    Images are batched in the order their decodes finish, so a slow decode never
+    holds up the rest. Each yielded record carries the entry's `index` and
+    `filename` plus the detection result (or a decode error).
+
+    Args:
+        entries: (filename, encoded bytes) pairs
+        decode_fn: Turns encoded bytes into a PIL image (runs on `decode_pool`)
+        predict_batch: Awaitable batch inference over a list of images
+        decode_pool: Executor for the decodes
+        batch_size: Images per inference batch
+    """
+    loop = asyncio.get_running_loop()
+
+    async def decode(index: int, filename: str, data: bytes):
+        try:
+            return index, filename, await loop.run_in_executor(decode_pool, decode_fn, data), None
+        except Exception as e:
+            return index, filename, None, str(e)
+
+    pending = [asyncio.ensure_future(decode(i, name, data)) for i, (name, data) in enumerate(entries)]
+    ready: List[Tuple[int, str, object]] = []
+
+    try:
+        for next_decoded in asyncio.as_completed(pending):
+            index, filename, image, error = await next_decoded
+            if error is not None:
+                yield {'index': index, 'filename': filename, 'success': False, 'error': f"Decode error: {error}"}
+            else:
+                ready.append((index, filename, image))
+
+            if len(ready) >= batch_size:
+                async for record in _run_batch(ready, predict_batch):
+                    yield record
+                ready = []
+
+        if ready:
+            async for record in _run_batch(ready, predict_batch):
+                yield record
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _run_batch(ready: List[Tuple[int, str, object]],
+                     predict_batch: Callable[[List], Awaitable[List[Dict]]]) -> AsyncIterator[Dict]:
+    """Run one batch, waiting out executor saturation rather than failing mid-stream"""
+    images = [image for _, _, image in ready]
+    delay = 0.05
+    while True:
+        try:
+            results = await predict_batch(images)
+            break
+        except InferenceSaturatedError:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+        except Exception as e:
+            logger.error(f"Batch of {len(images)} failed: {e}")
+            results = [{'success': False, 'error': str(e)} for _ in images]
+            break
+
+    for (index, filename, _), result in zip(ready, results):
+        yield {'index': index, 'filename': filename, **result}
@@ -0,0 +1,314 @@
+"""
+Compiled Random Forest
+Flattens a fitted RandomForestClassifier into packed NumPy arrays in one
+memory-mappable file, and scores it by advancing every (row, tree) pair one
+level per step, for the whole batch at once
+
+File layout (`<model stem>.forest` next to the pickle):
+
+    8 bytes   magic b"CFOREST1"
+    8 bytes   header length (little-endian uint64)
+    header    JSON: classes, n_features, n_trees, max_depth, array table
+    arrays    raw little-endian arrays, each 64-byte aligned
+
+Arrays, with nodes of all trees concatenated:
+
+    roots        int32  (n_trees,)        global index of each tree's root
+    feature      int32  (n_nodes,)        split feature (0 for leaves)
+    threshold    float64 (n_nodes,)       split threshold, as sklearn stores it
+    children     int32  (n_nodes, 2)      [right, left]; leaves point to themselves
+    leaf_id      int32  (n_nodes,)        row in leaf_values (-1 for split nodes)
+    leaf_values  float64 (n_leaves, n_classes)  each leaf's normalized class probabilities
+
+The arrays are mapped read-only, so loading is a header parse plus mmap, and
+every worker shares the pages. Scoring reproduces sklearn exactly:
+- X is cast to float32 and compared `<=` against the float64 thresholds, as the
+  tree code does.
+- Leaf probabilities are normalized the same way as
+  DecisionTreeClassifier.predict_proba.
+- The trees are summed in estimator order before dividing by the tree count.
+`compile` checks the result against sklearn bit for bit before writing.
+
+Usage (from the backend directory):
+    python -m services.compiled_forest compile
+    python -m services.compiled_forest compile --model ../models/crop_model.pkl --verify-rows 20000
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CFOREST1"
+ALIGNMENT = 64
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / "models"
+DATA_PATH = MODELS_DIR.parent / "data" / "Crop_recommendation.csv"
+
+# COMPILED_FOREST=0 serves the crop model from the sklearn pickle as before
+COMPILED_FOREST = os.getenv('COMPILED_FOREST', '1').lower() in ('1', 'true', 'yes')
+
+# Rows scored per pass, bounding the (rows x trees) index arrays
+CHUNK_ROWS = 4096
+# Up to this many rows, leaf probabilities are gathered for all trees and reduced
+# in one call; larger chunks add them tree by tree (same order, less memory)
+SMALL_BATCH_ROWS = 32
+# Traversal steps between dropping (row, tree) pairs that have reached a leaf
+COMPACT_EVERY = 4
+
+
+def compiled_forest_path(model_path) -> Path:
+    """Location of the compiled forest for a pickled model"""
+    path = Path(model_path)
+    return path.with_name(f"{path.stem}.forest")
+
+
+def has_compiled_forest(model_path) -> bool:
+    """True when a compiled forest exists and is not older than its pickle"""
+    compiled = compiled_forest_path(model_path)
+    if not COMPILED_FOREST or not compiled.exists():
+        return False
+    return not os.path.exists(model_path) or compiled.stat().st_mtime >= os.path.getmtime(model_path)
+
+
+class CompiledForest:
+    """
+    Flat-array random forest with the scoring interface of the sklearn model
+    (`predict_proba`, `predict`, `classes_`, `n_features_in_`)
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], classes, n_features: int, max_depth: int):
+        self.roots = arrays['roots'].astype(np.intp)
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = arrays['children']
+        self.leaf_id = arrays['leaf_id']
+        self.leaf_values = arrays['leaf_values']
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = n_features
+        self.n_trees = len(self.roots)
+        self.max_depth = max_depth
+        # Index-typed copies for the traversal (np.take converts other integer types on every call)
+        self._feature = self.feature.astype(np.intp)
+        self._children = self.children.astype(np.intp).reshape(-1)  # [2 * node] right, [2 * node + 1] left
+        self._is_leaf = self.leaf_id >= 0
+        self.nbytes = sum(array.nbytes for array in (
+            *arrays.values(), self._feature, self._children, self._is_leaf
+        ))
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledForest":
+        """Flatten a fitted single-output RandomForestClassifier / ExtraTreesClassifier"""
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+        n_classes = len(model.classes_)
+        roots, features, thresholds, children, leaf_ids, leaf_values = [], [], [], [], [], []
+        offset = leaf_offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            index = np.arange(tree.node_count)
+
+            # DecisionTreeClassifier.predict_proba: value[:, 0, :n_classes] over its row sum (0 -> 1)
+            values = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+            normalizer = values.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values /= normalizer
+
+            leaf_id = np.full(tree.node_count, -1, dtype=np.int32)
+            leaf_id[is_leaf] = leaf_offset + np.arange(is_leaf.sum())
+            tree_children = np.stack([
+                np.where(is_leaf, index, tree.children_right),
+                np.where(is_leaf, index, tree.children_left)
+            ], axis=1) + offset
+
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            children.append(tree_children)
+            leaf_ids.append(leaf_id)
+            leaf_values.append(values[is_leaf])
+            offset += tree.node_count
+            leaf_offset += int(is_leaf.sum())
+            max_depth = max(max_depth, tree.max_depth)
+
+        arrays = {
+            'roots': np.asarray(roots, dtype=np.int32),
+            'feature': np.concatenate(features).astype(np.int32),
+            'threshold': np.concatenate(thresholds).astype(np.float64),
+            'children': np.concatenate(children).astype(np.int32),
+            'leaf_id': np.concatenate(leaf_ids),
+            'leaf_values': np.concatenate(leaf_values),
+        }
+        return cls(arrays, model.classes_, int(model.n_features_in_), int(max_depth))
+
+    def _leaf_nodes(self, X: np.ndarray) -> np.ndarray:
+        """
+        Leaf reached in every tree by every row: (rows, trees) node indices
+
+        All (row, tree) pairs descend one level per step. Leaves loop to
+        themselves, so max_depth steps settle every path; every few steps the
+        pairs already at a leaf are written out and dropped, as most paths end
+        well above the deepest leaf.
+        """
+        rows = X.shape[0]
+        flat = X.reshape(-1)
+        nodes = np.tile(self.roots, rows)
+        row_offsets = np.repeat(np.arange(rows, dtype=np.intp) * self.n_features_in_, self.n_trees)
+        leaves = np.empty(rows * self.n_trees, dtype=np.intp)
+        pending = np.arange(rows * self.n_trees)
+
+        for step in range(1, self.max_depth + 1):
+            go_left = flat.take(row_offsets + self._feature.take(nodes)) <= self.threshold.take(nodes)
+            nodes = self._children.take(2 * nodes + go_left)
+            if step % COMPACT_EVERY == 0 and step < self.max_depth:
+                done = self._is_leaf.take(nodes)
+                leaves[pending[done]] = nodes[done]
+                remaining = ~done
+                pending, nodes, row_offsets = pending[remaining], nodes[remaining], row_offsets[remaining]
+                if not nodes.size:
+                    break
+        leaves[pending] = nodes
+        return leaves.reshape(rows, self.n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, expected (n, {self.n_features_in_})")
+        X = np.ascontiguousarray(X, dtype=np.float32)  # The dtype sklearn's trees compare in
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity.")
+
+        probabilities = np.zeros((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            out = probabilities[start:start + CHUNK_ROWS]
+            leaf_rows = self.leaf_id.take(self._leaf_nodes(X[start:start + CHUNK_ROWS]))  # rows x trees
+            # Both paths add tree after tree in estimator order, as the forest's accumulation does
+            if out.shape[0] <= SMALL_BATCH_ROWS:
+                np.add.reduce(self.leaf_values.take(leaf_rows, axis=0), axis=1, out=out)
+            else:
+                for tree in range(self.n_trees):
+                    out += self.leaf_values.take(leaf_rows[:, tree], axis=0)
+        probabilities /= self.n_trees
+        return probabilities
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+
+    def save(self, path) -> Path:
+        """Write the single-file format described in the module docstring"""
+        arrays = {
+            'roots': self.roots.astype(np.int32), 'feature': self.feature, 'threshold': self.threshold,
+            'children': self.children, 'leaf_id': self.leaf_id, 'leaf_values': self.leaf_values
+        }
+        table, cursor = {}, 0
+        for name, array in arrays.items():
+            table[name] = {'dtype': array.dtype.newbyteorder('<').str, 'shape': list(array.shape), 'offset': cursor}
+            cursor += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header = json.dumps({
+            'classes': [str(c) for c in self.classes_],
+            'n_features': self.n_features_in_,
+            'n_trees': self.n_trees,
+            'max_depth': self.max_depth,
+            'arrays': table
+        }).encode()
+        data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+        path = Path(path)
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "wb") as handle:
+            handle.write(MAGIC)
+            handle.write(len(header).to_bytes(8, "little"))
+            handle.write(header)
+            for name, array in arrays.items():
+                handle.seek(data_start + table[name]['offset'])
+                handle.write(np.ascontiguousarray(array, dtype=table[name]['dtype']).tobytes())
+            handle.truncate(data_start + cursor)
+        os.replace(temporary, path)
+        return path
+
+    @classmethod
+    def load(cls, path) -> "CompiledForest":
+        """Map a compiled forest read-only; no unpickling, no copies"""
+        with open(path, "rb") as handle:
+            if handle.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a compiled forest")
+            header_length = int.from_bytes(handle.read(8), "little")
+            header = json.loads(handle.read(header_length))
+        data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+        mapped = np.memmap(path, dtype=np.uint8, mode="r")
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape']))
+            arrays[name] = np.frombuffer(
+                mapped, dtype=dtype, count=count, offset=data_start + spec['offset']
+            ).reshape(spec['shape'])
+        return cls(arrays, header['classes'], header['n_features'], header['max_depth'])
+
+
+def load_compiled_forest(model_path) -> Optional[CompiledForest]:
+    """The compiled forest for a pickle when one is current, else None"""
+    if not has_compiled_forest(model_path):
+        return None
+    try:
+        return CompiledForest.load(compiled_forest_path(model_path))
+    except Exception as e:
+        logger.warning(f"Loading the compiled forest for {Path(model_path).name} failed ({e}), using the pickle")
+        return None
+
+
+def verify(compiled: CompiledForest, model, X: np.ndarray) -> int:
+    """Rows whose probabilities differ from sklearn's in any bit"""
+    expected = model.predict_proba(X)
+    actual = compiled.predict_proba(X)
+    return int((expected != actual).any(axis=1).sum())
+
+
+def main():
+    import joblib
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Compile the crop RandomForest into a flat-array forest")
+    parser.add_argument("command", choices=["compile"])
+    parser.add_argument("--model", default=str(MODELS_DIR / "crop_model.pkl"))
+    parser.add_argument("--verify-rows", type=int, default=10000,
+                        help="Random rows (within the training ranges) checked against sklearn")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    compiled = CompiledForest.from_sklearn(model)
+
+    # Every training row plus random rows across the feature ranges
+    features = list(getattr(model, 'feature_names_in_', ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']))
+    data = pd.read_csv(DATA_PATH)[features].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(0)
+    random_rows = rng.uniform(data.min(axis=0), data.max(axis=0), (args.verify_rows, data.shape[1]))
+    X = np.concatenate([data, random_rows])
+
+    import warnings
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        mismatches = verify(compiled, model, X)
+    if mismatches:
+        print(f"❌ {mismatches} of {len(X)} rows differ from sklearn; not writing the compiled forest")
+        return 1
+
+    output_path = compiled.save(compiled_forest_path(args.model))
+    print(f"✅ {compiled.n_trees} trees, {len(compiled.feature)} nodes, depth {compiled.max_depth}, "
+          f"bit-identical on {len(X)} rows")
+    print(f"✅ {Path(args.model).name} -> {output_path.name} ({output_path.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""
+Crop Recommendation Lookup
+Memoizes crop recommendations on quantized soil readings, with an optional
+precomputed suitability grid in front of the forest
+
+Soil health cards report N, P and K as whole kg/ha, temperature and pH to one
+decimal place, and humidity and rainfall as whole numbers, so farmers in one
+district send the same few thousand readings again and again. Each reading is
+rounded to those steps and the forest scores the rounded reading. The result
+is kept in an LRU keyed on the rounded values and the model version. Scoring is
+deterministic, so a cached answer is exactly what the forest would return for
+that key.
+
+The grid is built offline over the feature ranges of data/Crop_recommendation.csv.
+Its axes are placed at quantiles of the data, and it stores the forest's class
+probabilities at every grid point as float16. A query inside the grid takes the
+multilinear interpolation of its cell's 128 corners. It is answered from the grid
+only when all corners agree on the best crop and that crop's probability varies
+by at most `max_spread` across them. Any other query goes to the forest. The
+forest is piecewise constant, so grid confidences are approximations.
+`build-grid` measures how often the gate passes and how far the answers are from
+the forest, and stores the result with the grid.
+
+Usage (from the backend directory):
+    python -m services.crop_lookup build-grid --points 7
+    python -m services.crop_lookup show
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .crop_scoring import SOIL_FEATURES, CropScorer
+from .result_cache import DetectionResultCache, model_version
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / "models"
+DATA_PATH = MODELS_DIR.parent / "data" / "Crop_recommendation.csv"
+
+# Soil card precision per feature, in SOIL_FEATURES order
+DEFAULT_STEPS = {'N': 1.0, 'P': 1.0, 'K': 1.0, 'temperature': 0.1, 'humidity': 1.0, 'ph': 0.1, 'rainfall': 1.0}
+
+# Rows interpolated per pass; each gathers 128 corners x n_classes probabilities
+GRID_CHUNK_ROWS = 1024
+
+
+def parse_steps(spec: str) -> Dict[str, float]:
+    """DEFAULT_STEPS with overrides from a "name=step,..." string, e.g. "ph=0.01,rainfall=5" """
+    steps = dict(DEFAULT_STEPS)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = item.partition('=')
+        if name.strip() not in steps or float(value) <= 0:
+            raise ValueError(f"Invalid quantization step '{item}'")
+        steps[name.strip()] = float(value)
+    return steps
+
+
+def grid_paths(model_path) -> Tuple[Path, Path]:
+    """Probabilities (.grid.npy) and header (.grid.json) next to the model"""
+    model_path = Path(model_path)
+    return model_path.with_suffix('.grid.npy'), model_path.with_suffix('.grid.json')
+
+
+class SuitabilityGrid:
+    """Forest probabilities on a dense grid over the observed soil ranges"""
+
+    def __init__(self, axes: List[np.ndarray], probabilities: np.ndarray, classes: Sequence[str],
+                 max_spread: float = 0.25, report: Optional[Dict] = None):
+        self.axes = [np.asarray(axis, dtype=np.float64) for axis in axes]
+        self.shape = tuple(len(axis) for axis in self.axes)
+        self.classes = list(classes)
+        self.probabilities = probabilities.reshape(-1, len(self.classes))
+        self.max_spread = max_spread
+        self.report = report or {}
+        self.low = np.array([axis[0] for axis in self.axes])
+        self.high = np.array([axis[-1] for axis in self.axes])
+        # Every 0/1 offset of a cell corner, and each grid point's best crop
+        self._corners = np.array(list(itertools.product((0, 1), repeat=len(self.axes))))
+        self._best = self.probabilities.argmax(axis=1)
+
+    @classmethod
+    def build(cls, predict_proba, classes: Sequence[str], samples: np.ndarray, points: int = 7,
+              chunk_rows: int = 20000) -> "SuitabilityGrid":
+        """Score the forest at every grid point; axes at `points` quantiles of each feature"""
+        quantiles = np.linspace(0.0, 1.0, points)
+        axes = [np.unique(np.quantile(samples[:, j], quantiles)) for j in range(samples.shape[1])]
+        shape = tuple(len(axis) for axis in axes)
+        probabilities = np.empty((int(np.prod(shape)), len(classes)), dtype=np.float16)
+        for start in range(0, len(probabilities), chunk_rows):
+            index = np.unravel_index(np.arange(start, min(start + chunk_rows, len(probabilities))), shape)
+            rows = np.stack([axis[i] for axis, i in zip(axes, index)], axis=1)
+            probabilities[start:start + len(rows)] = predict_proba(rows)
+        return cls(axes, probabilities, classes)
+
+    def lookup(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Interpolated probabilities for N x 7 rows, and which rows the grid may answer"""
+        probabilities = np.zeros((len(features), len(self.classes)))
+        answered = np.zeros(len(features), dtype=bool)
+        inside = np.flatnonzero(((features >= self.low) & (features <= self.high)).all(axis=1))
+        for start in range(0, len(inside), GRID_CHUNK_ROWS):
+            rows = inside[start:start + GRID_CHUNK_ROWS]
+            probabilities[rows], answered[rows] = self._interpolate(features[rows])
+        return probabilities, answered
+
+    def _interpolate(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        lower = np.stack([
+            np.clip(np.searchsorted(axis, column, side='right') - 1, 0, len(axis) - 2)
+            for axis, column in zip(self.axes, X.T)
+        ], axis=1)
+        fraction = np.stack([
+            (column - axis[i]) / (axis[i + 1] - axis[i]) for axis, i, column in zip(self.axes, lower.T, X.T)
+        ], axis=1)
+
+        corners = lower[:, None, :] + self._corners[None]  # rows x 128 x 7
+        flat = np.ravel_multi_index(tuple(np.moveaxis(corners, 2, 0)), self.shape)
+        weights = np.where(self._corners[None] == 1, fraction[:, None, :], 1.0 - fraction[:, None, :]).prod(axis=2)
+        corner_probabilities = self.probabilities[flat].astype(np.float64)
+        probabilities = np.einsum('nk,nkc->nc', weights, corner_probabilities)
+
+        best = probabilities.argmax(axis=1)
+        best_at_corners = np.take_along_axis(corner_probabilities, best[:, None, None], axis=2)[..., 0]
+        answered = (
+            (self._best[flat] == best[:, None]).all(axis=1)
+            & (best_at_corners.max(axis=1) - best_at_corners.min(axis=1) <= self.max_spread)
+        )
+        return probabilities, answered
+
+    def save(self, model_path, version: str):
+        probabilities_path, header_path = grid_paths(model_path)
+        np.save(probabilities_path, self.probabilities.reshape(*self.shape, len(self.classes)))
+        header = {
+            'model_version': version,
+            'classes': self.classes,
+            'features': list(SOIL_FEATURES),
+            'axes': [axis.tolist() for axis in self.axes],
+            'report': self.report
+        }
+        header_path.write_text(json.dumps(header, indent=2), encoding='utf-8')
+        return probabilities_path
+
+    @classmethod
+    def load(cls, model_path, version: str, max_spread: float = 0.25) -> Optional["SuitabilityGrid"]:
+        """The grid built for this model version (memory-mapped), or None"""
+        probabilities_path, header_path = grid_paths(model_path)
+        if not (probabilities_path.exists() and header_path.exists()):
+            return None
+        try:
+            header = json.loads(header_path.read_text(encoding='utf-8'))
+            if header['model_version'] != version:
+                logger.warning(f"{header_path.name} was built for another version of the model, ignoring it")
+                return None
+            probabilities = np.load(probabilities_path, mmap_mode='r')
+            return cls(header['axes'], probabilities, header['classes'], max_spread, header.get('report'))
+        except Exception as e:
+            logger.warning(f"Loading {header_path.name} failed ({e}), scoring with the forest only")
+            return None
+
+
+class CropLookup:
+    """
+    Quantizes soil readings and answers them from the LRU, then the grid, then the
+    forest (one CropScorer pass for the remaining distinct readings)
+    """
+
+    def __init__(self, scorer: CropScorer, cache: DetectionResultCache, version: str,
+                 steps: Optional[Dict[str, float]] = None, grid: Optional[SuitabilityGrid] = None):
+        self.scorer = scorer
+        self.cache = cache
+        self.version = version
+        self.steps = dict(steps or DEFAULT_STEPS)
+        self.grid = grid
+        self._step_array = np.array([self.steps[name] for name in SOIL_FEATURES])
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.grid_answers = 0
+        self.forest_rows = 0
+
+    def quantize(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Integer keys and the rounded readings the forest scores"""
+        keys = np.rint(features / self._step_array).astype(np.int64)
+        return keys, keys * self._step_array
+
+    def score(self, features: np.ndarray) -> List[Dict]:
+        """Same output as CropScorer.score, for the quantized readings"""
+        if features.ndim != 2 or features.shape[1] != len(SOIL_FEATURES) or not np.isfinite(features).all():
+            return self.scorer.score(features)  # Let the scorer validate or reject it
+
+        keys, values = self.quantize(features)
+        # Repeated readings within a batch are looked up and scored once
+        unique_keys, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        cache_keys = [self._cache_key(key) for key in unique_keys.tolist()]
+        results = [self.cache.get(key) for key in cache_keys]
+        self._fill(results, cache_keys, values[first], len(features))
+        return [results[i] for i in inverse.reshape(-1)]
+
+    def score_one(self, values: Sequence[float]) -> Dict:
+        """Recommendation for a single reading given in SOIL_FEATURES order"""
+        values = [float(value) for value in values]
+        if len(values) != len(SOIL_FEATURES) or not all(map(math.isfinite, values)):
+            return self.score(np.asarray(values, dtype=np.float64).reshape(1, -1))[0]
+
+        # np.rint and round() both round halves to even, so keys match the batch path
+        key = [round(value / step) for value, step in zip(values, self._step_array.tolist())]
+        cache_key = self._cache_key(key)
+        results = [self.cache.get(cache_key)]
+        if results[0] is None:
+            self._fill(results, [cache_key], np.array([key], dtype=np.float64) * self._step_array, 1)
+        else:
+            with self._lock:
+                self.rows += 1
+        return results[0]
+
+    def _cache_key(self, key: Sequence[int]) -> str:
+        return DetectionResultCache.make_key('crop', self.version, ','.join(map(str, key)))
+
+    def _fill(self, results: List[Optional[Dict]], cache_keys: List[str], values: np.ndarray, rows: int):
+        """Answer the cache misses in `results` from the grid, then the forest, and cache them"""
+        missing = np.array([i for i, result in enumerate(results) if result is None], dtype=np.intp)
+        computed = missing.tolist()
+        grid_answers = 0
+        if len(missing) and self.grid is not None:
+            probabilities, answered = self.grid.lookup(values[missing])
+            for i, result in zip(missing[answered], self.scorer.results(probabilities[answered])):
+                results[i] = result
+            grid_answers = int(answered.sum())
+            missing = missing[~answered]
+        if len(missing):
+            for i, result in zip(missing, self.scorer.score(values[missing])):
+                results[i] = result
+        for i in computed:
+            self.cache.put(cache_keys[i], results[i])
+
+        with self._lock:
+            self.rows += rows
+            self.grid_answers += grid_answers
+            self.forest_rows += len(missing)
+
+    def stats(self) -> Dict:
+        """Cache hit rate, grid answers and the share of rows the forest never saw"""
+        with self._lock:
+            rows, grid_answers, forest_rows = self.rows, self.grid_answers, self.forest_rows
+        return {
+            'steps': self.steps,
+            'rows': rows,
+            'cache': self.cache.stats(),
+            'grid': {
+                'loaded': self.grid is not None,
+                'shape': list(self.grid.shape) if self.grid is not None else None,
+                'max_spread': self.grid.max_spread if self.grid is not None else None,
+                'answers': grid_answers
+            },
+            'forest_rows': forest_rows,
+            'answered_without_forest': round(1 - forest_rows / rows, 4) if rows else 0.0
+        }
+
+
+def grid_report(grid: SuitabilityGrid, predict_proba, X: np.ndarray) -> Dict:
+    """How often the gate passes on X, and how close the grid's answers are to the forest's"""
+    probabilities, answered = grid.lookup(X)
+    report = {'rows': len(X), 'coverage': round(float(answered.mean()), 4)}
+    if answered.any():
+        expected = predict_proba(X[answered])
+        best = probabilities[answered].argmax(axis=1)
+        confidence_error = np.abs(
+            probabilities[answered].max(axis=1) - expected[np.arange(len(best)), best]
+        )
+        report['label_agreement'] = round(float((best == expected.argmax(axis=1)).mean()), 4)
+        report['mean_confidence_error'] = round(float(confidence_error.mean()), 4)
+        report['max_confidence_error'] = round(float(confidence_error.max()), 4)
+    return report
+
+
+def main():
+    import pandas as pd
+
+    from .compiled_forest import load_compiled_forest
+    from .weight_storage import load_joblib
+
+    parser = argparse.ArgumentParser(description="Build or inspect the crop suitability grid")
+    parser.add_argument("command", choices=["build-grid", "show"])
+    parser.add_argument("--model", default=str(MODELS_DIR / "crop_model.pkl"))
+    parser.add_argument("--points", type=int, default=7, help="Grid points per feature (cells grow as points^7)")
+    parser.add_argument("--max-spread", type=float, default=0.25,
+                        help="Largest corner spread of the best crop's probability the grid may answer")
+    args = parser.parse_args()
+
+    version = model_version(args.model)
+    if args.command == "show":
+        grid = SuitabilityGrid.load(args.model, version)
+        if grid is None:
+            print(f"⚠️ No grid for the current {Path(args.model).name}")
+            return 1
+        print(json.dumps({'shape': grid.shape, 'report': grid.report}, indent=2))
+        return 0
+
+    model = load_compiled_forest(args.model) or load_joblib(args.model)
+    scorer = CropScorer(model)
+    data = pd.read_csv(DATA_PATH)[list(SOIL_FEATURES)].to_numpy(dtype=np.float64)
+    print(f"Scoring {args.points ** len(SOIL_FEATURES):,} grid points with {type(model).__name__}...")
+    grid = SuitabilityGrid.build(scorer.predict_proba, scorer.classes, data, args.points)
+    grid.max_spread = args.max_spread
+
+    rng = np.random.default_rng(0)
+    grid.report = {
+        'points': args.points,
+        'max_spread': args.max_spread,
+        'dataset': grid_report(grid, scorer.predict_proba, data),
+        'uniform': grid_report(grid, scorer.predict_proba,
+                               rng.uniform(data.min(axis=0), data.max(axis=0), (10000, data.shape[1])))
+    }
+    output_path = grid.save(args.model, version)
+    print(json.dumps(grid.report, indent=2))
+    print(f"✅ {grid.shape} grid saved to {output_path.name} ({output_path.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Crop Recommendation Scoring
+One probability pass per request for the RandomForest crop model, shared by /predict and /batch-predict
+
+`RandomForestClassifier.predict` is the argmax of `predict_proba`, so calling
+both walks every tree twice. The scorer computes the probabilities once and
+derives the label, confidence and top-k from them. For random forests and
+extra-trees it also skips the per-call overhead around the trees: input
+validation, the feature-name check and the joblib dispatch. It casts the input
+into a reused float32 buffer (the dtype the trees compare in) and sums the
+trees' probabilities itself, in the same order and with the same arithmetic as
+sklearn, so the results are identical. A CompiledForest (services/compiled_forest.py)
+is scored through its own predict_proba, which needs none of this.
+"""
+
+import threading
+from typing import Dict, List, Sequence
+
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+# Feature order the crop model was trained on (models/Context/train_crop_model.py)
+SOIL_FEATURES = ('N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall')
+
+# Reported for models without predict_proba, as /predict always has
+FALLBACK_CONFIDENCE = 0.85
+
+
+class CropScorer:
+    """Scores soil feature rows with the crop model; safe to share between threads"""
+
+    def __init__(self, model, top_k: int = 5):
+        self.model = model
+        self.top_k = top_k
+        self.has_proba = hasattr(model, 'predict_proba')
+        self.classes = [str(crop) for crop in getattr(model, 'classes_', [])]
+        self.n_features = getattr(model, 'n_features_in_', len(SOIL_FEATURES))
+        # The direct tree walk is only used where it matches sklearn exactly
+        self.direct_trees = (
+            isinstance(model, (RandomForestClassifier, ExtraTreesClassifier))
+            and getattr(model, 'n_outputs_', 1) == 1
+        )
+        self._buffers = threading.local()
+
+    def _input_buffer(self, rows: int) -> np.ndarray:
+        """Per-thread float32 input rows, grown on demand and reused across calls"""
+        buffer = getattr(self._buffers, 'features', None)
+        if buffer is None or buffer.shape[0] < rows:
+            buffer = np.empty((max(rows, 1), self.n_features), dtype=np.float32)
+            self._buffers.features = buffer
+        return buffer[:rows]
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Class probabilities for an N x n_features matrix, as model.predict_proba returns them"""
+        if not self.direct_trees or features.ndim != 2 or features.shape[1] != self.n_features:
+            return self.model.predict_proba(features)
+
+        X = self._input_buffer(features.shape[0])
+        np.copyto(X, features, casting='unsafe')  # What check_array(dtype=float32) does
+        if not np.isfinite(X).all():
+            # Let sklearn validate (and reject or route) missing and infinite values
+            return self.model.predict_proba(features)
+
+        # RandomForestClassifier.predict_proba without its checks: sum the trees in order, then average
+        estimators = self.model.estimators_
+        probabilities = np.zeros((X.shape[0], len(self.classes)), dtype=np.float64)
+        for tree in estimators:
+            probabilities += tree.predict_proba(X, check_input=False)
+        probabilities /= len(estimators)
+        return probabilities
+
+    def score(self, features: np.ndarray) -> List[Dict]:
+        """
+        Recommendation per row of an N x 7 feature matrix: best crop (the row argmax,
+        which is what predict() returns), its confidence and the top-k crops found
+        with one argpartition over the whole matrix
+        """
+        if not self.has_proba:
+            return [
+                {'crop': str(crop), 'confidence': FALLBACK_CONFIDENCE, 'all_predictions': {}}
+                for crop in self.model.predict(features)
+            ]
+
+        return self.results(self.predict_proba(features))
+
+    def results(self, probabilities: np.ndarray) -> List[Dict]:
+        """Best crop, confidence and top-k per row of an N x n_classes probability matrix"""
+        classes = self.classes
+        rows = np.arange(len(probabilities))[:, None]
+        best = probabilities.argmax(axis=1)  # Ties resolve as in predict()
+        confidences = probabilities[rows[:, 0], best].tolist()
+
+        k = min(self.top_k, len(classes))
+        top = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        order = np.argsort(-probabilities[rows, top], axis=1, kind='stable')
+        top = top[rows, order]
+        top_probabilities = probabilities[rows, top].tolist()
+
+        return [
+            {
+                'crop': classes[best_index],
+                'confidence': confidence,
+                'all_predictions': {classes[i]: p for i, p in zip(indices, row_probabilities)}
+            }
+            for best_index, confidence, indices, row_probabilities
+            in zip(best.tolist(), confidences, top.tolist(), top_probabilities)
+        ]
+
+    def score_one(self, values: Sequence[float]) -> Dict:
+        """Recommendation for a single sample given in SOIL_FEATURES order"""
+        return self.score(np.asarray(values, dtype=np.float64).reshape(1, -1))[0]
@@ -0,0 +1,362 @@
+"""
+Crop Suitability Rasters
+Best crop and confidence for every cell of gridded soil and weather layers,
+scored by the crop model in large windows on a process pool
+
+Input is one layer per model feature (N, P, K, temperature, humidity, ph,
+rainfall), in the units of data/Crop_recommendation.csv and on the same grid.
+The layers come from either of these:
+- a single stack: a 7-band GeoTIFF, or a (7, rows, cols) .npy, in SOIL_FEATURES
+  order
+- separate GeoTIFF or 2-D .npy files, one per feature
+
+Cells are read in windows of whole raster rows (about `block_cells` cells), so
+memory stays bounded whatever the raster size. Each worker process loads the
+model once and reads its own windows from disk. The parent only receives the
+two small result arrays per window and writes them straight into the outputs,
+with at most two windows per worker in flight. Cells that are nodata or
+non-finite in any layer are written as nodata.
+
+Outputs, in the output directory:
+- best_crop.tif (or .npy): uint8 index into the legend, 255 = nodata
+- confidence.tif (or .npy): float32 probability of that crop, -1 = nodata
+- suitability.json: legend, per-crop cell counts and timings
+
+GeoTIFF outputs keep the input's CRS and transform. GeoTIFF input needs rasterio
+(backend/requirements.txt), and .npy input needs only NumPy.
+
+Usage (from the backend directory):
+    python -m services.crop_suitability --stack district.tif --output suitability/
+    python -m services.crop_suitability --layer N=n.tif --layer P=p.tif --layer K=k.tif \\
+        --layer temperature=t.tif --layer humidity=h.tif --layer ph=ph.tif --layer rainfall=r.tif \\
+        --output suitability/ --workers 8
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .crop_scoring import SOIL_FEATURES, CropScorer
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / "models"
+MODEL_PATH = MODELS_DIR / "crop_model.pkl"
+
+NODATA_CROP = 255
+NODATA_CONFIDENCE = -1.0
+# Cells per window handed to a worker, and rows per predict_proba call inside it
+BLOCK_CELLS = 1 << 18
+SCORE_ROWS = 32768
+
+# (path, band) per feature; band is None for a 2-D .npy or a single-band GeoTIFF
+LayerSources = List[Tuple[str, Optional[int]]]
+
+
+class SuitabilityLimitError(ValueError):
+    """Raised when a raster has more cells than the caller allows"""
+
+
+def layer_sources(stack: Optional[str] = None, layers: Optional[Dict[str, str]] = None) -> LayerSources:
+    """Resolve a stack file or a feature -> file mapping into per-feature sources"""
+    if stack is not None:
+        return [(str(stack), band) for band in range(len(SOIL_FEATURES))]
+    missing = [name for name in SOIL_FEATURES if name not in (layers or {})]
+    if missing:
+        raise ValueError(f"Missing layers: {', '.join(missing)}")
+    return [(str(layers[name]), None) for name in SOIL_FEATURES]
+
+
+def _is_geotiff(path: str) -> bool:
+    return Path(path).suffix.lower() in ('.tif', '.tiff')
+
+
+class RasterLayers:
+    """Windowed reads of the feature layers; files are opened once and kept open"""
+
+    def __init__(self, sources: LayerSources):
+        self.sources = sources
+        self._handles: Dict[str, object] = {}
+        shapes = {self._shape(path, band) for path, band in sources}
+        if len(shapes) != 1:
+            raise ValueError(f"Layers are on different grids: {sorted(shapes)}")
+        self.shape = shapes.pop()
+
+    def _open(self, path: str):
+        if path not in self._handles:
+            if _is_geotiff(path):
+                import rasterio
+                self._handles[path] = rasterio.open(path)
+            else:
+                self._handles[path] = np.load(path, mmap_mode='r')
+        return self._handles[path]
+
+    def _shape(self, path: str, band: Optional[int]) -> Tuple[int, int]:
+        handle = self._open(path)
+        if _is_geotiff(path):
+            if (band or 0) >= handle.count:
+                raise ValueError(f"{Path(path).name} has {handle.count} bands, band {band + 1} is needed")
+            return handle.height, handle.width
+        expected_ndim = 2 if band is None else 3
+        if handle.ndim != expected_ndim or (band is not None and band >= handle.shape[0]):
+            raise ValueError(f"{Path(path).name} has shape {handle.shape}")
+        return tuple(handle.shape[-2:])
+
+    def profile(self) -> Optional[Dict]:
+        """CRS and transform of the first GeoTIFF layer, for georeferenced outputs"""
+        path = self.sources[0][0]
+        if not _is_geotiff(path):
+            return None
+        handle = self._open(path)
+        return {'crs': handle.crs, 'transform': handle.transform}
+
+    def read(self, row_off: int, rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows * cols, 7) feature matrix for a window of whole rows, and its valid-cell mask"""
+        cols = self.shape[1]
+        features = np.empty((rows * cols, len(self.sources)), dtype=np.float64)
+        valid = np.ones(rows * cols, dtype=bool)
+        for j, (path, band) in enumerate(self.sources):
+            handle = self._open(path)
+            if _is_geotiff(path):
+                from rasterio.windows import Window
+                values = handle.read((band or 0) + 1, window=Window(0, row_off, cols, rows))
+                nodata = handle.nodatavals[band or 0]
+            else:
+                values = handle[row_off:row_off + rows] if band is None else handle[band, row_off:row_off + rows]
+                nodata = None
+            values = np.asarray(values, dtype=np.float64).reshape(-1)
+            features[:, j] = values
+            valid &= np.isfinite(values)
+            if nodata is not None:
+                valid &= values != nodata
+        return features, valid
+
+    def close(self):
+        for handle in self._handles.values():
+            if hasattr(handle, 'close'):
+                handle.close()
+        self._handles.clear()
+
+
+class _RasterWriter:
+    """One output band written window by window, as a GeoTIFF or a memory-mapped .npy"""
+
+    def __init__(self, path: Path, shape: Tuple[int, int], dtype, nodata, profile: Optional[Dict], tags=None):
+        self.path = path
+        if profile is not None:
+            import rasterio
+            self._dataset = rasterio.open(
+                path, 'w', driver='GTiff', height=shape[0], width=shape[1], count=1, dtype=dtype,
+                crs=profile['crs'], transform=profile['transform'], nodata=nodata,
+                tiled=True, compress='deflate'
+            )
+            if tags:
+                self._dataset.update_tags(**tags)
+            self._array = None
+        else:
+            self._dataset = None
+            self._array = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+
+    def write(self, row_off: int, values: np.ndarray):
+        if self._dataset is not None:
+            from rasterio.windows import Window
+            self._dataset.write(values, 1, window=Window(0, row_off, values.shape[1], values.shape[0]))
+        else:
+            self._array[row_off:row_off + len(values)] = values
+
+    def close(self):
+        if self._dataset is not None:
+            self._dataset.close()
+        else:
+            self._array.flush()
+            del self._array
+
+
+# Per-process state, set by _init_worker
+_worker: Dict = {}
+
+
+def _init_worker(model_path: str, sources: LayerSources):
+    """Load the model and open the layers once per worker process"""
+    from .weight_storage import load_joblib
+
+    # The pickle, not the compiled forest: for windows of thousands of rows
+    # sklearn's tree code is the faster of the two, and the pages are shared
+    model = load_joblib(model_path)
+    _worker['scorer'] = CropScorer(model)
+    _worker['layers'] = RasterLayers(sources)
+
+
+def _score_window(row_off: int, rows: int) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Best crop index and confidence for one window of rows"""
+    scorer: CropScorer = _worker['scorer']
+    layers: RasterLayers = _worker['layers']
+    features, valid = layers.read(row_off, rows)
+
+    crops = np.full(len(features), NODATA_CROP, dtype=np.uint8)
+    confidence = np.full(len(features), NODATA_CONFIDENCE, dtype=np.float32)
+    cells = np.flatnonzero(valid)
+    for start in range(0, len(cells), SCORE_ROWS):
+        chunk = cells[start:start + SCORE_ROWS]
+        probabilities = scorer.predict_proba(features[chunk])
+        best = probabilities.argmax(axis=1)
+        crops[chunk] = best
+        confidence[chunk] = probabilities[np.arange(len(chunk)), best]
+    shape = (rows, layers.shape[1])
+    return row_off, crops.reshape(shape), confidence.reshape(shape)
+
+
+def generate_suitability(
+    sources: LayerSources,
+    output_dir,
+    model_path=MODEL_PATH,
+    workers: Optional[int] = None,
+    block_cells: int = BLOCK_CELLS,
+    max_cells: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict:
+    """
+    Write best_crop, confidence and suitability.json for a set of layers
+
+    Args:
+        sources: Per-feature layer sources (see layer_sources)
+        output_dir: Directory for the outputs (created if missing)
+        model_path: The crop model pickle
+        workers: Worker processes (default: all usable cores; 1 scores in this process)
+        block_cells: Approximate cells per window
+        max_cells: Reject rasters larger than this with SuitabilityLimitError
+        progress: Called with (rows done, total rows) after every window
+    """
+    start = time.perf_counter()
+    layers = RasterLayers(sources)
+    try:
+        height, width = layers.shape
+        profile = layers.profile()
+    finally:
+        layers.close()
+    if max_cells is not None and height * width > max_cells:
+        raise SuitabilityLimitError(f"Raster has {height * width} cells; the limit is {max_cells}")
+
+    from .weight_storage import load_joblib
+    classes = [str(crop) for crop in load_joblib(model_path).classes_]
+    if len(classes) >= NODATA_CROP:
+        raise ValueError(f"{len(classes)} crop classes do not fit the uint8 raster")
+
+    if workers is None:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    rows_per_window = max(1, block_cells // max(width, 1))
+    windows = [(row, min(rows_per_window, height - row)) for row in range(0, height, rows_per_window)]
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    suffix = '.tif' if profile is not None else '.npy'
+    legend = {str(i): crop for i, crop in enumerate(classes)}
+    crop_writer = _RasterWriter(output_dir / f"best_crop{suffix}", (height, width), 'uint8', NODATA_CROP,
+                                profile, tags={'legend': json.dumps(legend)})
+    confidence_writer = _RasterWriter(output_dir / f"confidence{suffix}", (height, width), 'float32',
+                                      NODATA_CONFIDENCE, profile)
+    counts = np.zeros(NODATA_CROP + 1, dtype=np.int64)
+    rows_done = 0
+
+    def write(result):
+        nonlocal rows_done
+        row_off, crops, confidence = result
+        crop_writer.write(row_off, crops)
+        confidence_writer.write(row_off, confidence)
+        counts[:] += np.bincount(crops.reshape(-1), minlength=NODATA_CROP + 1)
+        rows_done += len(crops)
+        if progress is not None:
+            progress(rows_done, height)
+
+    try:
+        if workers <= 1:
+            _init_worker(str(model_path), sources)
+            try:
+                for window in windows:
+                    write(_score_window(*window))
+            finally:
+                _worker.pop('layers').close()
+        else:
+            context = multiprocessing.get_context("spawn")  # No forked copies of the server's threads
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(str(model_path), sources)) as pool:
+                pending = set()
+                for window in windows:
+                    pending.add(pool.submit(_score_window, *window))
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            write(future.result())
+                for future in pending:
+                    write(future.result())
+    finally:
+        crop_writer.close()
+        confidence_writer.close()
+
+    seconds = time.perf_counter() - start
+    summary = {
+        'shape': [height, width],
+        'cells': height * width,
+        'scored_cells': int(counts[:len(classes)].sum()),
+        'nodata_cells': int(counts[NODATA_CROP]),
+        'legend': legend,
+        'crop_cells': {crop: int(counts[i]) for i, crop in enumerate(classes) if counts[i]},
+        'nodata': {'best_crop': NODATA_CROP, 'confidence': NODATA_CONFIDENCE},
+        'workers': max(workers, 1),
+        'windows': len(windows),
+        'seconds': round(seconds, 2),
+        'cells_per_second': round(height * width / seconds) if seconds else None,
+        'outputs': [crop_writer.path.name, confidence_writer.path.name]
+    }
+    (output_dir / "suitability.json").write_text(json.dumps(summary, indent=2), encoding='utf-8')
+    return summary
+
+
+def _parse_layers(items: Sequence[str]) -> Dict[str, str]:
+    layers = {}
+    for item in items:
+        name, _, path = item.partition('=')
+        if name not in SOIL_FEATURES or not path:
+            raise ValueError(f"Invalid layer '{item}'; expected <feature>=<path> with a feature in {SOIL_FEATURES}")
+        layers[name] = path
+    return layers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Best-crop and confidence rasters from soil and weather layers")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--stack", help="7-band GeoTIFF or (7, rows, cols) .npy in SOIL_FEATURES order")
+    source.add_argument("--layer", action="append", help="<feature>=<path>, once per feature")
+    parser.add_argument("--output", required=True, help="Output directory")
+    parser.add_argument("--model", default=str(MODEL_PATH))
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--block-cells", type=int, default=BLOCK_CELLS, help="Approximate cells per window")
+    args = parser.parse_args()
+
+    sources = layer_sources(args.stack, _parse_layers(args.layer) if args.layer else None)
+
+    def progress(done, total):
+        print(f"\r{done}/{total} rows", end="", flush=True)
+
+    summary = generate_suitability(sources, args.output, args.model, args.workers, args.block_cells,
+                                   progress=progress)
+    print()
+    top = sorted(summary['crop_cells'].items(), key=lambda item: -item[1])[:5]
+    print(f"✅ {summary['scored_cells']:,} cells scored ({summary['nodata_cells']:,} nodata) in "
+          f"{summary['seconds']} s ({summary['cells_per_second']:,} cells/s, {summary['workers']} workers)")
+    print(f"   Most suitable: {', '.join(f'{crop} ({cells:,})' for crop, cells in top)}")
+    print(f"   Written to {args.output}: {', '.join(summary['outputs'])}, suitability.json")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Inference Backends for the Disease Models
+Exports each checkpoint once to ONNX or TorchScript and serves it from the cache
+
+Backends:
+    eager        - plain PyTorch modules (the original path)
+    onnx         - ONNX Runtime session with all graph optimizations enabled
+    torchscript  - frozen TorchScript module, used as the fallback for onnx
+
+The onnx backend needs the optional packages in backend/requirements-onnx.txt.
+"""
+
+import importlib.util
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "onnx", "torchscript")
+
+# Exported artifacts live next to the checkpoints
+EXPORT_DIR = Path(__file__).resolve().parent.parent.parent / "models" / "exported"
+
+
+class OnnxRuntimeModel:
+    """Callable wrapper giving an ONNX Runtime session the same interface as nn.Module"""
+
+    def __init__(self, onnx_path: Path, intra_op_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            str(onnx_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.path = onnx_path
+        self.nbytes = onnx_path.stat().st_size  # Approximate resident size of the session
+
+    def eval(self):
+        return self
+
+    def __call__(self, img_tensor: torch.Tensor) -> torch.Tensor:
+        inputs = np.ascontiguousarray(img_tensor.detach().cpu().numpy(), dtype=np.float32)
+        outputs = self.session.run(None, {self.input_name: inputs})[0]
+        return torch.from_numpy(outputs)
+
+
+def onnx_available() -> bool:
+    """True when the optional ONNX packages (requirements-onnx.txt) are installed"""
+    return all(importlib.util.find_spec(name) is not None for name in ("onnx", "onnxruntime"))
+
+
+def artifact_path(model_path: str, backend: str) -> Path:
+    """Cache location of the exported artifact for a checkpoint"""
+    suffix = ".onnx" if backend == "onnx" else ".ts.pt"
+    return EXPORT_DIR / f"{Path(model_path).stem}{suffix}"
+
+
+def _is_fresh(artifact: Path, model_path: str) -> bool:
+    """An artifact is reusable when it is newer than its source checkpoint"""
+    return artifact.exists() and artifact.stat().st_mtime >= os.path.getmtime(model_path)
+
+
+def export_onnx(model: torch.nn.Module, input_size: int, output_path: Path):
+    """Export with a dynamic batch axis so batched requests reuse the same graph"""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    example = torch.zeros(1, 3, input_size, input_size)
+    torch.onnx.export(
+        model.cpu().eval(), example, str(output_path),
+        input_names=["input"], output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17
+    )
+
+
+def export_torchscript(model: torch.nn.Module, input_size: int, output_path: Path):
+    """Trace and freeze the model so it loads without the original class definitions"""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    example = torch.zeros(1, 3, input_size, input_size)
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(model.cpu().eval(), example))
+    torch.jit.save(scripted, str(output_path))
+
+
+def load_backend_model(
+    model_path: str,
+    backend: str,
+    input_size: int,
+    build_eager_model: Callable[[], torch.nn.Module],
+    device: torch.device = torch.device("cpu")
+):
+    """
+    Return a callable model for `backend`, exporting it on first use
+
+    `build_eager_model` is only called when the cached artifact is missing or older
+    than the checkpoint. If ONNX Runtime is unavailable or the export fails, the
+    TorchScript backend is tried next. If that fails too, the eager module is
+    returned when one was already built, otherwise None to signal the eager path.
+
+    Args:
+        model_path: Source checkpoint
+        backend: One of BACKENDS
+        input_size: Square input resolution used for the export example
+        build_eager_model: Loads the PyTorch module from the checkpoint
+        device: Device for TorchScript modules (ONNX Runtime always runs on CPU)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if backend == "eager":
+        return None
+
+    eager_model = None
+
+    # Without the optional packages go straight to TorchScript; startup already warned
+    if backend == "onnx" and onnx_available():
+        onnx_path = artifact_path(model_path, "onnx")
+        try:
+            if not _is_fresh(onnx_path, model_path):
+                eager_model = build_eager_model()
+                logger.info(f"Exporting {Path(model_path).name} to {onnx_path}")
+                export_onnx(eager_model, input_size, onnx_path)
+            # Same per-model thread share as torch, so concurrent sessions do not oversubscribe
+            threads = int(os.getenv('ONNX_INTRA_OP_THREADS', '0')) or torch.get_num_threads()
+            return OnnxRuntimeModel(onnx_path, threads)
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable for {Path(model_path).name} ({e}), trying TorchScript")
+
+    ts_path = artifact_path(model_path, "torchscript")
+    try:
+        if not _is_fresh(ts_path, model_path):
+            if eager_model is None:
+                eager_model = build_eager_model()
+            logger.info(f"Exporting {Path(model_path).name} to {ts_path}")
+            export_torchscript(eager_model, input_size, ts_path)
+        return torch.jit.load(str(ts_path), map_location=device).eval()
+    except Exception as e:
+        logger.warning(f"TorchScript backend unavailable for {Path(model_path).name} ({e}), using eager")
+        return eager_model.to(device) if eager_model is not None else None
@@ -0,0 +1,196 @@
+"""
+Dynamic Micro-Batching for Model Inference
+Collects concurrent inference requests into batches bounded by size and wait time
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .inference_executor import InferenceExecutor, InferenceSaturatedError
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBatcher:
+    """
+    Queues single-item requests and runs them through a batch prediction function
+
+    A background worker takes the first queued item, then keeps collecting items
+    until either `max_batch_size` is reached or `max_wait_ms` has elapsed since the
+    first item arrived. The whole batch is passed to `predict_batch_fn` in one call
+    and each result is fanned back to the caller that submitted it.
+
+    When an `InferenceExecutor` is given, batches run on its workers so several
+    batches can be in flight; otherwise they run on the batching thread itself.
+    A full executor makes the batching thread wait for a free worker while new
+    items keep queueing, so batches grow under load; callers are only turned
+    away by the batcher's own `max_queue`.
+    """
+
+    def __init__(
+        self,
+        predict_batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "inference",
+        executor: Optional[InferenceExecutor] = None,
+        max_queue: Optional[int] = None
+    ):
+        """
+        Args:
+            predict_batch_fn: Function mapping a list of inputs to a list of results
+            max_batch_size: Largest number of items stacked into one batch
+            max_wait_ms: Longest time the first item of a batch waits for company
+            name: Label used for the worker thread and log messages
+            executor: Optional pool that runs the batched forward passes
+            max_queue: Reject new items with InferenceSaturatedError beyond this many
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.predict_batch_fn = predict_batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.name = name
+        self.executor = executor
+        self.max_queue = max_queue
+
+        self._queue: "queue.Queue[Optional[Tuple[Any, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self._batches = 0
+        self._items = 0
+
+    def start(self):
+        """Start the batching worker thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f"{self.name}-batcher", daemon=True
+            )
+            self._thread.start()
+            logger.info(
+                f"{self.name} batcher started "
+                f"(max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms})"
+            )
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the worker after it has drained the items already queued"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item for batched inference and return a future for its result"""
+        if self.max_queue is not None and self._queue.qsize() >= self.max_queue:
+            raise InferenceSaturatedError(
+                f"{self.name} batch queue is full ({self.max_queue} items waiting)"
+            )
+        self.start()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    async def predict(self, item: Any) -> Any:
+        """Awaitable wrapper around `submit` for use inside async endpoints"""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def stats(self) -> Dict:
+        """Return batching counters"""
+        return {
+            'batches': self._batches,
+            'items': self._items,
+            'mean_batch_size': round(self._items / self._batches, 2) if self._batches else 0.0,
+            'queued': self._queue.qsize(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms
+        }
+
+    def _collect(self, first: Tuple[Any, Future]) -> Tuple[List[Tuple[Any, Future]], bool]:
+        """Gather a batch starting from `first`; also report whether a stop was requested"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+
+        return batch, False
+
+    def _run(self):
+        """Worker loop: collect a batch, run it, fan results back out"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch, stop_requested = self._collect(first)
+            self._dispatch(batch)
+
+            if stop_requested:
+                return
+
+    def _dispatch(self, batch: List[Tuple[Any, Future]]):
+        """Run one batch, inline or on the executor, for callers that are still waiting"""
+        live = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+        items = [item for item, _ in live]
+
+        if self.executor is None:
+            try:
+                results = self.predict_batch_fn(items)
+            except Exception as e:
+                self._resolve(live, None, e)
+            else:
+                self._resolve(live, results, None)
+            return
+
+        # Only the function and its inputs go to the pool, so process pools work too.
+        # An accepted batch waits for a worker rather than failing with 503
+        try:
+            batch_future = self.executor.submit_when_free(self.predict_batch_fn, items)
+        except Exception as e:  # Pool shut down underneath us
+            self._resolve(live, None, e)
+            return
+
+        def on_done(done: Future):
+            error = done.exception()
+            self._resolve(live, None if error else done.result(), error)
+
+        batch_future.add_done_callback(on_done)
+
+    def _resolve(self, live: List[Tuple[Any, Future]], results: Optional[List[Any]],
+                 error: Optional[BaseException]):
+        """Fan a batch outcome back to the individual callers"""
+        if error is None and len(results) != len(live):
+            error = RuntimeError(
+                f"{self.name} batch returned {len(results)} results for {len(live)} inputs"
+            )
+        if error is not None:
+            logger.error(f"{self.name} batch of {len(live)} failed: {error}")
+            for _, future in live:
+                future.set_exception(error)
+            return
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(live)
+        for (_, future), result in zip(live, results):
+            future.set_result(result)
@@ -0,0 +1,130 @@
+"""
+Inference Executor
+Runs blocking model inference off the asyncio event loop with a bounded queue
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceSaturatedError(RuntimeError):
+    """Raised when the executor already holds as many tasks as it is allowed to queue"""
+
+
+class InferenceExecutor:
+    """
+    Thread or process pool for model inference with admission control
+
+    At most `max_workers` tasks run at once and at most `max_queue` more wait for a
+    worker. Anything beyond that is rejected immediately with
+    `InferenceSaturatedError` so the API can answer 503 instead of letting
+    requests pile up. Dispatchers that apply their own admission control, like
+    the micro-batcher, use `submit_when_free` to wait for a slot instead.
+
+    Thread mode suits PyTorch and NumPy, which release the GIL during heavy ops.
+    Process mode suits GIL-bound work; submitted callables and arguments must then
+    be picklable, so pass module-level functions rather than bound methods.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queue: int = 32,
+        kind: str = "thread",
+        name: str = "inference",
+        initializer: Optional[Callable] = None
+    ):
+        """
+        Args:
+            max_workers: Number of worker threads or processes
+            max_queue: Number of tasks allowed to wait for a free worker
+            kind: "thread" or "process"
+            name: Label used for worker threads and log messages
+            initializer: Optional callable run once in every worker
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self.name = name
+
+        if kind == "thread":
+            self._pool = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix=name, initializer=initializer
+            )
+        else:
+            self._pool = ProcessPoolExecutor(max_workers=max_workers, initializer=initializer)
+
+        self._capacity = max_workers + max_queue
+        self._slots = threading.BoundedSemaphore(self._capacity)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+        logger.info(
+            f"{name} executor started ({kind}, max_workers={max_workers}, max_queue={max_queue})"
+        )
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule `fn(*args, **kwargs)`; raise InferenceSaturatedError when full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise InferenceSaturatedError(
+                f"{self.name} executor is saturated ({self._capacity} tasks in flight)"
+            )
+        return self._schedule(fn, args, kwargs)
+
+    def submit_when_free(self, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule `fn(*args, **kwargs)`, blocking the calling thread until a slot frees up"""
+        self._slots.acquire()
+        return self._schedule(fn, args, kwargs)
+
+    def _schedule(self, fn: Callable, args, kwargs) -> Future:
+        """Hand a task to the pool once its slot has been acquired"""
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Awaitable API: run `fn` on the pool and return its result"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict:
+        """Return executor occupancy counters"""
+        with self._lock:
+            return {
+                'kind': self.kind,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and release the workers"""
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _release(self, future: Optional[Future]):
+        with self._lock:
+            self._in_flight -= 1
+            if future is not None:
+                self._completed += 1
+        self._slots.release()
@@ -0,0 +1,131 @@
+"""
+Live Camera Detection Sessions
+Per-connection state for streamed camera frames: latest-frame-wins slot, near-duplicate
+frame skipping and temporal smoothing of predictions
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from PIL import Image
+
+from .near_duplicate import NearDuplicateIndex
+
+
+class PredictionSmoother:
+    """
+    Exponential moving average of class scores across frames
+
+    Each result's top predictions are blended into running scores (classes missing
+    from a frame decay towards zero), so the reported label does not flicker when
+    consecutive frames disagree. `alpha` is the weight of the newest frame.
+    """
+
+    def __init__(self, alpha: float = 0.5, min_score: float = 0.01):
+        self.alpha = alpha
+        self.min_score = min_score
+        self.scores: Dict[str, float] = {}
+        self.frames = 0
+
+    def update(self, result: Dict) -> Dict:
+        """Blend in one detection result and return it with smoothed fields"""
+        if not result.get('success'):
+            return result
+        current = dict(result.get('all_predictions') or {})
+        current.setdefault(result['prediction'], result['confidence'])
+
+        for label in set(self.scores) | set(current):
+            blended = self.alpha * current.get(label, 0.0) + (1 - self.alpha) * self.scores.get(label, 0.0)
+            if blended >= self.min_score:
+                self.scores[label] = blended
+            else:
+                self.scores.pop(label, None)
+        self.frames += 1
+
+        label, score = max(self.scores.items(), key=lambda item: item[1])
+        top = sorted(self.scores.items(), key=lambda item: item[1], reverse=True)[:5]
+        return {
+            **result,
+            'smoothed_prediction': label,
+            'smoothed_confidence': round(score, 4),
+            'smoothed_predictions': {name: round(value, 4) for name, value in top},
+            'smoothed_frames': self.frames
+        }
+
+    def reset(self):
+        self.scores.clear()
+        self.frames = 0
+
+
+class LiveDetectionSession:
+    """
+    State for one streaming connection
+
+    Incoming frames go into a single slot: a frame arriving while the previous one
+    is still waiting replaces it (and is counted as dropped), so inference always
+    works on the newest frame and at most one frame per session is in flight.
+
+    Each session has its own small perceptual-hash index of confident results:
+    a frame within the index's Hamming distance of an analysed frame (the camera
+    held still, or pointed back at a leaf seen a moment ago) reuses that result.
+    """
+
+    def __init__(self, index: NearDuplicateIndex, smoothing_alpha: float = 0.5):
+        self.index = index
+        self.smoother = PredictionSmoother(smoothing_alpha)
+        self._pending: Optional[bytes] = None
+        self._frame_ready = asyncio.Event()
+        self._frame_hash: Optional[int] = None
+        self._namespace = ""
+        self.started = time.monotonic()
+        self.received = 0
+        self.dropped = 0
+        self.duplicates = 0
+        self.inferred = 0
+
+    def offer(self, frame: bytes):
+        """Queue a frame, replacing any frame that has not been picked up yet"""
+        self.received += 1
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = frame
+        self._frame_ready.set()
+
+    async def next_frame(self) -> bytes:
+        """Wait for and take the newest frame"""
+        await self._frame_ready.wait()
+        self._frame_ready.clear()
+        frame, self._pending = self._pending, None
+        return frame
+
+    def match(self, image: Image.Image, namespace: str) -> Optional[Dict]:
+        """
+        Smoothed result of a near-duplicate earlier frame, or None when the frame
+        needs inference; `namespace` (the model version) keeps results of a
+        replaced model from being reused
+        """
+        self._frame_hash = self.index.hash(image)
+        self._namespace = namespace
+        cached = self.index.lookup(namespace, self._frame_hash)
+        if cached is None:
+            return None
+        self.duplicates += 1
+        return self.smoother.update(cached)
+
+    def record(self, result: Dict, inference_ms: float) -> Dict:
+        """Index and smooth the result of the frame just analysed"""
+        self.inferred += 1
+        self.index.add(self._namespace, self._frame_hash, result, inference_ms)
+        return self.smoother.update(result)
+
+    def stats(self) -> Dict:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return {
+            'received': self.received,
+            'dropped': self.dropped,
+            'duplicates': self.duplicates,
+            'inferred': self.inferred,
+            'inferred_per_second': round(self.inferred / elapsed, 2),
+            'compute_saved_ms': self.index.stats.snapshot()['compute_saved_ms']
+        }
@@ -0,0 +1,384 @@
+"""
+Model Lifecycle Manager
+Single-flight model loading, background preload with warmup, readiness state,
+and an optional memory budget with least-recently-used eviction
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+EVICTED = "evicted"
+
+_SCALAR_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def resident_bytes(obj: Any, max_depth: int = 16) -> int:
+    """
+    Estimate the memory held by a model object's arrays and tensors
+
+    Walks attributes, containers and pickled state (which is where scikit-learn
+    trees keep their node arrays), counting each NumPy array and torch tensor
+    once. Memory-mapped arrays are included: their pages are resident once read.
+    """
+    seen = set()
+
+    def walk(value, depth: int) -> int:
+        if isinstance(value, _SCALAR_TYPES) or depth > max_depth or id(value) in seen:
+            return 0
+        seen.add(id(value))
+        if isinstance(value, np.ndarray):
+            return value.nbytes if value.base is None or id(value.base) not in seen else 0
+        if hasattr(value, 'element_size') and hasattr(value, 'numel'):  # torch.Tensor
+            return value.element_size() * value.numel()
+        if isinstance(getattr(value, 'nbytes', None), int):  # Sessions reporting their own size
+            return value.nbytes
+        if hasattr(value, 'state_dict') and callable(value.state_dict):  # nn.Module / ScriptModule
+            try:
+                return walk(value.state_dict(), depth + 1)
+            except Exception:
+                pass
+        if isinstance(value, dict):
+            return sum(walk(item, depth + 1) for item in value.values())
+        if isinstance(value, (list, tuple, set)):
+            return sum(walk(item, depth + 1) for item in value)
+        if callable(value) and not hasattr(value, '__dict__'):
+            return 0
+        try:
+            state = value.__getstate__()
+        except Exception:
+            state = getattr(value, '__dict__', None)
+        return walk(state, depth + 1) if state is not value else 0
+
+    return walk(obj, 0)
+
+
+class _ManagedModel:
+    """Bookkeeping for one registered model"""
+
+    def __init__(self, name: str, factory: Callable[[], Any], warmup: bool,
+                 evictable: bool, depends_on: Sequence[str]):
+        self.name = name
+        self.factory = factory
+        self.warmup = warmup
+        self.evictable = evictable and not depends_on
+        self.depends_on = tuple(depends_on)
+        self.unavailable: frozenset = frozenset()  # Dependencies that were not loaded when it was built
+        self.instance: Optional[Any] = None
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.reload_seconds: Optional[float] = None
+        self.resident_bytes = 0
+        self.evictions = 0
+        self.reloads = 0
+        self.swaps = 0
+        self.lock = threading.Lock()
+
+
+class ModelLifecycleManager:
+    """
+    Owns model loaders and makes sure each one is loaded exactly once
+
+    A model is registered with a factory that builds its loader. `get` builds the
+    loader, forces its weights to load (`get_model`) and optionally runs `warmup`,
+    all under a per-model lock so concurrent first requests wait for the same load
+    instead of starting duplicates. A failed load is retried on the next `get`.
+
+    The resident size of every loaded model is measured. With a memory budget,
+    once the total passes it the least recently used evictable models are
+    evicted: loaders with `unload` drop their weights (keeping the loader object,
+    which others may hold), anything else is dropped entirely. The next `get`
+    reloads an evicted model, without warmup; with memory-mapped weights that is
+    mostly page-cache mapping. A loader with a `reload_hook` attribute gets one on
+    eviction, so when a holder such as a detector uses it again its `get_model`
+    reloads through the manager and the budget and counters stay right.
+
+    Composite entries (`depends_on`) are never evicted or measured. While a
+    composite is READY its dependencies are pinned: it holds their loaders, so
+    evicting them would only make the next request reload them. `get` on a
+    composite keeps its dependencies recent and loads any that are not READY.
+    A dependency that fails does not fail the composite: its factory decides how
+    to serve without it, and once the dependency loads the composite is rebuilt
+    around it.
+    """
+
+    def __init__(self, memory_budget_bytes: int = 0):
+        self.memory_budget_bytes = memory_budget_bytes
+        self._models: Dict[str, _ManagedModel] = {}
+        self._preload_thread: Optional[threading.Thread] = None
+        self._recency: "OrderedDict[str, None]" = OrderedDict()  # Least recently used first
+        self._recency_lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any], warmup: bool = True,
+                 evictable: bool = True, depends_on: Sequence[str] = ()):
+        """Register a model under `name`; nothing is loaded until `get` or `preload`"""
+        self._models[name] = _ManagedModel(name, factory, warmup, evictable, depends_on)
+
+    def get(self, name: str) -> Any:
+        """Return the loaded model, loading it first if needed (raises on failure)"""
+        entry = self._models[name]
+        for dependency in entry.depends_on:
+            if self._models[dependency].state == READY:
+                self._touch(dependency)
+            else:
+                self._touch_dependency(dependency)
+        self._touch(name)
+        if entry.state == READY:
+            if any(self._models[dependency].state == READY for dependency in entry.unavailable):
+                self._rebuild(entry)
+            return entry.instance
+
+        with entry.lock:
+            if entry.state == READY:
+                return entry.instance
+            instance = self._reload(entry) if entry.state == EVICTED else self._load(entry)
+        # Accounting may take other models' locks, so it runs once this one is released
+        self._account(entry)
+        return instance
+
+    def _load(self, entry: _ManagedModel) -> Any:
+        """First load plus warmup (caller holds entry.lock)"""
+        name = entry.name
+        entry.state = LOADING
+        entry.error = None
+        started = time.perf_counter()
+        try:
+            instance = entry.factory()
+            if hasattr(instance, 'get_model'):
+                instance.get_model()
+            entry.load_seconds = round(time.perf_counter() - started, 3)
+
+            if entry.warmup and hasattr(instance, 'warmup'):
+                warmup_started = time.perf_counter()
+                instance.warmup()
+                entry.warmup_seconds = round(time.perf_counter() - warmup_started, 3)
+        except Exception as e:
+            entry.state = FAILED
+            entry.error = str(e)
+            logger.error(f"Loading model {name} failed: {e}")
+            raise
+
+        entry.instance = instance
+        entry.unavailable = self._unavailable(entry)
+        entry.state = READY
+        logger.info(f"Model {name} ready (load {entry.load_seconds}s, warmup {entry.warmup_seconds}s)")
+        return instance
+
+    def _rebuild(self, entry: _ManagedModel):
+        """Rebuild a READY composite around dependencies that have loaded since it was built"""
+        with entry.lock:
+            recovered = [dependency for dependency in entry.unavailable if self._models[dependency].state == READY]
+            if not recovered:
+                return
+            try:
+                entry.instance = entry.factory()
+            except Exception as e:
+                logger.error(f"Rebuilding {entry.name} around {recovered} failed, keeping it as it was: {e}")
+                return
+            entry.unavailable = self._unavailable(entry)
+        logger.info(f"Rebuilt {entry.name} now that {', '.join(recovered)} loaded")
+
+    def _reload(self, entry: _ManagedModel) -> Any:
+        """Bring an evicted model back (caller holds entry.lock)"""
+        entry.state = LOADING
+        started = time.perf_counter()
+        try:
+            if entry.instance is None:
+                entry.instance = entry.factory()
+            if hasattr(entry.instance, 'reload_hook'):
+                entry.instance.reload_hook = None  # This is the reload; don't route back here
+            if hasattr(entry.instance, 'get_model'):
+                entry.instance.get_model()
+        except Exception as e:
+            # Stay evicted so the next get (or holder) retries the same loader
+            entry.state = EVICTED
+            entry.error = str(e)
+            self._set_reload_hook(entry)
+            logger.error(f"Reloading model {entry.name} failed: {e}")
+            raise
+        entry.reload_seconds = round(time.perf_counter() - started, 3)
+        entry.reloads += 1
+        entry.error = None
+        entry.state = READY
+        logger.info(f"Model {entry.name} reloaded in {entry.reload_seconds}s")
+        return entry.instance
+
+    def swap(self, name: str, factory: Callable[[], Any]) -> Any:
+        """
+        Replace a model with a new version without a gap in service
+
+        The replacement is built, loaded and warmed while the current instance keeps
+        serving; a single assignment then makes it current. Requests that already
+        hold the old instance finish on it. Composites depending on the model are
+        rebuilt around the new instance. Raises, leaving the old version in place,
+        if the new one fails to load.
+        """
+        entry = self._models[name]
+        started = time.perf_counter()
+        instance = factory()
+        if hasattr(instance, 'get_model'):
+            instance.get_model()
+        if entry.warmup and hasattr(instance, 'warmup'):
+            instance.warmup()
+
+        with entry.lock:
+            entry.factory = factory
+            entry.instance = instance
+            entry.state = READY
+            entry.error = None
+            entry.load_seconds = round(time.perf_counter() - started, 3)
+            entry.swaps += 1
+        self._touch(name)
+        self._account(entry)
+
+        for dependent in self._models.values():
+            if name in dependent.depends_on and dependent.state == READY:
+                with dependent.lock:
+                    dependent.instance = dependent.factory()
+                    dependent.unavailable = self._unavailable(dependent)
+        return instance
+
+    def _touch(self, name: str):
+        with self._recency_lock:
+            self._recency[name] = None
+            self._recency.move_to_end(name)
+
+    def _set_reload_hook(self, entry: _ManagedModel):
+        """Make a held loader's next lazy load go through `get`"""
+        if entry.instance is not None and hasattr(entry.instance, 'reload_hook'):
+            entry.instance.reload_hook = functools.partial(self.get, entry.name)
+
+    def _unavailable(self, entry: _ManagedModel) -> frozenset:
+        """Dependencies of a composite that are not loaded right now"""
+        return frozenset(dependency for dependency in entry.depends_on if self._models[dependency].state != READY)
+
+    def _pinned(self) -> set:
+        """Dependencies of READY composites"""
+        return {
+            dependency for entry in self._models.values() if entry.depends_on and entry.state == READY
+            for dependency in entry.depends_on
+        }
+
+    def _touch_dependency(self, name: str):
+        """Keep a composite's dependency recent and loaded; its own errors surface when it is used"""
+        try:
+            self.get(name)
+        except Exception as e:
+            logger.warning(f"Dependency {name} unavailable: {e}")
+
+    def _account(self, entry: _ManagedModel):
+        """Measure a freshly (re)loaded model, then evict down to the budget if there is one"""
+        if entry.depends_on:
+            return
+        # Measured with or without a budget: memory_stats reports it for capacity planning
+        entry.resident_bytes = resident_bytes(entry.instance)
+        if self.memory_budget_bytes:
+            self._enforce_budget(keep=entry.name)
+
+    def _enforce_budget(self, keep: str):
+        """Evict least recently used models until the resident total fits the budget"""
+        victims = []
+        pinned = self._pinned()
+        with self._recency_lock:
+            total = self.resident_total()
+            for name in list(self._recency):
+                if total <= self.memory_budget_bytes:
+                    break
+                entry = self._models[name]
+                if name == keep or name in pinned or not entry.evictable or entry.state != READY:
+                    continue
+                entry.state = EVICTED
+                total -= entry.resident_bytes
+                victims.append(entry)
+
+        for entry in victims:
+            # A request already holding the loader keeps working: it reloads lazily,
+            # through the manager when the loader takes a reload hook
+            with entry.lock:
+                if entry.state != EVICTED:
+                    continue
+                if hasattr(entry.instance, 'unload'):
+                    entry.instance.unload()
+                    self._set_reload_hook(entry)
+                else:
+                    entry.instance = None
+                entry.resident_bytes = 0
+                entry.evictions += 1
+            logger.info(f"Evicted model {entry.name} to stay within the memory budget")
+        if total > self.memory_budget_bytes:
+            logger.warning(
+                f"Resident models use {total / 1e6:.0f} MB, over the {self.memory_budget_bytes / 1e6:.0f} MB "
+                f"budget, with nothing left to evict (models held by ready composites are pinned)"
+            )
+
+    def resident_total(self) -> int:
+        return sum(entry.resident_bytes for entry in self._models.values() if entry.state == READY)
+
+    def preload(self, names: Optional[Iterable[str]] = None, background: bool = True):
+        """Load (and warm) the given models, by default all of them, optionally in a thread"""
+        names = list(names) if names is not None else list(self._models)
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # Recorded as FAILED; /ready reports it
+
+        if not background:
+            run()
+            return
+        self._preload_thread = threading.Thread(target=run, name="model-preload", daemon=True)
+        self._preload_thread.start()
+
+    def is_ready(self, names: Optional[Iterable[str]] = None) -> bool:
+        """True when every named model (default: all) is loaded and warmed"""
+        names = names if names is not None else self._models
+        return all(self._models[name].state == READY for name in names)
+
+    def status(self) -> Dict[str, Dict]:
+        """Per-model state, timings and last error"""
+        return {
+            name: {
+                'state': entry.state,
+                'load_seconds': entry.load_seconds,
+                'warmup_seconds': entry.warmup_seconds,
+                'error': entry.error
+            }
+            for name, entry in self._models.items()
+        }
+
+    def memory_stats(self) -> Dict:
+        """Budget, resident sizes and eviction/reload counters, for sizing instances"""
+        models = {
+            name: {
+                'state': entry.state,
+                'resident_mb': round(entry.resident_bytes / 1e6, 1),
+                'evictable': entry.evictable,
+                'evictions': entry.evictions,
+                'reloads': entry.reloads,
+                'reload_seconds': entry.reload_seconds,
+                'swaps': entry.swaps
+            }
+            for name, entry in self._models.items() if not entry.depends_on
+        }
+        return {
+            'budget_mb': round(self.memory_budget_bytes / 1e6, 1) if self.memory_budget_bytes else None,
+            'resident_mb': round(self.resident_total() / 1e6, 1),
+            'evictions': sum(entry.evictions for entry in self._models.values()),
+            'reloads': sum(entry.reloads for entry in self._models.values()),
+            'models': models
+        }
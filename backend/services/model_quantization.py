@@ -0,0 +1,188 @@
+"""
+INT8 Post-Training Static Quantization for the ResNet50 Disease Models
+Calibrates on the training image folders and reports accuracy against FP32
+
+Usage (from the backend directory, once per model):
+    python -m services.model_quantization --model rice \
+        --train-dir ../Rice_Organized/train --val-dir ../Rice_Organized/val
+
+Writes `<checkpoint>_int8.pt` (TorchScript) next to the checkpoint in models/, with
+`<checkpoint>_int8.json` recording the checkpoint and manifest version it came
+from, and merges the per-model results into models/quantization_report.json. The
+API uses the INT8 artifacts when QUANTIZED_INFERENCE=1 and they are current.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import torch
+from torch.utils.data import DataLoader, Subset
+from torchvision import datasets
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from model_loader import (  # noqa: E402
+    PlantDocModelLoader, MaizeModelLoader, RiceModelLoader,
+    image_to_tensor, quantized_model_path, to_rgb, write_quantized_source
+)
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = BACKEND_DIR.parent / "models"
+REPORT_PATH = MODELS_DIR / "quantization_report.json"
+
+LOADERS = {
+    'plantdoc': (PlantDocModelLoader, "plantdoc_resnet50_finetuned.pth"),
+    'maize': (MaizeModelLoader, "maize_resnet50.pth"),
+    'rice': (RiceModelLoader, "rice_resnet50.pth"),
+}
+
+
+def build_quantized_resnet50(
+    state_dict: Dict,
+    num_classes: int,
+    calibration_batches: Iterable[torch.Tensor],
+    engine: str = "fbgemm"
+) -> torch.nn.Module:
+    """
+    Quantize a ResNet50 state dict to INT8 with static calibration
+
+    Args:
+        state_dict: FP32 weights with the torchvision ResNet50 layout
+        num_classes: Output size of the fc layer
+        calibration_batches: Preprocessed N x 3 x H x W batches used to fit activation ranges
+        engine: Quantized backend ("fbgemm" for x86, "qnnpack" for ARM)
+
+    Returns:
+        Converted INT8 model in eval mode
+    """
+    from torchvision.models.quantization import resnet50 as quantizable_resnet50
+
+    torch.backends.quantized.engine = engine
+    model = quantizable_resnet50(weights=None, quantize=False, num_classes=num_classes)
+    model.load_state_dict(state_dict)
+    model.eval()
+
+    # Fold conv + bn + relu so they quantize as one op
+    model.fuse_model(is_qat=False)
+    model.qconfig = torch.ao.quantization.get_default_qconfig(engine)
+    torch.ao.quantization.prepare(model, inplace=True)
+
+    with torch.no_grad():
+        for batch in calibration_batches:
+            model(batch)
+
+    torch.ao.quantization.convert(model, inplace=True)
+    return model
+
+
+def image_folder(root: str, loader, limit: Optional[int] = None, seed: int = 0):
+    """ImageFolder using the loader's own preprocessing, optionally subsampled"""
+    dataset = datasets.ImageFolder(
+        root,
+        transform=lambda image: image_to_tensor(to_rgb(image), loader.input_size, loader.normalize)[0]
+    )
+    if limit is not None and limit < len(dataset):
+        indices = random.Random(seed).sample(range(len(dataset)), limit)
+        dataset = Subset(dataset, indices)
+    return dataset
+
+
+def evaluate(fp32_model, int8_model, dataset, batch_size: int = 16) -> Dict:
+    """Top-1 accuracy of both models, their agreement and per-image CPU latency"""
+    loader = DataLoader(dataset, batch_size=batch_size)
+    totals = {'images': 0, 'fp32_correct': 0, 'int8_correct': 0, 'agree': 0}
+    times = {'fp32': 0.0, 'int8': 0.0}
+
+    with torch.no_grad():
+        for images, labels in loader:
+            t0 = time.perf_counter()
+            fp32_pred = fp32_model(images).argmax(1)
+            times['fp32'] += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            int8_pred = int8_model(images).argmax(1)
+            times['int8'] += time.perf_counter() - t0
+
+            totals['images'] += labels.shape[0]
+            totals['fp32_correct'] += (fp32_pred == labels).sum().item()
+            totals['int8_correct'] += (int8_pred == labels).sum().item()
+            totals['agree'] += (fp32_pred == int8_pred).sum().item()
+
+    count = max(totals['images'], 1)
+    fp32_acc = totals['fp32_correct'] / count
+    int8_acc = totals['int8_correct'] / count
+    return {
+        'images': totals['images'],
+        'fp32_accuracy': round(fp32_acc, 4),
+        'int8_accuracy': round(int8_acc, 4),
+        'accuracy_delta': round(int8_acc - fp32_acc, 4),
+        'prediction_agreement': round(totals['agree'] / count, 4),
+        'fp32_ms_per_image': round(times['fp32'] * 1000 / count, 2),
+        'int8_ms_per_image': round(times['int8'] * 1000 / count, 2),
+    }
+
+
+def quantize(model_key: str, train_dir: str, val_dir: Optional[str],
+             calibration_images: int, engine: str) -> Dict:
+    """Calibrate, convert and save one model, then compare it against FP32"""
+    loader_cls, filename = LOADERS[model_key]
+    checkpoint = MODELS_DIR / filename
+    loader = loader_cls(str(checkpoint))
+    loader.device = torch.device("cpu")
+    # Not get_model(): that returns the INT8 or exported artifact when one is configured
+    fp32_model = loader.load_fp32()
+
+    calibration = DataLoader(image_folder(train_dir, loader, calibration_images), batch_size=16)
+    int8_model = build_quantized_resnet50(
+        fp32_model.state_dict(), len(loader.classes),
+        (images for images, _ in calibration), engine
+    )
+
+    example = torch.zeros(1, 3, loader.input_size, loader.input_size)
+    output_path = quantized_model_path(str(checkpoint))
+    torch.jit.save(torch.jit.trace(int8_model, example), str(output_path))
+    write_quantized_source(str(checkpoint), loader.version)
+
+    report = {
+        'artifact': output_path.name,
+        'engine': engine,
+        'calibration_images': min(calibration_images, len(calibration.dataset)),
+        'fp32_size_mb': round(os.path.getsize(checkpoint) / 1e6, 1),
+        'int8_size_mb': round(os.path.getsize(output_path) / 1e6, 1),
+    }
+    if val_dir:
+        report.update(evaluate(fp32_model, int8_model, image_folder(val_dir, loader)))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize a disease model to INT8")
+    parser.add_argument("--model", choices=sorted(LOADERS), required=True)
+    parser.add_argument("--train-dir", required=True, help="ImageFolder used for calibration")
+    parser.add_argument("--val-dir", help="ImageFolder used for the accuracy report")
+    parser.add_argument("--calibration-images", type=int, default=256)
+    parser.add_argument("--engine", default="fbgemm", choices=["fbgemm", "qnnpack"])
+    args = parser.parse_args()
+
+    report = quantize(args.model, args.train_dir, args.val_dir, args.calibration_images, args.engine)
+
+    all_reports = json.loads(REPORT_PATH.read_text()) if REPORT_PATH.exists() else {}
+    all_reports[args.model] = report
+    REPORT_PATH.write_text(json.dumps(all_reports, indent=2))
+
+    print(json.dumps({args.model: report}, indent=2))
+    print(f"Report written to {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
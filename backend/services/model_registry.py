@@ -0,0 +1,241 @@
+"""
+Declarative Model Registry
+JSON manifests describing each image model, and hot reload of new versions without restarts
+
+A manifest (`models/manifests/<name>.json`) lists everything needed to serve a model:
+
+    {
+        "name": "rice",
+        "display_name": "Rice",
+        "version": "1.0.0",
+        "path": "rice_resnet50.pth",
+        "architecture": "resnet50",
+        "checkpoint_format": "state_dict",
+        "kind": "disease",
+        "transform": {"input_size": 256, "normalize": null},
+        "classes": ["bacterial_leaf_blight", "..."]
+    }
+
+`path` is relative to the models directory. `checkpoint_format` is `state_dict`
+or `full_module` (a pickled nn.Module). `normalize` is `"imagenet"`, null, or
+explicit `{"mean": [...], "std": [...]}`. `kind` is `disease` or `router`.
+
+A distilled student (`<teacher>_fast.json`, written by
+models/Context/distill_student.py) also names its `teacher`, the
+`escalation_threshold` below which the teacher takes over, and the
+`distillation` report with the accuracy delta measured on the validation split.
+
+Shipping a retrained model means dropping the checkpoint next to the others and
+bumping `path`/`version` in its manifest; the registry notices, loads and warms
+the new version in the background and swaps it in atomically.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / "models"
+MANIFEST_DIR = MODELS_DIR / "manifests"
+
+IMAGENET_NORMALIZE = ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225))
+CHECKPOINT_FORMATS = ("state_dict", "full_module")
+KINDS = ("disease", "router")
+
+
+class ManifestError(ValueError):
+    """Raised for a manifest that is missing fields or has invalid values"""
+
+
+class ModelManifest:
+    """Validated contents of one model manifest"""
+
+    def __init__(self, data: Dict, source: Optional[Path] = None, models_dir: Path = MODELS_DIR):
+        missing = [key for key in ("name", "version", "path", "architecture", "classes", "transform") if key not in data]
+        if missing:
+            raise ManifestError(f"{source or 'manifest'} is missing {', '.join(missing)}")
+
+        self.name: str = data["name"]
+        self.display_name: str = data.get("display_name", self.name)
+        self.version: str = str(data["version"])
+        self.architecture: str = data["architecture"]
+        self.checkpoint_format: str = data.get("checkpoint_format", "state_dict")
+        self.kind: str = data.get("kind", "disease")
+        self.classes: List[str] = list(data["classes"])
+        self.teacher: Optional[str] = data.get("teacher")
+        self.escalation_threshold: Optional[float] = data.get("escalation_threshold")
+        self.distillation: Optional[Dict] = data.get("distillation")
+        self.source = source
+        self.raw = data
+
+        path = Path(data["path"])
+        self.path = path if path.is_absolute() else models_dir / path
+
+        transform = data["transform"]
+        self.input_size = int(transform["input_size"])
+        self.normalize = self._parse_normalize(transform.get("normalize"))
+
+        if self.checkpoint_format not in CHECKPOINT_FORMATS:
+            raise ManifestError(f"{self.name}: checkpoint_format must be one of {CHECKPOINT_FORMATS}")
+        if self.kind not in KINDS:
+            raise ManifestError(f"{self.name}: kind must be one of {KINDS}")
+        if not self.classes:
+            raise ManifestError(f"{self.name}: classes is empty")
+
+    @staticmethod
+    def _parse_normalize(value) -> Optional[Tuple[Tuple[float, ...], Tuple[float, ...]]]:
+        if value is None:
+            return None
+        if value == "imagenet":
+            return IMAGENET_NORMALIZE
+        return tuple(float(v) for v in value["mean"]), tuple(float(v) for v in value["std"])
+
+    @classmethod
+    def from_file(cls, path: Path, models_dir: Path = MODELS_DIR) -> "ModelManifest":
+        with open(path, encoding="utf-8") as handle:
+            return cls(json.load(handle), source=Path(path), models_dir=models_dir)
+
+    def fingerprint(self) -> str:
+        """Changes when the manifest or the checkpoint it points to changes"""
+        try:
+            stat = self.path.stat()
+            checkpoint = f"{stat.st_size}:{int(stat.st_mtime)}"
+        except OSError:
+            checkpoint = "missing"
+        content = json.dumps(self.raw, sort_keys=True)
+        return hashlib.blake2b(f"{content}|{checkpoint}".encode(), digest_size=8).hexdigest()
+
+
+def load_manifest(name: str, manifest_dir: Path = MANIFEST_DIR) -> ModelManifest:
+    """Read `<manifest_dir>/<name>.json`"""
+    return ModelManifest.from_file(Path(manifest_dir) / f"{name}.json", models_dir=Path(manifest_dir).parent)
+
+
+def load_manifests(manifest_dir: Path = MANIFEST_DIR) -> Dict[str, ModelManifest]:
+    """Every manifest in the directory, keyed by model name"""
+    manifests = {}
+    for path in sorted(Path(manifest_dir).glob("*.json")):
+        manifest = ModelManifest.from_file(path, models_dir=Path(manifest_dir).parent)
+        manifests[manifest.name] = manifest
+    return manifests
+
+
+class ModelRegistry:
+    """
+    Serves the models described by the manifests and rolls out new versions live
+
+    Each manifest is registered with the lifecycle manager under its name, with a
+    factory that builds a loader from the manifest. `check_for_updates` re-reads
+    the manifests; for every model whose manifest or checkpoint changed it asks the
+    lifecycle manager to swap in the new version, which is loaded and warmed
+    before a single reference assignment makes it current. Requests already
+    running keep the old loader until they finish. A version that fails to load
+    is logged and skipped, and the old one keeps serving.
+    """
+
+    def __init__(self, lifecycle, build_loader: Callable[[ModelManifest], Any],
+                 manifest_dir: Path = MANIFEST_DIR, warmup: bool = True):
+        self.lifecycle = lifecycle
+        self.build_loader = build_loader
+        self.manifest_dir = Path(manifest_dir)
+        self.warmup = warmup
+        self.manifests: Dict[str, ModelManifest] = {}
+        self.generation = 0  # Bumped on every successful swap
+        self.swaps = 0
+        self.failed_swaps = 0
+        self._fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._watch_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register_all(self, names: Optional[List[str]] = None) -> Dict[str, ModelManifest]:
+        """Register the manifests (optionally only `names`) with the lifecycle manager"""
+        for name, manifest in load_manifests(self.manifest_dir).items():
+            if names is not None and name not in names:
+                continue
+            self.manifests[name] = manifest
+            self._fingerprints[name] = manifest.fingerprint()
+            self.lifecycle.register(name, self._factory(manifest), warmup=self.warmup)
+        return self.manifests
+
+    def _factory(self, manifest: ModelManifest) -> Callable[[], Any]:
+        return lambda: self.build_loader(manifest)
+
+    def check_for_updates(self) -> List[str]:
+        """Swap in every registered model whose manifest or checkpoint changed; returns their names"""
+        with self._lock:  # One rollout at a time
+            try:
+                current = load_manifests(self.manifest_dir)
+            except (OSError, ValueError) as e:
+                logger.error(f"Reading manifests failed, keeping the serving versions: {e}")
+                return []
+
+            swapped = []
+            for name, manifest in current.items():
+                if name not in self.manifests:
+                    continue
+                fingerprint = manifest.fingerprint()
+                if fingerprint == self._fingerprints.get(name):
+                    continue
+                old_version = self.manifests[name].version
+                try:
+                    self.lifecycle.swap(name, self._factory(manifest))
+                except Exception as e:
+                    self.failed_swaps += 1
+                    self._fingerprints[name] = fingerprint  # Do not retry the same broken version
+                    logger.error(f"Rolling out {name} {manifest.version} failed, still serving {old_version}: {e}")
+                    continue
+                self.manifests[name] = manifest
+                self._fingerprints[name] = fingerprint
+                self.generation += 1
+                self.swaps += 1
+                swapped.append(name)
+                logger.info(f"Swapped {name} {old_version} -> {manifest.version}")
+            return swapped
+
+    def start_watching(self, interval_seconds: float):
+        """Poll the manifests in a background thread"""
+        if self._watch_thread is not None or interval_seconds <= 0:
+            return
+
+        def watch():
+            while not self._stop.wait(interval_seconds):
+                self.check_for_updates()
+
+        self._watch_thread = threading.Thread(target=watch, name="model-registry-watch", daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def versions(self) -> Dict[str, str]:
+        return {name: manifest.version for name, manifest in self.manifests.items()}
+
+    def status(self) -> Dict:
+        return {
+            'manifest_dir': str(self.manifest_dir),
+            'generation': self.generation,
+            'swaps': self.swaps,
+            'failed_swaps': self.failed_swaps,
+            'watching': self._watch_thread is not None,
+            'models': {
+                name: {
+                    'version': manifest.version,
+                    'path': manifest.path.name,
+                    'architecture': manifest.architecture,
+                    'classes': len(manifest.classes),
+                    'input_size': manifest.input_size,
+                    'teacher': manifest.teacher,
+                    'distillation': manifest.distillation,
+                    'updated': time.strftime(
+                        '%Y-%m-%dT%H:%M:%S', time.localtime(manifest.source.stat().st_mtime)
+                    ) if manifest.source and manifest.source.exists() else None
+                }
+                for name, manifest in self.manifests.items()
+            }
+        }
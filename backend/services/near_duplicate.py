@@ -0,0 +1,192 @@
+"""
+Near-Duplicate Detection Index
+Perceptual hashes of images and a small Hamming-distance index of confident results,
+so camera frames and re-cropped uploads of the same scene skip inference
+"""
+
+import math
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8  # 64-bit hashes
+HASH_METHODS = ("dhash", "phash")
+
+# Set bits in every byte value, for vectorized popcount
+_POPCOUNT8 = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def _pack_bits(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.reshape(-1)).tobytes(), "big")
+
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash: sign of horizontal gradients on a (hash_size + 1) x hash_size grayscale thumbnail"""
+    pixels = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    return _pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so dct(X) = M @ X @ M.T"""
+    k = np.arange(size)[:, None]
+    i = np.arange(size)[None, :]
+    matrix = np.cos(math.pi * (2 * i + 1) * k / (2 * size)) * math.sqrt(2 / size)
+    matrix[0] /= math.sqrt(2)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def phash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """DCT hash: low-frequency coefficients of a 32 x 32 grayscale thumbnail against their median"""
+    pixels = np.asarray(image.convert("L").resize((32, 32), Image.BILINEAR), dtype=np.float32)
+    low = (_DCT_32 @ pixels @ _DCT_32.T)[:hash_size, :hash_size]
+    median = np.median(low.reshape(-1)[1:])  # Leave out the DC term, which only tracks brightness
+    return _pack_bits(low > median)
+
+
+def perceptual_hash(image: Image.Image, method: str = "dhash") -> int:
+    return phash(image) if method == "phash" else dhash(image)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateStats:
+    """Lookup counters and an estimate of the inference time saved by hits"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.inserts = 0
+        self.inferences = 0
+        self.inference_ms = 0.0
+
+    def record_lookup(self, hit: bool):
+        with self._lock:
+            self.lookups += 1
+            self.hits += hit
+
+    def record_inference(self, inference_ms: float, stored: bool):
+        with self._lock:
+            self.inserts += stored
+            self.inferences += 1
+            self.inference_ms += inference_ms
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            mean_ms = self.inference_ms / self.inferences if self.inferences else 0.0
+            return {
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                'inserts': self.inserts,
+                'mean_inference_ms': round(mean_ms, 1),
+                'compute_saved_ms': round(self.hits * mean_ms, 1)
+            }
+
+
+class NearDuplicateIndex:
+    """
+    Fixed-size index of (perceptual hash -> detection result)
+
+    Entries live in preallocated NumPy slots overwritten in FIFO order; a lookup
+    XORs the query against every live slot of its namespace and counts differing
+    bits with a byte lookup table, returning the nearest result within
+    `max_distance` bits. Only results with confidence >= `min_confidence` are
+    stored, so an uncertain prediction is never reused. Namespaces keep results
+    of different models and model versions apart.
+    """
+
+    def __init__(self, max_entries: int = 2048, max_distance: int = 6, min_confidence: float = 0.6,
+                 ttl_seconds: float = 600.0, method: str = "dhash",
+                 shared_stats: Optional[NearDuplicateStats] = None):
+        if method not in HASH_METHODS:
+            raise ValueError(f"method must be one of {HASH_METHODS}")
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.min_confidence = min_confidence
+        self.ttl_seconds = ttl_seconds
+        self.method = method
+        self.stats = NearDuplicateStats()
+        self.shared_stats = shared_stats
+        self._hashes = np.zeros(max(max_entries, 1), dtype=np.uint64)
+        self._stored_at = np.full(max(max_entries, 1), -np.inf)
+        self._namespace_ids = np.full(max(max_entries, 1), -1, dtype=np.int32)
+        self._namespace_lookup: Dict[str, int] = {}
+        self._results: list = [None] * max(max_entries, 1)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def hash(self, image: Image.Image) -> int:
+        return perceptual_hash(image, self.method)
+
+    def lookup(self, namespace: str, image_hash: int) -> Optional[Any]:
+        """Nearest stored result within max_distance, or None"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            result = None
+            namespace_id = self._namespace_lookup.get(namespace, -2)
+            live = np.flatnonzero(
+                (now - self._stored_at <= self.ttl_seconds) & (self._namespace_ids == namespace_id)
+            )
+            if live.size:
+                xor = self._hashes[live] ^ np.uint64(image_hash)
+                distances = _POPCOUNT8[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+                nearest = int(distances.argmin())
+                if distances[nearest] <= self.max_distance:
+                    result = self._results[live[nearest]]
+        self._record_lookup(result is not None)
+        return result
+
+    def add(self, namespace: str, image_hash: int, result: Dict, inference_ms: float = 0.0):
+        """
+        Record a fresh inference and store its result if it is confident enough,
+        overwriting the oldest slot; `inference_ms` feeds the compute-saved estimate
+        """
+        if not self.enabled:
+            return
+        stored = bool(result.get('success')) and result.get('confidence', 0.0) >= self.min_confidence
+        if stored:
+            with self._lock:
+                slot = self._next
+                self._hashes[slot] = np.uint64(image_hash)
+                self._stored_at[slot] = time.monotonic()
+                self._namespace_ids[slot] = self._namespace_lookup.setdefault(namespace, len(self._namespace_lookup))
+                self._results[slot] = result
+                self._next = (slot + 1) % self.max_entries
+        self.stats.record_inference(inference_ms, stored)
+        if self.shared_stats is not None:
+            self.shared_stats.record_inference(inference_ms, stored)
+
+    def _record_lookup(self, hit: bool):
+        self.stats.record_lookup(hit)
+        if self.shared_stats is not None:
+            self.shared_stats.record_lookup(hit)
+
+    def clear(self):
+        with self._lock:
+            self._stored_at[:] = -np.inf
+            self._namespace_ids[:] = -1
+            self._results = [None] * len(self._results)
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats.snapshot(),
+            'method': self.method,
+            'max_distance': self.max_distance,
+            'min_confidence': self.min_confidence,
+            'max_entries': self.max_entries
+        }
@@ -0,0 +1,107 @@
+"""
+Detection Result Cache
+Content-addressed LRU cache with TTL for disease and pest detection results
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+
+def image_digest(image: Image.Image) -> str:
+    """Hash of the decoded pixels, so re-encoded copies of a photo share a key"""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    hasher.update(image.tobytes())
+    return hasher.hexdigest()
+
+
+def model_version(*paths, extra: str = "") -> str:
+    """Version tag for a set of model files: changes when any file is replaced"""
+    parts = [extra]
+    for path in paths:
+        path = Path(path)
+        try:
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_size}:{int(stat.st_mtime)}")
+        except OSError:
+            parts.append(f"{path.name}:missing")
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=8).hexdigest()
+
+
+class DetectionResultCache:
+    """
+    Thread-safe LRU cache bounded by entry count and entry age
+
+    Keys combine the detection kind, the model version and the image digest, so a
+    model update never serves stale results and the disease, pest and combined
+    endpoints share entries for the same photo.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(kind: str, version: str, digest: str) -> str:
+        return f"{kind}:{version}:{digest}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value or None, counting the hit or miss"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]  # Expired
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        """Store a value, evicting least recently used entries beyond the bound"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
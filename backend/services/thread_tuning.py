@@ -0,0 +1,318 @@
+"""
+CPU Thread-Topology Autotuner
+Benchmarks ResNet50 forward passes under candidate (uvicorn workers x torch threads)
+layouts on this host and persists the best one for model_loader to apply
+
+Every uvicorn worker is a separate process with its own intra-op thread team per
+calling thread; by default each team has one thread per core, so N workers, each
+running several models side by side, start many times more busy threads than
+there are cores. The tuner measures what the host actually sustains: for each
+candidate it starts `workers` processes, each running `streams` concurrent
+forward passes (the disease models of one request when PARALLEL_MODELS is on)
+with `threads` intra-op threads, and records throughput and latency. The
+profile is keyed by a host fingerprint, so a copy taken to other hardware is
+ignored rather than misapplied.
+
+Usage (from the backend directory):
+    python -m services.thread_tuning tune
+    python -m services.thread_tuning tune --seconds 8 --max-p95-ms 400
+    python -m services.thread_tuning show
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / "models"
+THREAD_PROFILE_PATH = Path(os.getenv('THREAD_PROFILE_PATH', str(MODELS_DIR / "thread_profile.json")))
+
+# A lock older than this is left over from a crashed tuning run
+STALE_LOCK_SECONDS = 1800
+OBJECTIVES = ("throughput", "latency")
+
+
+def available_cores() -> int:
+    """Cores this process may run on (respects CPU affinity and container cpusets)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def host_fingerprint() -> str:
+    """CPU model, usable cores and torch version; a profile only applies where these match"""
+    import torch
+
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("model name"):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{cpu}|{available_cores()} cores|torch {torch.__version__}"
+
+
+def serving_streams() -> int:
+    """
+    Forward passes one request runs at once: the three disease models side by side
+    with PARALLEL_MODELS (the default), otherwise one
+    """
+    parallel = os.getenv('PARALLEL_MODELS', '1').lower() in ('1', 'true', 'yes')
+    return 3 if parallel else 1
+
+
+def candidate_layouts(cores: int, streams: int, max_workers: int) -> List[Dict]:
+    """
+    Worker counts (powers of two) x thread counts that fit the cores, plus the
+    untuned all-cores layout for each worker count as a baseline
+    """
+    layouts = []
+    workers = 1
+    while workers <= min(cores, max_workers):
+        threads_options = {t for t in (1, 2, 3, 4, 6, 8, 12, 16, 24, 32) if workers * streams * t <= cores}
+        threads_options.add(max(1, cores // (workers * streams)))
+        for threads in sorted(threads_options):
+            layouts.append({'workers': workers, 'threads': threads, 'streams': streams, 'baseline': False})
+        if cores not in threads_options:
+            layouts.append({'workers': workers, 'threads': cores, 'streams': streams, 'baseline': True})
+        workers *= 2
+    return layouts
+
+
+def _benchmark_worker(threads: int, interop_threads: int, streams: int, input_size: int,
+                      seconds: float, barrier, results):
+    """One simulated uvicorn worker: `streams` threads doing ResNet50 forward passes"""
+    import torch
+    from torchvision import models
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        pass
+    model = models.resnet50(weights=None).eval()  # Weights do not change the cost
+    batch = torch.zeros(1, 3, input_size, input_size)
+    with torch.no_grad():
+        for _ in range(2):
+            model(batch)
+
+    latencies: List[List[float]] = [[] for _ in range(streams)]
+
+    def run(stream: int, deadline: float):
+        torch.set_num_threads(threads)  # Intra-op teams are per calling thread
+        with torch.no_grad():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                model(batch)
+                latencies[stream].append((time.perf_counter() - started) * 1000)
+
+    barrier.wait()
+    started = time.perf_counter()
+    deadline = started + seconds
+    runners = [threading.Thread(target=run, args=(stream, deadline)) for stream in range(streams)]
+    for runner in runners:
+        runner.start()
+    for runner in runners:
+        runner.join()
+    results.put({'elapsed': time.perf_counter() - started, 'latencies': sum(latencies, [])})
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure_layout(layout: Dict, seconds: float, interop_threads: int = 1, input_size: int = 224) -> Dict:
+    """Run one layout and report images/s across all workers plus per-pass latency"""
+    context = multiprocessing.get_context("spawn")  # Fresh torch thread pools per worker
+    barrier = context.Barrier(layout['workers'])
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_benchmark_worker,
+            args=(layout['threads'], interop_threads, layout['streams'], input_size, seconds, barrier, results)
+        )
+        for _ in range(layout['workers'])
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sum((report['latencies'] for report in reports), [])
+    throughput = sum(len(report['latencies']) / report['elapsed'] for report in reports)
+    return {
+        **layout,
+        'interop_threads': interop_threads,
+        'images_per_second': round(throughput, 2),
+        'p50_ms': round(_percentile(latencies, 50), 1),
+        'p95_ms': round(_percentile(latencies, 95), 1)
+    }
+
+
+def choose_layout(results: List[Dict], objective: str = "throughput",
+                  max_p95_ms: Optional[float] = None) -> Dict:
+    """
+    Best layout: highest throughput (ties to lower p95) or lowest p95 (ties to
+    higher throughput), among the layouts within the p95 budget when one is given
+    """
+    eligible = [r for r in results if max_p95_ms is None or r['p95_ms'] <= max_p95_ms] or results
+    if objective == "latency":
+        return min(eligible, key=lambda r: (r['p95_ms'], -r['images_per_second']))
+    return max(eligible, key=lambda r: (r['images_per_second'], -r['p95_ms']))
+
+
+def tune(seconds: float = 5.0, streams: Optional[int] = None, max_workers: int = 8, objective: str = "throughput",
+         max_p95_ms: Optional[float] = None, interop_threads: int = 1,
+         progress=None) -> Dict:
+    """
+    Benchmark every candidate layout and return the profile (not yet saved);
+    `streams` defaults to what the server runs (serving_streams)
+    """
+    if streams is None:
+        streams = serving_streams()
+    cores = available_cores()
+    results = []
+    for layout in candidate_layouts(cores, streams, max_workers):
+        result = measure_layout(layout, seconds, interop_threads)
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return {
+        'host': host_fingerprint(),
+        'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'objective': objective,
+        'max_p95_ms': max_p95_ms,
+        'seconds_per_layout': seconds,
+        'chosen': choose_layout(results, objective, max_p95_ms),
+        'results': results
+    }
+
+
+def save_profile(profile: Dict, path: Path = THREAD_PROFILE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+    os.replace(temporary, path)  # Workers never see a half-written profile
+
+
+def load_profile(path: Path = THREAD_PROFILE_PATH) -> Optional[Dict]:
+    """The saved profile, or None when missing, unreadable or tuned on other hardware"""
+    try:
+        profile = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if profile.get('host') != host_fingerprint():
+        logger.warning(f"Thread profile {path} was tuned on {profile.get('host')}; ignoring it on this host")
+        return None
+    return profile
+
+
+def threads_for(profile: Dict, workers: int, streams: int) -> Optional[Dict]:
+    """
+    Best measured layout for the running worker count and streams per worker; the
+    tuned choice when it matches, otherwise the best result with that shape
+    """
+    chosen = profile['chosen']
+    if chosen['workers'] == workers and chosen['streams'] == streams:
+        return chosen
+    matching = [r for r in profile['results'] if r['workers'] == workers and r['streams'] == streams]
+    if not matching:
+        return None
+    return choose_layout(matching, profile.get('objective', 'throughput'), profile.get('max_p95_ms'))
+
+
+def ensure_profile(path: Path = THREAD_PROFILE_PATH, wait_seconds: float = 900, **tune_options) -> Optional[Dict]:
+    """
+    Load the profile, tuning first if this host has none
+
+    Several workers start at once; the first to create the lock file tunes while
+    the others wait for its profile, so the host is only benchmarked once.
+    """
+    profile = load_profile(path)
+    if profile is not None:
+        return profile
+
+    lock = Path(path).with_suffix(".lock")
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        if lock.exists() and time.time() - lock.stat().st_mtime > STALE_LOCK_SECONDS:
+            lock.unlink()
+        os.close(os.open(str(lock), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        deadline = time.monotonic() + wait_seconds
+        while lock.exists() and time.monotonic() < deadline:
+            time.sleep(1)
+        return load_profile(path)
+
+    try:
+        logger.info("No thread profile for this host; tuning (this takes a few minutes)")
+        profile = tune(**tune_options)
+        save_profile(profile, path)
+        return profile
+    except Exception as e:
+        logger.error(f"Thread autotuning failed, keeping the default thread counts: {e}")
+        return None
+    finally:
+        lock.unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune uvicorn workers x torch threads for this host")
+    parser.add_argument("command", choices=["tune", "show"])
+    parser.add_argument("--seconds", type=float, default=5.0, help="Measurement time per layout")
+    parser.add_argument("--streams", type=int, default=None,
+                        help="Concurrent forward passes per worker (default: 3 with PARALLEL_MODELS, else 1)")
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--objective", choices=OBJECTIVES, default="throughput")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="Latency budget for the chosen layout")
+    parser.add_argument("--output", default=str(THREAD_PROFILE_PATH))
+    args = parser.parse_args()
+
+    if args.command == "show":
+        profile = load_profile(args.output)
+        if profile is None:
+            print(f"⚠️ No profile for this host at {args.output}")
+            return 1
+        print(json.dumps(profile['chosen'], indent=2))
+        return 0
+
+    if args.streams is None:
+        args.streams = serving_streams()
+
+    print(f"{host_fingerprint()}")
+    print(f"{'workers':>7} {'threads':>7} {'img/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+
+    def progress(result):
+        note = "  (untuned)" if result['baseline'] else ""
+        print(f"{result['workers']:>7} {result['threads']:>7} {result['images_per_second']:>8.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}{note}")
+
+    profile = tune(args.seconds, args.streams, args.max_workers, args.objective, args.max_p95_ms,
+                   progress=progress)
+    save_profile(profile, Path(args.output))
+    chosen = profile['chosen']
+    print(f"\n✅ {chosen['workers']} workers x {chosen['threads']} threads "
+          f"({chosen['images_per_second']} img/s, p95 {chosen['p95_ms']} ms) saved to {args.output}")
+    print(f"   Start uvicorn with --workers {chosen['workers']} (or WEB_CONCURRENCY={chosen['workers']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
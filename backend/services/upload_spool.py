@@ -0,0 +1,70 @@
+"""
+Raw Upload Spooling
+Streams a raw request body into memory (or a temp file past a threshold) without extra copies
+"""
+
+import tempfile
+from typing import AsyncIterator, BinaryIO, Optional, Union
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised as soon as a streamed body passes the byte limit"""
+
+
+async def spool_body(
+    chunks: AsyncIterator[bytes],
+    max_bytes: int,
+    max_memory: int,
+    content_length: Optional[int] = None
+) -> Union[memoryview, BinaryIO]:
+    """
+    Collect a streamed body, enforcing `max_bytes` while it arrives
+
+    Small bodies accumulate in one growing bytearray and are returned as a
+    memoryview over it, so the decoder reads the received bytes in place. Bodies
+    past `max_memory` spill to an anonymous temp file, returned rewound.
+
+    Args:
+        chunks: The request body stream
+        max_bytes: Reject bodies larger than this
+        max_memory: Keep bodies up to this size in memory
+        content_length: Declared length, checked before reading anything
+    """
+    if content_length is not None and content_length > max_bytes:
+        raise UploadTooLargeError(f"Body is {content_length} bytes; the limit is {max_bytes}")
+
+    buffer = bytearray()
+    spill: Optional[BinaryIO] = None
+    total = 0
+
+    async for chunk in chunks:
+        total += len(chunk)
+        if total > max_bytes:
+            if spill is not None:
+                spill.close()
+            raise UploadTooLargeError(f"Body exceeds the {max_bytes} byte limit")
+
+        if spill is None and total <= max_memory:
+            buffer += chunk
+            continue
+        if spill is None:
+            spill = tempfile.TemporaryFile()
+            spill.write(buffer)
+            buffer = bytearray()
+        spill.write(chunk)
+
+    if spill is not None:
+        spill.seek(0)
+        return spill
+    return memoryview(buffer)
+
+
+async def upload_chunks(upload, chunk_size: int = UPLOAD_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """Stream a multipart UploadFile in chunks, for spool_body"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,114 @@
+"""
+Shareable Model Weight Storage
+Memory-mapped weight files so several workers share one copy of read-only pages
+
+PyTorch checkpoints are converted once to plain state-dict files
+(`<checkpoint stem>.weights.pt`) which `torch.load(mmap=True)` maps straight from
+the page cache; `load_state_dict(assign=True)` then uses those pages as the
+parameters instead of copying them. Scikit-learn artifacts are loaded with
+joblib's `mmap_mode='r'`, which maps their large NumPy arrays the same way.
+torch is imported inside the checkpoint helpers only, so processes that just
+load scikit-learn artifacts (crop scoring workers, the crop_lookup CLI) never
+pay for it.
+
+Usage (from the backend directory):
+    python -m services.weight_storage convert
+"""
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+import joblib
+
+from .model_registry import load_manifests
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / "models"
+
+# SHARED_WEIGHTS=0 restores the original copy-on-load behaviour
+SHARED_WEIGHTS = os.getenv('SHARED_WEIGHTS', '1').lower() in ('1', 'true', 'yes')
+
+
+def shared_weights_path(model_path: str) -> Path:
+    """Location of the mmap-able state dict for a checkpoint"""
+    path = Path(model_path)
+    return path.with_name(f"{path.stem}.weights.pt")
+
+
+def has_shared_weights(model_path: str) -> bool:
+    """True when a converted weight file exists and is not older than its checkpoint"""
+    weights = shared_weights_path(model_path)
+    if not SHARED_WEIGHTS or not weights.exists():
+        return False
+    return not os.path.exists(model_path) or weights.stat().st_mtime >= os.path.getmtime(model_path)
+
+
+def load_state_dict(model_path: str, device: "torch.device") -> Tuple[Dict, bool]:
+    """
+    Load a state dict, memory-mapped when a converted file exists and the target is CPU
+
+    Returns:
+        (state_dict, mmapped) - pass `assign=mmapped` to `load_state_dict` so the
+        module keeps the mapped storages instead of copying them
+    """
+    import torch
+
+    if has_shared_weights(model_path):
+        # Mapping only helps on CPU; GPU targets copy to the device either way
+        mmapped = device.type == "cpu"
+        state_dict = torch.load(
+            str(shared_weights_path(model_path)), map_location=device, mmap=mmapped, weights_only=True
+        )
+        return state_dict, mmapped
+    return torch.load(model_path, map_location=device), False
+
+
+def load_joblib(path, mmap: bool = SHARED_WEIGHTS):
+    """joblib.load with read-only memory mapping of NumPy arrays, falling back to a normal load"""
+    if mmap:
+        try:
+            return joblib.load(path, mmap_mode='r')
+        except Exception as e:
+            logger.warning(f"Memory-mapped load of {Path(path).name} failed ({e}), loading normally")
+    return joblib.load(path)
+
+
+def convert_checkpoint(model_path: Path, full_module: bool) -> Path:
+    """Write the mmap-able state dict next to a checkpoint"""
+    import torch
+
+    if full_module:
+        checkpoint = torch.load(str(model_path), map_location="cpu", weights_only=False)
+        state_dict = checkpoint.state_dict()
+    else:
+        state_dict = torch.load(str(model_path), map_location="cpu")
+    # Contiguous tensors map cleanly and keep assign=True loads copy-free
+    state_dict = {key: value.contiguous() for key, value in state_dict.items()}
+    output_path = shared_weights_path(str(model_path))
+    torch.save(state_dict, str(output_path))
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert model checkpoints to shareable weight files")
+    parser.add_argument("command", choices=["convert"])
+    parser.add_argument("--models-dir", default=str(MODELS_DIR))
+    args = parser.parse_args()
+
+    # Every checkpoint named by a model manifest
+    for manifest in load_manifests(Path(args.models_dir) / "manifests").values():
+        model_path = manifest.path
+        if not model_path.exists():
+            print(f"⚠️ Skipping {model_path.name}: not found")
+            continue
+        output_path = convert_checkpoint(model_path, manifest.checkpoint_format == "full_module")
+        print(f"✅ {model_path.name} -> {output_path.name} ({output_path.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
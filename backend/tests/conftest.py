@@ -0,0 +1,48 @@
+"""
+Shared fixtures: a small crop forest trained on the soil dataset, so the crop
+scoring tests compare against sklearn without needing models/crop_model.pkl
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.compiled_forest import DATA_PATH  # noqa: E402
+from services.crop_scoring import SOIL_FEATURES  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def soil_dataset():
+    """Feature matrix (SOIL_FEATURES order) and crop labels"""
+    pd = pytest.importorskip("pandas")
+    if not DATA_PATH.exists():
+        pytest.skip(f"{DATA_PATH} is not available")
+    frame = pd.read_csv(DATA_PATH)
+    return frame[list(SOIL_FEATURES)].to_numpy(dtype=np.float64), frame['label'].to_numpy()
+
+
+@pytest.fixture(scope="session")
+def crop_forest(soil_dataset):
+    """RandomForestClassifier like models/Context/train_crop_model.py trains, with fewer trees"""
+    from sklearn.ensemble import RandomForestClassifier
+
+    X, y = soil_dataset
+    return RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+
+
+@pytest.fixture(scope="session")
+def soil_samples(soil_dataset):
+    """Readings the forest has not seen: dataset rows with noise, plus out-of-range ones"""
+    X, _ = soil_dataset
+    rng = np.random.default_rng(0)
+    noisy = X[rng.choice(len(X), 300)] * rng.uniform(0.8, 1.2, (300, X.shape[1]))
+    uniform = rng.uniform(X.min(axis=0) - 10, X.max(axis=0) + 10, (200, X.shape[1]))
+    return np.vstack([noisy, uniform])
@@ -0,0 +1,111 @@
+"""
+Batch detection: zip limits checked before inflating, and per-image NDJSON
+records streamed in batches
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+import io
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.batch_detection import BatchLimitError, extract_zip_images, stream_batch_detection  # noqa: E402
+from services.inference_executor import InferenceSaturatedError  # noqa: E402
+
+
+def make_zip(members) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_only_image_members_are_extracted():
+    data = make_zip([
+        ("leaf1.jpg", b"a"), ("nested/leaf2.PNG", b"bb"), ("notes.txt", b"x"),
+        ("__MACOSX/._leaf1.jpg", b"y"), ("nested/.hidden.jpg", b"z")
+    ])
+    assert extract_zip_images(data, max_images=10, max_image_bytes=10) == [
+        ("leaf1.jpg", b"a"), ("nested/leaf2.PNG", b"bb")
+    ]
+
+
+def test_archive_can_be_read_from_a_file():
+    data = make_zip([("leaf.jpg", b"pixels")])
+    assert extract_zip_images(io.BytesIO(data), 10, 100) == [("leaf.jpg", b"pixels")]
+    assert extract_zip_images(memoryview(data), 10, 100) == [("leaf.jpg", b"pixels")]
+
+
+@pytest.mark.parametrize("limits, message", [
+    ({'max_images': 2, 'max_image_bytes': 10_000}, "3 images"),
+    ({'max_images': 10, 'max_image_bytes': 500}, "exceeds the 500 byte limit"),
+    ({'max_images': 10, 'max_image_bytes': 10_000, 'max_total_bytes': 2000}, "total 3000 bytes"),
+])
+def test_limits_come_from_the_zip_directory(limits, message):
+    # Highly compressible members: the limits apply to their inflated size
+    data = make_zip([(f"leaf{i}.jpg", b"\0" * 1000) for i in range(3)])
+    assert len(data) < 1000
+    with pytest.raises(BatchLimitError, match=message):
+        extract_zip_images(data, **limits)
+
+
+def collect(entries, decode_fn, predict_batch, batch_size):
+    async def run():
+        with ThreadPoolExecutor(2) as pool:
+            return [record async for record in stream_batch_detection(
+                entries, decode_fn, predict_batch, pool, batch_size=batch_size
+            )]
+    return asyncio.run(run())
+
+
+def decode(data: bytes) -> str:
+    if data == b"corrupt":
+        raise ValueError("cannot identify image file")
+    return data.decode()
+
+
+def test_every_entry_gets_one_record_in_batches():
+    batches = []
+
+    async def predict_batch(images):
+        batches.append(images)
+        return [{'success': True, 'prediction': image.upper()} for image in images]
+
+    entries = [(f"leaf{i}.jpg", f"img{i}".encode()) for i in range(5)] + [("bad.jpg", b"corrupt")]
+    records = collect(entries, decode, predict_batch, batch_size=2)
+
+    by_index = {record['index']: record for record in records}
+    assert sorted(by_index) == list(range(6))
+    assert by_index[3] == {'index': 3, 'filename': 'leaf3.jpg', 'success': True, 'prediction': 'IMG3'}
+    assert by_index[5]['success'] is False and "cannot identify" in by_index[5]['error']
+    assert all(len(batch) <= 2 for batch in batches)
+    assert sum(len(batch) for batch in batches) == 5
+
+
+def test_saturation_is_waited_out_and_failures_stay_per_batch():
+    calls = []
+
+    async def predict_batch(images):
+        calls.append(len(images))
+        if len(calls) == 1:
+            raise InferenceSaturatedError("busy")
+        if "boom" in images:
+            raise RuntimeError("model crashed")
+        return [{'success': True} for _ in images]
+
+    entries = [("a.jpg", b"a"), ("b.jpg", b"boom")]
+    records = collect(entries, decode, predict_batch, batch_size=1)
+
+    by_name = {record['filename']: record for record in records}
+    assert by_name['a.jpg']['success'] is True
+    assert by_name['b.jpg'] == {'index': 1, 'filename': 'b.jpg', 'success': False, 'error': "model crashed"}
@@ -0,0 +1,118 @@
+"""
+Compiled forest: bit-identical probabilities to sklearn from a flat-array file
+that is memory-mapped on load, and only used while it is newer than its pickle
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier  # noqa: E402
+
+from services import compiled_forest  # noqa: E402
+from services.compiled_forest import (  # noqa: E402
+    CompiledForest, compiled_forest_path, has_compiled_forest, load_compiled_forest, verify
+)
+from services.crop_scoring import CropScorer  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def compiled(crop_forest):
+    return CompiledForest.from_sklearn(crop_forest)
+
+
+def test_probabilities_are_bit_identical(compiled, crop_forest, soil_dataset, soil_samples):
+    X = np.vstack([soil_dataset[0], soil_samples])
+    assert verify(compiled, crop_forest, X) == 0
+    assert np.array_equal(compiled.predict(soil_samples), crop_forest.predict(soil_samples))
+    assert compiled.classes_.tolist() == crop_forest.classes_.tolist()
+
+
+@pytest.mark.parametrize("rows", [1, 5, 32, 33, 500])
+def test_small_and_large_batches_sum_the_same_way(compiled, crop_forest, soil_samples, rows):
+    assert np.array_equal(compiled.predict_proba(soil_samples[:rows]), crop_forest.predict_proba(soil_samples[:rows]))
+
+
+def test_chunked_scoring_matches(compiled, crop_forest, soil_samples, monkeypatch):
+    monkeypatch.setattr(compiled_forest, 'CHUNK_ROWS', 64)
+    assert np.array_equal(compiled.predict_proba(soil_samples), crop_forest.predict_proba(soil_samples))
+
+
+def test_extra_trees_compile_too(soil_dataset, soil_samples):
+    X, y = soil_dataset
+    forest = ExtraTreesClassifier(n_estimators=10, random_state=0).fit(X, y)
+    assert verify(CompiledForest.from_sklearn(forest), forest, soil_samples) == 0
+
+
+def test_multi_output_forests_are_refused(soil_dataset):
+    X, y = soil_dataset
+    forest = RandomForestClassifier(n_estimators=2, random_state=0).fit(X, np.stack([y, y], axis=1))
+    with pytest.raises(ValueError, match="single-output"):
+        CompiledForest.from_sklearn(forest)
+
+
+def test_saved_forest_is_mapped_read_only(compiled, crop_forest, soil_samples, tmp_path):
+    path = compiled.save(tmp_path / "crop_model.forest")
+    loaded = CompiledForest.load(path)
+
+    base = loaded.leaf_values
+    while base.base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert isinstance(base, np.memmap)
+    assert not loaded.leaf_values.flags.writeable
+    assert (loaded.n_trees, loaded.max_depth, loaded.n_features_in_) == (compiled.n_trees, compiled.max_depth, 7)
+    assert np.array_equal(loaded.predict_proba(soil_samples), crop_forest.predict_proba(soil_samples))
+
+
+@pytest.mark.parametrize("features", [np.zeros((2, 6)), np.zeros(7)])
+def test_wrong_shapes_are_rejected(compiled, features):
+    with pytest.raises(ValueError, match="expected"):
+        compiled.predict_proba(features)
+
+
+def test_non_finite_readings_are_rejected(compiled, soil_samples):
+    features = soil_samples[:3].copy()
+    features[1, 0] = np.inf
+    with pytest.raises(ValueError, match="NaN or infinity"):
+        compiled.predict_proba(features)
+
+
+def test_crop_scorer_uses_the_compiled_probabilities(compiled, crop_forest, soil_samples):
+    scorer = CropScorer(compiled)
+    assert not scorer.direct_trees
+    assert scorer.score(soil_samples) == CropScorer(crop_forest).score(soil_samples)
+
+
+def test_only_a_current_forest_is_loaded(compiled, tmp_path, monkeypatch):
+    model_path = tmp_path / "crop_model.pkl"
+    model_path.write_bytes(b"pickle")
+    assert load_compiled_forest(model_path) is None
+
+    forest_path = compiled.save(compiled_forest_path(model_path))
+    assert forest_path == tmp_path / "crop_model.forest"
+    assert isinstance(load_compiled_forest(model_path), CompiledForest)
+
+    # A retrained pickle makes the compiled copy stale
+    os.utime(forest_path, (1000, 1000))
+    assert not has_compiled_forest(model_path)
+    assert load_compiled_forest(model_path) is None
+
+    os.utime(forest_path)
+    monkeypatch.setattr(compiled_forest, 'COMPILED_FOREST', False)
+    assert load_compiled_forest(model_path) is None
+
+
+def test_unreadable_forest_falls_back_to_the_pickle(tmp_path):
+    model_path = tmp_path / "crop_model.pkl"
+    model_path.write_bytes(b"pickle")
+    compiled_forest_path(model_path).write_bytes(b"not a forest")
+    assert load_compiled_forest(model_path) is None
@@ -0,0 +1,59 @@
+"""
+Crop endpoints against a small trained forest: /batch-predict returns what
+/predict does for each sample, and both keep their request limits
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+for dependency in ("torch", "torchvision", "fastapi", "httpx", "google.generativeai", "twilio", "dotenv"):
+    pytest.importorskip(dependency)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from services.crop_scoring import SOIL_FEATURES, CropScorer  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch, crop_forest):
+    scorer = CropScorer(crop_forest)
+    monkeypatch.setattr(main, 'model', crop_forest)
+    monkeypatch.setattr(main, 'crop_scorer', scorer)
+    monkeypatch.setattr(main, 'crop_recommender', scorer)
+    return TestClient(main.app)
+
+
+def readings(samples):
+    return [dict(zip(SOIL_FEATURES, row.tolist())) for row in samples]
+
+
+def test_batch_predict_matches_predict(client, crop_forest, soil_samples):
+    samples = readings(soil_samples[:25])
+
+    response = client.post('/batch-predict', json=samples)
+
+    assert response.status_code == 200
+    predictions = response.json()['predictions']
+    assert [prediction['crop'] for prediction in predictions] == crop_forest.predict(soil_samples[:25]).tolist()
+    assert predictions == [client.post('/predict', json=sample).json() for sample in samples]
+
+
+def test_batch_predict_limits(client, soil_samples, monkeypatch):
+    assert client.post('/batch-predict', json=[]).json() == {'predictions': []}
+
+    monkeypatch.setattr(main, 'MAX_BATCH_SAMPLES', 3)
+    assert client.post('/batch-predict', json=readings(soil_samples[:4])).status_code == 413
+
+
+def test_missing_crop_model_is_reported(client, soil_samples, monkeypatch):
+    monkeypatch.setattr(main, 'model', None)
+    assert client.post('/predict', json=readings(soil_samples[:1])[0]).status_code == 500
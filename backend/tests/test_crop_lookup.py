@@ -0,0 +1,163 @@
+"""
+Crop lookup: readings rounded to soil card precision, answered from the LRU,
+then the suitability grid, then the forest, with exactly the forest's answer
+for every cached reading
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.crop_lookup import (  # noqa: E402
+    DEFAULT_STEPS, CropLookup, SuitabilityGrid, grid_paths, parse_steps
+)
+from services.crop_scoring import SOIL_FEATURES, CropScorer  # noqa: E402
+from services.result_cache import DetectionResultCache  # noqa: E402
+
+STEPS = np.array([DEFAULT_STEPS[name] for name in SOIL_FEATURES])
+
+
+@pytest.fixture(scope="module")
+def scorer(crop_forest):
+    return CropScorer(crop_forest)
+
+
+@pytest.fixture(scope="module")
+def grid(scorer, soil_dataset):
+    return SuitabilityGrid.build(scorer.predict_proba, scorer.classes, soil_dataset[0], points=3)
+
+
+def make_lookup(scorer, grid=None, version="v1", cache=None):
+    return CropLookup(scorer, cache or DetectionResultCache(max_entries=1000), version, grid=grid)
+
+
+def test_parse_steps():
+    assert parse_steps("") == DEFAULT_STEPS
+    assert parse_steps("ph=0.01, rainfall=5") == {**DEFAULT_STEPS, 'ph': 0.01, 'rainfall': 5.0}
+
+
+@pytest.mark.parametrize("spec", ["salinity=1", "ph=0", "ph=-0.1"])
+def test_invalid_steps_are_rejected(spec):
+    with pytest.raises(ValueError, match="Invalid quantization step"):
+        parse_steps(spec)
+
+
+def test_answers_are_the_forest_on_rounded_readings(scorer, soil_samples):
+    lookup = make_lookup(scorer)
+    expected = scorer.score(np.rint(soil_samples / STEPS) * STEPS)
+
+    assert lookup.score(soil_samples) == expected
+    assert lookup.score(soil_samples) == expected  # Now from the cache
+    stats = lookup.stats()
+    assert stats['rows'] == 2 * len(soil_samples)
+    assert stats['forest_rows'] == len(soil_samples)
+    assert stats['answered_without_forest'] == 0.5
+
+
+def test_single_readings_share_keys_with_batches(scorer, soil_samples):
+    lookup = make_lookup(scorer)
+    batch = lookup.score(soil_samples[:20])
+    forest_rows = lookup.stats()['forest_rows']
+
+    assert [lookup.score_one(row.tolist()) for row in soil_samples[:20]] == batch
+    assert lookup.stats()['forest_rows'] == forest_rows
+    # Halves round to even on both paths
+    assert lookup.score_one([90.5, 42, 43, 20.85, 82, 6.5, 202.5]) == lookup.score(
+        np.array([[90.5, 42, 43, 20.85, 82, 6.5, 202.5]]))[0]
+
+
+def test_repeated_readings_in_a_batch_are_scored_once(scorer, soil_samples):
+    lookup = make_lookup(scorer)
+    features = np.vstack([soil_samples[:5]] * 4 + [soil_samples[:5] + 0.01])
+
+    results = lookup.score(features)
+
+    assert lookup.stats()['forest_rows'] == 5
+    assert results[:5] == results[5:10] == results[20:]
+
+
+def test_model_versions_do_not_share_answers(scorer, soil_samples):
+    cache = DetectionResultCache(max_entries=1000)
+    make_lookup(scorer, version="v1", cache=cache).score(soil_samples[:10])
+
+    retrained = make_lookup(scorer, version="v2", cache=cache)
+    retrained.score(soil_samples[:10])
+    assert retrained.stats()['forest_rows'] == 10
+
+
+def test_invalid_readings_go_to_the_scorer(crop_forest, scorer):
+    lookup = make_lookup(scorer)
+    with pytest.raises(ValueError):
+        lookup.score(np.zeros((2, 6)))
+    features = np.array([[90, 42, 43, np.nan, 82, 6.5, 202]])
+    try:
+        expected = crop_forest.predict_proba(features)
+    except ValueError:
+        with pytest.raises(ValueError):
+            lookup.score_one(features[0].tolist())
+    else:
+        assert lookup.score_one(features[0].tolist()) == scorer.results(expected)[0]
+    assert lookup.stats()['rows'] == 0
+
+
+def test_grid_reproduces_the_forest_at_its_points(scorer, grid):
+    index = np.unravel_index(np.arange(0, int(np.prod(grid.shape)), 97), grid.shape)
+    points = np.stack([axis[i] for axis, i in zip(grid.axes, index)], axis=1)
+
+    probabilities, _ = grid.lookup(points)
+
+    expected = scorer.predict_proba(points).astype(np.float16).astype(np.float64)
+    assert np.allclose(probabilities, expected, atol=1e-12)
+
+
+def test_grid_only_answers_inside_its_range_and_gate(grid, soil_samples):
+    probabilities, answered = grid.lookup(soil_samples)
+    inside = ((soil_samples >= grid.low) & (soil_samples <= grid.high)).all(axis=1)
+
+    assert not answered[~inside].any()
+    assert not probabilities[~inside].any()
+
+    strict = SuitabilityGrid(grid.axes, grid.probabilities, grid.classes, max_spread=0.0)
+    assert not (strict.lookup(soil_samples)[1] & ~answered).any()
+
+
+def test_lookup_answers_from_the_grid_first(scorer, soil_dataset, soil_samples):
+    # A grid over a forest that agrees everywhere passes the gate at every point
+    X = soil_dataset[0]
+    constant = scorer.predict_proba(X[:1])
+    flat = SuitabilityGrid.build(lambda rows: np.repeat(constant, len(rows), axis=0), scorer.classes, X, points=2)
+    lookup = make_lookup(scorer, grid=flat)
+    rounded = np.rint(soil_samples / STEPS) * STEPS
+    inside = ((rounded >= flat.low) & (rounded <= flat.high)).all(axis=1)
+
+    results = lookup.score(soil_samples)
+
+    grid_result = scorer.results(constant.astype(np.float16).astype(np.float64))[0]
+    for result in (result for result, hit in zip(results, inside) if hit):
+        assert result['crop'] == grid_result['crop']
+        assert result['all_predictions'] == pytest.approx(grid_result['all_predictions'])
+    stats = lookup.stats()
+    assert stats['grid']['answers'] == inside.sum() > 0
+    assert stats['forest_rows'] == (~inside).sum() > 0
+
+
+def test_grid_is_saved_for_one_model_version(grid, tmp_path):
+    model_path = tmp_path / "crop_model.pkl"
+    grid.save(model_path, "v1")
+
+    loaded = SuitabilityGrid.load(model_path, "v1", max_spread=0.1)
+    assert loaded.shape == grid.shape and loaded.max_spread == 0.1
+    assert np.array_equal(loaded.probabilities, grid.probabilities)
+    assert SuitabilityGrid.load(model_path, "v2") is None
+
+    grid_paths(model_path)[1].write_text("{not json")
+    assert SuitabilityGrid.load(model_path, "v1") is None
+    assert SuitabilityGrid.load(tmp_path / "other.pkl", "v1") is None
@@ -0,0 +1,107 @@
+"""
+Crop scoring: one probability pass that matches sklearn exactly, with the
+label, confidence and top-k derived from it
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sklearn.ensemble import ExtraTreesClassifier  # noqa: E402
+from sklearn.tree import DecisionTreeClassifier  # noqa: E402
+
+from services.crop_scoring import FALLBACK_CONFIDENCE, CropScorer  # noqa: E402
+
+
+def test_probabilities_are_identical_to_sklearn(crop_forest, soil_samples):
+    scorer = CropScorer(crop_forest)
+    assert scorer.direct_trees
+    assert np.array_equal(scorer.predict_proba(soil_samples), crop_forest.predict_proba(soil_samples))
+    # Single rows and a shrinking batch reuse the grown input buffer
+    assert np.array_equal(scorer.predict_proba(soil_samples[:1]), crop_forest.predict_proba(soil_samples[:1]))
+
+
+def test_extra_trees_take_the_same_path(soil_dataset, soil_samples):
+    X, y = soil_dataset
+    forest = ExtraTreesClassifier(n_estimators=10, random_state=0).fit(X, y)
+    scorer = CropScorer(forest)
+    assert scorer.direct_trees
+    assert np.array_equal(scorer.predict_proba(soil_samples), forest.predict_proba(soil_samples))
+
+
+def test_other_models_are_scored_through_sklearn(soil_dataset, soil_samples):
+    X, y = soil_dataset
+    tree = DecisionTreeClassifier(random_state=0).fit(X, y)
+    scorer = CropScorer(tree)
+    assert not scorer.direct_trees
+    assert np.array_equal(scorer.predict_proba(soil_samples), tree.predict_proba(soil_samples))
+
+
+def test_best_crop_is_what_predict_returns(crop_forest, soil_samples):
+    results = CropScorer(crop_forest).score(soil_samples)
+    probabilities = crop_forest.predict_proba(soil_samples)
+
+    assert [result['crop'] for result in results] == crop_forest.predict(soil_samples).tolist()
+    assert [result['confidence'] for result in results] == probabilities.max(axis=1).tolist()
+
+
+def test_top_k_is_sorted_and_contains_the_best(crop_forest, soil_samples):
+    results = CropScorer(crop_forest, top_k=3).score(soil_samples)
+    probabilities = crop_forest.predict_proba(soil_samples)
+
+    for result, row in zip(results, probabilities):
+        top = list(result['all_predictions'].values())
+        assert len(top) == 3
+        assert top == sorted(top, reverse=True)
+        assert top == sorted(row, reverse=True)[:3]
+        assert next(iter(result['all_predictions'])) == result['crop']
+
+
+def test_score_one_matches_the_batch(crop_forest, soil_samples):
+    scorer = CropScorer(crop_forest)
+    batch = scorer.score(soil_samples[:20])
+    assert [scorer.score_one(row.tolist()) for row in soil_samples[:20]] == batch
+
+
+def test_non_finite_readings_are_left_to_sklearn(crop_forest, soil_samples):
+    scorer = CropScorer(crop_forest)
+    features = soil_samples[:5].copy()
+    features[2, 3] = np.nan
+    try:
+        expected = crop_forest.predict_proba(features)
+    except ValueError:
+        with pytest.raises(ValueError):
+            scorer.predict_proba(features)
+    else:
+        assert np.array_equal(scorer.predict_proba(features), expected)
+
+
+def test_models_without_probabilities_get_the_fallback_confidence(crop_forest, soil_samples):
+    class LabelOnly:
+        def predict(self, features):
+            return crop_forest.predict(features)
+
+    results = CropScorer(LabelOnly()).score(soil_samples[:3])
+    assert [result['crop'] for result in results] == crop_forest.predict(soil_samples[:3]).tolist()
+    assert all(result['confidence'] == FALLBACK_CONFIDENCE and result['all_predictions'] == {}
+               for result in results)
+
+
+def test_threads_do_not_share_input_buffers(crop_forest, soil_samples):
+    scorer = CropScorer(crop_forest)
+    chunks = [soil_samples[start:start + size] for start, size in zip(range(0, 400, 40), [1, 7, 40, 3, 25] * 2)]
+    expected = [crop_forest.predict_proba(chunk) for chunk in chunks]
+
+    with ThreadPoolExecutor(4) as pool:
+        for _ in range(5):
+            results = list(pool.map(scorer.predict_proba, chunks))
+            assert all(np.array_equal(result, want) for result, want in zip(results, expected))
@@ -0,0 +1,119 @@
+"""
+Crop suitability rasters: every valid cell gets the forest's best crop and
+confidence, in process or on the worker pool, and nodata cells stay nodata
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.crop_scoring import SOIL_FEATURES  # noqa: E402
+from services.crop_suitability import (  # noqa: E402
+    NODATA_CONFIDENCE, NODATA_CROP, SuitabilityLimitError, generate_suitability, layer_sources
+)
+
+ROWS, COLS = 20, 25
+
+
+@pytest.fixture(scope="module")
+def model_path(crop_forest, tmp_path_factory):
+    path = tmp_path_factory.mktemp("models") / "crop_model.pkl"
+    joblib.dump(crop_forest, path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def stack(soil_samples):
+    """(7, rows, cols) layers with a few nodata cells"""
+    layers = soil_samples[:ROWS * COLS].T.reshape(len(SOIL_FEATURES), ROWS, COLS).copy()
+    layers[3, 0, :5] = np.nan
+    layers[6, 7, 11] = np.inf
+    return layers
+
+
+@pytest.fixture
+def stack_path(stack, tmp_path):
+    path = tmp_path / "stack.npy"
+    np.save(path, stack)
+    return path
+
+
+def expected_rasters(crop_forest, stack):
+    features = stack.reshape(len(SOIL_FEATURES), -1).T
+    valid = np.isfinite(features).all(axis=1)
+    probabilities = crop_forest.predict_proba(features[valid])
+    crops = np.full(len(features), NODATA_CROP, dtype=np.uint8)
+    confidence = np.full(len(features), NODATA_CONFIDENCE, dtype=np.float32)
+    crops[valid] = probabilities.argmax(axis=1)
+    confidence[valid] = probabilities.max(axis=1)
+    return crops.reshape(ROWS, COLS), confidence.reshape(ROWS, COLS)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cells_get_the_forest_answer(crop_forest, model_path, stack, stack_path, tmp_path, workers):
+    output = tmp_path / "suitability"
+    # A window of three rows: several windows, the last one short
+    summary = generate_suitability(layer_sources(str(stack_path)), output, model_path,
+                                   workers=workers, block_cells=3 * COLS)
+
+    crops, confidence = expected_rasters(crop_forest, stack)
+    assert np.array_equal(np.load(output / "best_crop.npy"), crops)
+    assert np.array_equal(np.load(output / "confidence.npy"), confidence)
+    assert summary['windows'] == 7
+    assert summary['nodata_cells'] == 6
+    assert summary['scored_cells'] == ROWS * COLS - 6
+    legend = summary['legend']
+    assert summary['crop_cells'] == {
+        legend[str(i)]: int(count) for i, count in enumerate(np.bincount(crops[crops != NODATA_CROP])) if count
+    }
+    assert json.loads((output / "suitability.json").read_text())['outputs'] == ["best_crop.npy", "confidence.npy"]
+
+
+def test_separate_layers_match_the_stack(crop_forest, model_path, stack, tmp_path):
+    layers = {}
+    for name, layer in zip(SOIL_FEATURES, stack):
+        layers[name] = tmp_path / f"{name}.npy"
+        np.save(layers[name], layer)
+
+    generate_suitability(layer_sources(layers=layers), tmp_path / "out", model_path, workers=1)
+
+    assert np.array_equal(np.load(tmp_path / "out" / "best_crop.npy"), expected_rasters(crop_forest, stack)[0])
+
+
+def test_oversized_rasters_are_refused_before_scoring(model_path, stack_path, tmp_path):
+    output = tmp_path / "suitability"
+    with pytest.raises(SuitabilityLimitError, match="500 cells"):
+        generate_suitability(layer_sources(str(stack_path)), output, model_path, workers=1, max_cells=499)
+    assert not output.exists()
+
+
+def test_layers_must_share_a_grid(stack, tmp_path, model_path):
+    layers = {}
+    for name, layer in zip(SOIL_FEATURES, stack):
+        layers[name] = tmp_path / f"{name}.npy"
+        np.save(layers[name], layer if name != 'ph' else layer[:-1])
+
+    with pytest.raises(ValueError, match="different grids"):
+        generate_suitability(layer_sources(layers=layers), tmp_path / "out", model_path, workers=1)
+
+
+def test_missing_layers_are_named():
+    with pytest.raises(ValueError, match="Missing layers: ph, rainfall"):
+        layer_sources(layers={name: f"{name}.npy" for name in SOIL_FEATURES[:5]})
+
+
+def test_stacks_need_seven_bands(stack, tmp_path, model_path):
+    path = tmp_path / "short.npy"
+    np.save(path, stack[:6])
+    with pytest.raises(ValueError, match="has shape"):
+        generate_suitability(layer_sources(str(path)), tmp_path / "out", model_path, workers=1)
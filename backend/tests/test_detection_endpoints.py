@@ -0,0 +1,204 @@
+"""
+Detection endpoints against fake models: they keep serving when a model fails
+to load (the detector answers from the models that did, a missing pest model is
+a failed result rather than a 500, /ready reports what failed), and batch uploads
+stream per-image records within their byte limits
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import io
+import json
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+for dependency in ("torch", "torchvision", "fastapi", "httpx", "google.generativeai", "twilio", "dotenv"):
+    pytest.importorskip(dependency)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import main  # noqa: E402
+from services.model_lifecycle import ModelLifecycleManager  # noqa: E402
+from services.result_cache import DetectionResultCache  # noqa: E402
+
+
+class FakeDiseaseModel:
+    """Stands in for a disease loader: the same prediction for every image"""
+
+    transform_signature = (224, None)
+
+    def __init__(self, model_name: str, prediction: str, confidence: float):
+        self.model_name = model_name
+        self.prediction = prediction
+        self.confidence = confidence
+
+    def predict_tensor(self, img_tensor):
+        return [
+            {'success': True, 'model': self.model_name, 'prediction': self.prediction, 'confidence': self.confidence}
+            for _ in range(img_tensor.shape[0])
+        ]
+
+
+class FakePestModel:
+    def predict_batch(self, images):
+        return [{'success': True, 'prediction': 'aphids', 'confidence': 0.9, 'all_predictions': {}} for _ in images]
+
+
+class Checkpoint:
+    """Model factory that fails like a missing checkpoint until `present` is set"""
+
+    def __init__(self, model, present: bool = True):
+        self.model = model
+        self.present = present
+
+    def __call__(self):
+        if not self.present:
+            raise FileNotFoundError(f"No such file or directory: '{self.model.__class__.__name__}.pth'")
+        return self.model
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Register fake models on a fresh lifecycle manager; returns a test client"""
+    monkeypatch.setattr(main, 'detection_cache', DetectionResultCache(max_entries=0))
+
+    def start(plantdoc=True, maize=True, rice=True, pest=True):
+        lifecycle = ModelLifecycleManager()
+        checkpoints = {
+            'plantdoc': Checkpoint(FakeDiseaseModel('PlantDoc', 'Tomato leaf blight', 0.6), plantdoc),
+            'maize': Checkpoint(FakeDiseaseModel('Maize', 'Common rust', 0.7), maize),
+            'rice': Checkpoint(FakeDiseaseModel('Rice', 'Brown spot', 0.9), rice),
+            'pest': Checkpoint(FakePestModel(), pest),
+        }
+        for name, checkpoint in checkpoints.items():
+            lifecycle.register(name, checkpoint, warmup=False)
+        lifecycle.register('detector', main.build_multi_model_detector, warmup=False,
+                           depends_on=main.DETECTOR_DEPENDENCIES)
+        monkeypatch.setattr(main, 'model_lifecycle', lifecycle)
+        return TestClient(main.app), checkpoints
+
+    return start
+
+
+def leaf_png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (40, 130, 50)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def post_image(client, path):
+    return client.post(path, files={'image': ('leaf.png', leaf_png(), 'image/png')})
+
+
+def test_disease_detection_serves_without_a_missing_model(serve):
+    client, _ = serve(rice=False)
+
+    response = post_image(client, '/detect-disease')
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body['success'] is True
+    assert body['selected_model'] == 'Maize'
+    assert set(body['all_model_results']) == {'PlantDoc', 'Maize'}
+
+
+def test_ready_reports_the_missing_model(serve):
+    client, _ = serve(plantdoc=False)
+    post_image(client, '/detect-disease')
+
+    response = client.get('/ready')
+
+    assert response.status_code == 503
+    models = response.json()['models']
+    assert models['plantdoc']['state'] == 'failed'
+    assert 'No such file' in models['plantdoc']['error']
+    assert models['detector']['state'] == 'ready'
+
+
+def test_missing_pest_model_is_a_failed_result(serve):
+    client, _ = serve(pest=False)
+
+    pest = post_image(client, '/detect-pest')
+    assert pest.status_code == 200
+    assert pest.json()['success'] is False
+    assert 'No such file' in pest.json()['error']
+
+    combined = post_image(client, '/detect-combined')
+    assert combined.status_code == 200
+    assert combined.json()['disease']['success'] is True
+    assert combined.json()['pest']['success'] is False
+
+
+def test_detector_picks_up_a_model_once_it_loads(serve):
+    client, checkpoints = serve(rice=False)
+    assert 'Rice' not in post_image(client, '/detect-disease').json()['all_model_results']
+
+    checkpoints['rice'].present = True
+
+    body = post_image(client, '/detect-disease').json()
+    assert body['selected_model'] == 'Rice'
+    assert set(body['all_model_results']) == {'PlantDoc', 'Maize', 'Rice'}
+
+
+def test_batch_streams_one_record_per_image(serve):
+    client, _ = serve()
+    files = [('images', (f'leaf{i}.png', leaf_png(), 'image/png')) for i in range(3)]
+    files.append(('images', ('broken.png', b'not an image', 'image/png')))
+
+    response = client.post('/detect-disease/batch', files=files)
+
+    assert response.status_code == 200
+    records = {record['filename']: record for record in map(json.loads, response.text.splitlines())}
+    assert set(records) == {'leaf0.png', 'leaf1.png', 'leaf2.png', 'broken.png'}
+    assert all(records[f'leaf{i}.png']['selected_model'] == 'Rice' for i in range(3))
+    assert records['broken.png']['success'] is False
+
+
+def test_batch_bytes_are_capped_across_parts(serve, monkeypatch):
+    client, _ = serve()
+    image = leaf_png()
+    monkeypatch.setattr(main, 'MAX_BATCH_BYTES', len(image) * 2 + 1)
+
+    files = [('images', (f'leaf{i}.png', image, 'image/png')) for i in range(3)]
+    response = client.post('/detect-disease/batch', files=files)
+
+    assert response.status_code == 413
+
+
+def test_batch_archive_is_capped_while_reading(serve, monkeypatch):
+    client, _ = serve()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for i in range(4):
+            archive.writestr(f'leaf{i}.png', leaf_png())
+    monkeypatch.setattr(main, 'MAX_BATCH_BYTES', len(buffer.getvalue()) - 1)
+
+    response = client.post('/detect-disease/batch',
+                           files={'archive': ('leaves.zip', buffer.getvalue(), 'application/zip')})
+
+    assert response.status_code == 413
+
+
+def test_disease_cache_version_follows_hot_swaps(monkeypatch, tmp_path):
+    manifests = tmp_path / "manifests"
+    manifests.mkdir()
+    rice = json.loads((main.MODEL_MANIFEST_DIR / "rice.json").read_text())
+    (manifests / "rice.json").write_text(json.dumps(rice))
+    registry = main.ModelRegistry(ModelLifecycleManager(), lambda manifest: manifest, manifest_dir=manifests)
+    registry.register_all()
+    monkeypatch.setattr(main, 'model_registry', registry)
+
+    before = main.disease_model_version()
+    assert main.disease_model_version() == before
+
+    (manifests / "rice.json").write_text(json.dumps({**rice, 'version': 'retrained'}))
+    assert registry.check_for_updates() == ['rice']
+    assert main.disease_model_version() != before
@@ -0,0 +1,140 @@
+"""
+Micro-batcher: concurrent submissions share forward passes and every caller gets
+its own result back
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.inference_batcher import InferenceBatcher  # noqa: E402
+from services.inference_executor import InferenceExecutor, InferenceSaturatedError  # noqa: E402
+
+
+class RecordingModel:
+    """Batch function that doubles its inputs and remembers each batch it saw"""
+
+    def __init__(self, gate: threading.Event = None):
+        self.batches = []
+        self.gate = gate
+        self.started = threading.Event()
+
+    def __call__(self, items):
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+
+def test_concurrent_items_are_batched_and_fanned_back():
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, max_batch_size=4, max_wait_ms=200, name="test")
+
+    async def run():
+        return await asyncio.gather(*(batcher.predict(i) for i in range(10)))
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        batcher.stop()
+
+    assert results == [i * 2 for i in range(10)]
+    assert all(len(batch) <= 4 for batch in model.batches)
+    assert len(model.batches) < 10
+    stats = batcher.stats()
+    assert stats['items'] == 10 and stats['batches'] == len(model.batches)
+
+
+def test_single_item_waits_at_most_max_wait():
+    batcher = InferenceBatcher(RecordingModel(), max_batch_size=8, max_wait_ms=5, name="test")
+    try:
+        assert batcher.submit(21).result(timeout=2) == 42
+    finally:
+        batcher.stop()
+
+
+def test_batch_failure_reaches_every_caller():
+    def broken(items):
+        raise ValueError("bad batch")
+
+    batcher = InferenceBatcher(broken, max_batch_size=4, max_wait_ms=50, name="test")
+    try:
+        futures = [batcher.submit(i) for i in range(3)]
+        for future in futures:
+            with pytest.raises(ValueError, match="bad batch"):
+                future.result(timeout=2)
+    finally:
+        batcher.stop()
+
+
+def test_wrong_result_count_is_an_error():
+    batcher = InferenceBatcher(lambda items: items[:-1], max_batch_size=4, max_wait_ms=50, name="test")
+    try:
+        future = batcher.submit(1)
+        with pytest.raises(RuntimeError, match="0 results for 1 inputs"):
+            future.result(timeout=2)
+    finally:
+        batcher.stop()
+
+
+def test_full_queue_rejects_new_items():
+    gate = threading.Event()
+    model = RecordingModel(gate)
+    batcher = InferenceBatcher(model, max_batch_size=1, max_wait_ms=0, name="test", max_queue=2)
+    try:
+        first = batcher.submit(0)
+        # The worker is stuck on item 0; two more fill the queue
+        assert model.started.wait(2)
+        queued = [batcher.submit(1), batcher.submit(2)]
+        with pytest.raises(InferenceSaturatedError):
+            batcher.submit(3)
+        gate.set()
+        assert [f.result(timeout=2) for f in [first] + queued] == [0, 2, 4]
+    finally:
+        gate.set()
+        batcher.stop()
+
+
+def test_stop_drains_queued_items():
+    batcher = InferenceBatcher(RecordingModel(), max_batch_size=2, max_wait_ms=50, name="test")
+    futures = [batcher.submit(i) for i in range(5)]
+    batcher.stop()
+    assert [f.result(timeout=2) for f in futures] == [0, 2, 4, 6, 8]
+
+
+def test_saturated_executor_grows_batches_instead_of_failing():
+    # One worker, no executor queue: 40 concurrent requests must all be served,
+    # in batches that grow while the worker is busy
+    model = RecordingModel()
+
+    def slow(items):
+        time.sleep(0.02)
+        return model(items)
+
+    executor = InferenceExecutor(max_workers=1, max_queue=0, name="test")
+    batcher = InferenceBatcher(slow, max_batch_size=8, max_wait_ms=1, name="test",
+                               executor=executor, max_queue=64)
+
+    async def run():
+        return await asyncio.gather(*(batcher.predict(i) for i in range(40)))
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        batcher.stop()
+        executor.shutdown()
+
+    assert results == [i * 2 for i in range(40)]
+    assert executor.stats()['rejected'] == 0
+    assert batcher.stats()['mean_batch_size'] >= 4
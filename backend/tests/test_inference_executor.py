@@ -0,0 +1,75 @@
+"""
+Inference executor: bounded admission for request handlers, and a waiting
+submit for dispatchers that have already accepted their work
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.inference_executor import InferenceExecutor, InferenceSaturatedError  # noqa: E402
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor(max_workers=1, max_queue=1, name="test")
+    yield executor
+    executor.shutdown(wait=False)
+
+
+def test_submit_rejects_beyond_workers_plus_queue(executor):
+    gate = threading.Event()
+    running = executor.submit(gate.wait, 5)
+    queued = executor.submit(lambda: "queued")
+
+    with pytest.raises(InferenceSaturatedError):
+        executor.submit(lambda: "rejected")
+    assert executor.stats()['rejected'] == 1
+    assert executor.stats()['in_flight'] == 2
+
+    gate.set()
+    assert running.result(timeout=2) is True
+    assert queued.result(timeout=2) == "queued"
+    # Slots come back once the tasks finish
+    assert executor.submit(lambda: "again").result(timeout=2) == "again"
+    assert executor.stats()['completed'] == 3
+
+
+def test_submit_when_free_waits_for_a_slot(executor):
+    gate = threading.Event()
+    executor.submit(gate.wait, 5)
+    executor.submit(gate.wait, 5)
+
+    submitted = []
+    waiter = threading.Thread(target=lambda: submitted.append(executor.submit_when_free(lambda: "late")))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive() and not submitted  # Still waiting, not rejected
+    assert executor.stats()['rejected'] == 0
+
+    gate.set()
+    waiter.join(2)
+    assert submitted[0].result(timeout=2) == "late"
+
+
+def test_failed_task_releases_its_slot(executor):
+    def fail():
+        raise ValueError("boom")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            executor.submit(fail).result(timeout=2)
+    assert executor.stats()['in_flight'] == 0
+
+
+def test_run_awaits_the_result(executor):
+    assert asyncio.run(executor.run(sum, [1, 2, 3])) == 6
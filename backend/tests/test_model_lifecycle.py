@@ -0,0 +1,266 @@
+"""
+Model lifecycle: single-flight loading, failure reporting and retries,
+composites that keep serving when one of their dependencies fails, and the
+memory budget (measurement, LRU eviction, pinning, reloads through the manager)
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.model_lifecycle import (  # noqa: E402
+    EVICTED, FAILED, PENDING, READY, ModelLifecycleManager, resident_bytes
+)
+
+
+class FakeLoader:
+    """Lazy loader with the get_model/warmup/unload surface the manager drives"""
+
+    def __init__(self, name: str, size: int = 1000, load_seconds: float = 0.0):
+        self.name = name
+        self.size = size
+        self.load_seconds = load_seconds
+        self.reload_hook = None
+        self.loads = 0
+        self.warmups = 0
+        self._model = None
+
+    def get_model(self):
+        if self._model is None:
+            reload_hook, self.reload_hook = self.reload_hook, None
+            if reload_hook is not None:
+                reload_hook()
+            if self._model is None:
+                time.sleep(self.load_seconds)
+                self.loads += 1
+                self._model = {'weights': np.zeros(self.size, dtype=np.uint8)}
+        return self._model
+
+    def warmup(self):
+        self.warmups += 1
+
+    def unload(self):
+        self._model = None
+
+
+class Factory:
+    """Counts builds and fails while `failing` is set"""
+
+    def __init__(self, loader: FakeLoader, failing: bool = False):
+        self.loader = loader
+        self.failing = failing
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.failing:
+            raise FileNotFoundError(f"{self.loader.name} checkpoint missing")
+        return self.loader
+
+
+def test_concurrent_first_requests_load_once():
+    loader = FakeLoader("plantdoc", load_seconds=0.05)
+    factory = Factory(loader)
+    lifecycle = ModelLifecycleManager()
+    lifecycle.register('plantdoc', factory)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(lifecycle.get('plantdoc'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [loader] * 8
+    assert factory.calls == 1 and loader.loads == 1 and loader.warmups == 1
+    status = lifecycle.status()['plantdoc']
+    assert status['state'] == READY and status['load_seconds'] is not None
+
+
+def test_failed_load_is_reported_and_retried():
+    factory = Factory(FakeLoader("pest"), failing=True)
+    lifecycle = ModelLifecycleManager()
+    lifecycle.register('pest', factory)
+
+    with pytest.raises(FileNotFoundError):
+        lifecycle.get('pest')
+    assert lifecycle.status()['pest'] == {
+        'state': FAILED, 'load_seconds': None, 'warmup_seconds': None, 'error': "pest checkpoint missing"
+    }
+
+    factory.failing = False
+    assert lifecycle.get('pest') is factory.loader
+    assert lifecycle.status()['pest']['state'] == READY
+    assert lifecycle.status()['pest']['error'] is None
+
+
+def test_preload_records_failures_without_raising():
+    lifecycle = ModelLifecycleManager()
+    lifecycle.register('plantdoc', Factory(FakeLoader("plantdoc")))
+    lifecycle.register('rice', Factory(FakeLoader("rice"), failing=True))
+    lifecycle.register('maize', Factory(FakeLoader("maize")))
+
+    lifecycle.preload(background=False)
+
+    assert lifecycle.is_ready(['plantdoc', 'maize'])
+    assert not lifecycle.is_ready()
+    assert lifecycle.status()['rice']['state'] == FAILED
+
+
+def optional(lifecycle, name):
+    """What main.py's getters do: a model that fails to load is passed on as None"""
+    try:
+        return lifecycle.get(name)
+    except Exception:
+        return None
+
+
+def detector_lifecycle(rice_failing: bool):
+    lifecycle = ModelLifecycleManager()
+    for name in ('plantdoc', 'maize'):
+        lifecycle.register(name, Factory(FakeLoader(name)))
+    rice = Factory(FakeLoader('rice'), failing=rice_failing)
+    lifecycle.register('rice', rice)
+    lifecycle.register(
+        'detector', lambda: {name: optional(lifecycle, name) for name in ('plantdoc', 'maize', 'rice')},
+        warmup=False, depends_on=('plantdoc', 'maize', 'rice')
+    )
+    return lifecycle, rice
+
+
+def test_composite_serves_without_a_failed_dependency():
+    lifecycle, _ = detector_lifecycle(rice_failing=True)
+
+    detector = lifecycle.get('detector')
+
+    assert detector['rice'] is None
+    assert detector['plantdoc'] is not None and detector['maize'] is not None
+    assert lifecycle.status()['detector']['state'] == READY
+    assert lifecycle.status()['rice']['state'] == FAILED
+
+
+def test_composite_is_rebuilt_once_the_dependency_loads():
+    lifecycle, rice = detector_lifecycle(rice_failing=True)
+    assert lifecycle.get('detector')['rice'] is None
+    calls = rice.calls
+
+    # Still failing: retried on the next request, the composite is left as it is
+    assert lifecycle.get('detector')['rice'] is None
+    assert rice.calls > calls
+
+    rice.failing = False
+    assert lifecycle.get('detector')['rice'] is rice.loader
+    assert lifecycle.status()['rice']['state'] == READY
+
+    # Rebuilt once, not on every request after that
+    detector = lifecycle.get('detector')
+    assert lifecycle.get('detector') is detector
+
+
+def test_status_lists_every_registered_model():
+    lifecycle, _ = detector_lifecycle(rice_failing=False)
+    assert {name: status['state'] for name, status in lifecycle.status().items()} == {
+        'plantdoc': PENDING, 'maize': PENDING, 'rice': PENDING, 'detector': PENDING
+    }
+    lifecycle.get('detector')
+    assert lifecycle.is_ready()
+
+
+def test_resident_bytes_counts_shared_arrays_once():
+    weights = np.zeros(1000, dtype=np.float32)
+    model = {'layers': [weights, weights[:10]], 'copy': weights.copy(), 'name': "resnet"}
+    assert resident_bytes(model) == 8000
+
+
+def test_resident_size_is_measured_without_a_budget():
+    lifecycle = ModelLifecycleManager()
+    lifecycle.register('pest', Factory(FakeLoader('pest', size=4_000_000)))
+    lifecycle.get('pest')
+
+    stats = lifecycle.memory_stats()
+    assert stats['budget_mb'] is None
+    assert stats['models']['pest']['resident_mb'] == 4.0
+    assert stats['resident_mb'] == 4.0
+    assert lifecycle.status()['pest']['state'] == READY
+
+
+def budget_lifecycle(budget: int, names=('a', 'b', 'c')):
+    lifecycle = ModelLifecycleManager(memory_budget_bytes=budget)
+    loaders = {name: FakeLoader(name) for name in names}
+    for name, loader in loaders.items():
+        lifecycle.register(name, Factory(loader))
+    return lifecycle, loaders
+
+
+def states(lifecycle):
+    return {name: status['state'] for name, status in lifecycle.status().items()}
+
+
+def test_least_recently_used_model_is_evicted_past_the_budget():
+    lifecycle, loaders = budget_lifecycle(2500)
+    for name in ('a', 'b', 'a', 'c'):  # 'b' is the least recently used when 'c' loads
+        lifecycle.get(name)
+
+    assert states(lifecycle) == {'a': READY, 'b': EVICTED, 'c': READY}
+    assert loaders['b']._model is None
+    assert lifecycle.resident_total() == 2000
+    assert lifecycle.memory_stats()['evictions'] == 1
+
+
+def test_held_loader_reloads_through_the_manager():
+    lifecycle, loaders = budget_lifecycle(2500)
+    for name in ('a', 'b', 'a', 'c'):
+        lifecycle.get(name)
+
+    # A holder (like the detector) uses the evicted loader directly
+    loaders['b'].get_model()
+
+    assert loaders['b'].loads == 2
+    memory = lifecycle.memory_stats()
+    assert memory['models']['b']['reloads'] == 1
+    # The reload counted against the budget, so the next least recently used went
+    assert states(lifecycle) == {'a': EVICTED, 'b': READY, 'c': READY}
+    assert lifecycle.resident_total() == 2000
+
+
+def test_non_evictable_models_are_kept_over_budget():
+    lifecycle = ModelLifecycleManager(memory_budget_bytes=1500)
+    lifecycle.register('crop', Factory(FakeLoader('crop')), evictable=False)
+    lifecycle.register('pest', Factory(FakeLoader('pest')))
+    lifecycle.get('crop')
+    lifecycle.get('pest')
+    lifecycle.get('pest')
+
+    assert states(lifecycle) == {'crop': READY, 'pest': READY}
+    assert lifecycle.resident_total() == 2000
+
+
+def test_composite_dependencies_are_pinned_and_not_reloaded_per_request():
+    lifecycle, loaders = budget_lifecycle(3500, names=('router', 'plantdoc', 'maize', 'pest'))
+    lifecycle.register(
+        'detector', lambda: (lifecycle.get('plantdoc'), lifecycle.get('maize')),
+        warmup=False, depends_on=('plantdoc', 'maize')
+    )
+    lifecycle.get('router')
+    lifecycle.get('detector')
+    lifecycle.get('pest')  # Over budget: the router goes, not the detector's models
+
+    assert states(lifecycle)['router'] == EVICTED
+    assert {states(lifecycle)[name] for name in ('plantdoc', 'maize', 'pest', 'detector')} == {READY}
+
+    for _ in range(20):
+        lifecycle.get('detector')
+        lifecycle.get('pest')
+    assert loaders['plantdoc'].loads == loaders['maize'].loads == 1
+    assert lifecycle.memory_stats()['reloads'] == 0
+    assert 'detector' not in lifecycle.memory_stats()['models']
@@ -0,0 +1,57 @@
+"""
+INT8 artifacts are only served while they match the checkpoint and manifest
+version they were quantized from
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("torch")
+
+import model_loader  # noqa: E402
+
+
+@pytest.fixture
+def checkpoint(tmp_path, monkeypatch):
+    path = tmp_path / "rice_resnet50.pth"
+    path.write_bytes(b"fp32 weights")
+    model_loader.quantized_model_path(str(path)).write_bytes(b"int8 artifact")
+    model_loader.write_quantized_source(str(path), "1.0.0")
+    # Stands in for torch.jit.load so these tests need no real artifact
+    monkeypatch.setattr(model_loader.torch.jit, 'load', lambda *args, **kwargs: model_loader.nn.Identity())
+    return path
+
+
+def test_current_artifact_loads(checkpoint):
+    assert model_loader.load_quantized_model(str(checkpoint), "1.0.0") is not None
+
+
+def test_manifest_version_bump_falls_back_to_fp32(checkpoint):
+    assert model_loader.load_quantized_model(str(checkpoint), "1.1.0") is None
+
+
+def test_retrained_checkpoint_falls_back_to_fp32(checkpoint):
+    checkpoint.write_bytes(b"retrained fp32 weights")
+    stat = checkpoint.stat()
+    os.utime(checkpoint, (stat.st_atime, stat.st_mtime + 10))
+    assert model_loader.load_quantized_model(str(checkpoint), "1.0.0") is None
+
+
+def test_artifact_without_a_source_record_is_not_trusted(checkpoint):
+    model_loader.quantized_source_path(str(checkpoint)).unlink()
+    assert model_loader.load_quantized_model(str(checkpoint), "1.0.0") is None
+
+
+def test_missing_artifact_falls_back_to_fp32(tmp_path):
+    path = tmp_path / "maize_resnet50.pth"
+    path.write_bytes(b"fp32 weights")
+    assert model_loader.load_quantized_model(str(path), "1.0.0") is None
@@ -0,0 +1,174 @@
+"""
+Model registry: manifest validation and hot swaps of new versions, with the
+old version serving until the new one is loaded and kept when it fails
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.model_lifecycle import READY, ModelLifecycleManager  # noqa: E402
+from services.model_registry import (  # noqa: E402
+    IMAGENET_NORMALIZE, MANIFEST_DIR, ManifestError, ModelManifest, ModelRegistry, load_manifests
+)
+
+
+def manifest_data(**overrides):
+    data = {
+        "name": "rice", "display_name": "Rice", "version": "1.0.0", "path": "rice_resnet50.pth",
+        "architecture": "resnet50", "checkpoint_format": "state_dict", "kind": "disease",
+        "transform": {"input_size": 256, "normalize": None}, "classes": ["brown_spot", "healthy"]
+    }
+    data.update(overrides)
+    return data
+
+
+class VersionedLoader:
+    """Loader that remembers the manifest it was built from"""
+
+    def __init__(self, manifest: ModelManifest, fail: bool = False):
+        self.version = manifest.version
+        self.fail = fail
+        self.warmed = False
+
+    def get_model(self):
+        if self.fail:
+            raise RuntimeError(f"checkpoint for {self.version} is corrupt")
+        return self
+
+    def warmup(self):
+        self.warmed = True
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    (tmp_path / "manifests").mkdir()
+    (tmp_path / "rice_resnet50.pth").write_bytes(b"v1 weights")
+    return tmp_path
+
+
+def write_manifest(models_dir: Path, **overrides):
+    data = manifest_data(**overrides)
+    (models_dir / "manifests" / f"{data['name']}.json").write_text(json.dumps(data))
+
+
+def make_registry(models_dir: Path, broken_versions=()):
+    lifecycle = ModelLifecycleManager()
+    registry = ModelRegistry(
+        lifecycle, lambda manifest: VersionedLoader(manifest, fail=manifest.version in broken_versions),
+        manifest_dir=models_dir / "manifests"
+    )
+    registry.register_all()
+    return registry, lifecycle
+
+
+def test_manifest_fields_are_parsed(tmp_path):
+    manifest = ModelManifest(manifest_data(transform={"input_size": 224, "normalize": "imagenet"}),
+                             models_dir=tmp_path)
+    assert manifest.path == tmp_path / "rice_resnet50.pth"
+    assert manifest.normalize == IMAGENET_NORMALIZE
+    assert manifest.input_size == 224
+
+    explicit = ModelManifest(manifest_data(transform={"input_size": 224, "normalize": {"mean": [0.5] * 3,
+                                                                                       "std": [0.25] * 3}}))
+    assert explicit.normalize == ((0.5, 0.5, 0.5), (0.25, 0.25, 0.25))
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"classes": []}, "classes is empty"),
+    ({"kind": "segmenter"}, "kind must be one of"),
+    ({"checkpoint_format": "onnx"}, "checkpoint_format must be one of"),
+])
+def test_invalid_manifests_are_rejected(overrides, message):
+    with pytest.raises(ManifestError, match=message):
+        ModelManifest(manifest_data(**overrides))
+
+
+def test_missing_fields_are_named():
+    data = manifest_data()
+    del data["version"], data["classes"]
+    with pytest.raises(ManifestError, match="missing version, classes"):
+        ModelManifest(data)
+
+
+def test_shipped_manifests_are_valid():
+    manifests = load_manifests(MANIFEST_DIR)
+    assert {'plantdoc', 'maize', 'rice'} <= set(manifests)
+    for manifest in manifests.values():
+        if manifest.teacher is not None:
+            assert manifest.teacher in manifests
+            assert manifests[manifest.teacher].classes == manifest.classes
+
+
+def test_unchanged_manifests_are_not_swapped(models_dir):
+    write_manifest(models_dir)
+    registry, lifecycle = make_registry(models_dir)
+    lifecycle.get('rice')
+
+    assert registry.check_for_updates() == []
+    assert registry.generation == 0
+
+
+def test_new_version_is_swapped_in_warm(models_dir):
+    write_manifest(models_dir)
+    registry, lifecycle = make_registry(models_dir)
+    old = lifecycle.get('rice')
+
+    (models_dir / "rice_resnet50_v2.pth").write_bytes(b"v2 weights")
+    write_manifest(models_dir, version="2.0.0", path="rice_resnet50_v2.pth")
+
+    assert registry.check_for_updates() == ['rice']
+    new = lifecycle.get('rice')
+    assert new is not old and new.version == "2.0.0" and new.warmed
+    assert old.version == "1.0.0"  # Requests holding the old loader finish on it
+    assert registry.versions() == {'rice': "2.0.0"}
+    assert registry.generation == 1
+    assert lifecycle.memory_stats()['models']['rice']['swaps'] == 1
+
+
+def test_replaced_checkpoint_alone_triggers_a_swap(models_dir):
+    write_manifest(models_dir)
+    registry, lifecycle = make_registry(models_dir)
+    lifecycle.get('rice')
+
+    checkpoint = models_dir / "rice_resnet50.pth"
+    checkpoint.write_bytes(b"retrained weights, same path")
+
+    assert registry.check_for_updates() == ['rice']
+
+
+def test_failed_version_keeps_the_old_one_serving(models_dir):
+    write_manifest(models_dir)
+    registry, lifecycle = make_registry(models_dir, broken_versions={"2.0.0"})
+    old = lifecycle.get('rice')
+
+    write_manifest(models_dir, version="2.0.0")
+
+    assert registry.check_for_updates() == []
+    assert lifecycle.get('rice') is old
+    assert lifecycle.status()['rice']['state'] == READY
+    assert registry.versions() == {'rice': "1.0.0"}
+    assert registry.failed_swaps == 1
+    # The same broken version is not retried on every poll
+    assert registry.check_for_updates() == []
+    assert registry.failed_swaps == 1
+
+
+def test_composites_are_rebuilt_around_the_new_version(models_dir):
+    write_manifest(models_dir)
+    registry, lifecycle = make_registry(models_dir)
+    lifecycle.register('detector', lambda: {'rice': lifecycle.get('rice')}, warmup=False, depends_on=('rice',))
+    assert lifecycle.get('detector')['rice'].version == "1.0.0"
+
+    write_manifest(models_dir, version="1.1.0")
+    registry.check_for_updates()
+
+    assert lifecycle.get('detector')['rice'].version == "1.1.0"
@@ -0,0 +1,115 @@
+"""
+Near-duplicate index: perceptual hashes that survive re-encoding and resizing,
+and an index that only reuses confident, fresh results from the same namespace
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from PIL import Image  # noqa: E402
+
+from services import near_duplicate  # noqa: E402
+from services.near_duplicate import (  # noqa: E402
+    NearDuplicateIndex, NearDuplicateStats, hamming_distance, perceptual_hash
+)
+
+
+def leaf(seed: int, size: int = 256) -> Image.Image:
+    """Smooth random texture, distinct per seed"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize((size, size), Image.BICUBIC)
+
+
+def jpeg(image: Image.Image, quality: int = 70) -> Image.Image:
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer).convert("RGB")
+
+
+@pytest.mark.parametrize("method", ["dhash", "phash"])
+def test_hash_is_stable_under_reencoding_and_resizing(method):
+    original = leaf(1)
+    same = perceptual_hash(original, method)
+    assert hamming_distance(same, perceptual_hash(jpeg(original), method)) <= 6
+    assert hamming_distance(same, perceptual_hash(original.resize((180, 180)), method)) <= 6
+    assert hamming_distance(same, perceptual_hash(leaf(2), method)) > 6
+
+
+def confident(prediction: str, confidence: float = 0.9):
+    return {'success': True, 'prediction': prediction, 'confidence': confidence}
+
+
+def test_nearest_confident_result_is_reused():
+    index = NearDuplicateIndex(max_entries=8, max_distance=6)
+    image = leaf(1)
+    index.add("disease:v1", index.hash(image), confident("blight"), inference_ms=120)
+
+    assert index.lookup("disease:v1", index.hash(jpeg(image))) == confident("blight")
+    assert index.lookup("disease:v1", index.hash(leaf(2))) is None
+    snapshot = index.snapshot()
+    assert (snapshot['lookups'], snapshot['hits'], snapshot['inserts']) == (2, 1, 1)
+    assert snapshot['compute_saved_ms'] == 120.0
+
+
+def test_uncertain_or_failed_results_are_not_stored():
+    index = NearDuplicateIndex(max_entries=8, min_confidence=0.6)
+    image_hash = index.hash(leaf(1))
+    index.add("disease:v1", image_hash, confident("blight", confidence=0.4))
+    index.add("disease:v1", image_hash, {'success': False, 'error': "model unavailable"})
+
+    assert index.lookup("disease:v1", image_hash) is None
+    assert index.snapshot()['inserts'] == 0
+
+
+def test_namespaces_keep_models_and_versions_apart():
+    index = NearDuplicateIndex(max_entries=8)
+    image_hash = index.hash(leaf(1))
+    index.add("disease:v1", image_hash, confident("blight"))
+
+    assert index.lookup("disease:v2", image_hash) is None
+    assert index.lookup("pest:v1", image_hash) is None
+
+
+def test_entries_expire_and_oldest_slots_are_overwritten(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(near_duplicate.time, 'monotonic', lambda: clock[0])
+    index = NearDuplicateIndex(max_entries=2, max_distance=0, ttl_seconds=60)
+    hashes = [index.hash(leaf(seed)) for seed in range(3)]
+    for seed, image_hash in enumerate(hashes):
+        index.add("disease:v1", image_hash, confident(f"leaf{seed}"))
+
+    assert index.lookup("disease:v1", hashes[0]) is None  # Overwritten by the third
+    assert index.lookup("disease:v1", hashes[2]) == confident("leaf2")
+    clock[0] += 61
+    assert index.lookup("disease:v1", hashes[2]) is None
+
+
+def test_zero_entries_disables_the_index():
+    index = NearDuplicateIndex(max_entries=0)
+    index.add("disease:v1", 123, confident("blight"))
+    assert not index.enabled
+    assert index.lookup("disease:v1", 123) is None
+
+
+def test_shared_stats_total_every_index():
+    totals = NearDuplicateStats()
+    sessions = [NearDuplicateIndex(max_entries=4, shared_stats=totals) for _ in range(2)]
+    for session in sessions:
+        image_hash = session.hash(leaf(1))
+        session.add("disease:v1", image_hash, confident("blight"))
+        session.lookup("disease:v1", image_hash)
+
+    assert totals.snapshot()['hits'] == 2
+    assert totals.snapshot()['inserts'] == 2
@@ -0,0 +1,95 @@
+"""
+Detection result cache: content-addressed keys, LRU and TTL bounds, and version
+tags that change when a model file is replaced
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import io
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from PIL import Image  # noqa: E402
+
+from services import result_cache  # noqa: E402
+from services.result_cache import DetectionResultCache, image_digest, model_version  # noqa: E402
+
+
+def reencoded(image: Image.Image, format: str) -> Image.Image:
+    buffer = io.BytesIO()
+    image.save(buffer, format)
+    buffer.seek(0)
+    return Image.open(buffer).convert("RGB")
+
+
+def test_digest_follows_pixels_not_encoding():
+    image = Image.new('RGB', (32, 32), (10, 120, 30))
+    assert image_digest(image) == image_digest(reencoded(image, 'PNG')) == image_digest(reencoded(image, 'BMP'))
+
+    other = image.copy()
+    other.putpixel((0, 0), (11, 120, 30))
+    assert image_digest(other) != image_digest(image)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = DetectionResultCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the oldest
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'monotonic', lambda: clock[0])
+    cache = DetectionResultCache(max_entries=8, ttl_seconds=60)
+    cache.put('key', {'success': True})
+
+    clock[0] += 59
+    assert cache.get('key') == {'success': True}
+    clock[0] += 2
+    assert cache.get('key') is None
+    assert cache.stats()['entries'] == 0
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+
+def test_zero_entries_disables_the_cache():
+    cache = DetectionResultCache(max_entries=0)
+    cache.put('key', 1)
+    assert not cache.enabled
+    assert cache.get('key') is None
+    assert cache.stats()['misses'] == 0
+
+
+def test_keys_separate_kind_and_version():
+    keys = {
+        DetectionResultCache.make_key(kind, version, "digest")
+        for kind in ('disease', 'pest') for version in ('v1', 'v2')
+    }
+    assert len(keys) == 4
+
+
+def test_model_version_changes_when_a_file_is_replaced(tmp_path):
+    checkpoint = tmp_path / "rice_resnet50.pth"
+    checkpoint.write_bytes(b"weights")
+    before = model_version(checkpoint, extra="eager")
+
+    assert model_version(checkpoint, extra="eager") == before
+    assert model_version(checkpoint, extra="onnx") != before
+
+    checkpoint.write_bytes(b"retrained weights")
+    stat = checkpoint.stat()
+    os.utime(checkpoint, (stat.st_atime, stat.st_mtime + 5))
+    assert model_version(checkpoint, extra="eager") != before
+
+    checkpoint.unlink()
+    assert model_version(checkpoint, extra="eager") != before
@@ -0,0 +1,67 @@
+"""
+Thread autotuning: a profile tuned the way the server tunes it must resolve to a
+layout for the server's own worker count and model streams
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services import thread_tuning  # noqa: E402
+
+
+@pytest.fixture
+def fake_host(monkeypatch):
+    """Default environment on a fixed 8-core host, with layouts 'measured' instantly"""
+    for name in ('PARALLEL_MODELS', 'WEB_CONCURRENCY', 'TORCH_THREADS_PER_MODEL'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(thread_tuning, 'available_cores', lambda: 8)
+    monkeypatch.setattr(thread_tuning, 'host_fingerprint', lambda: 'test-host')
+
+    def measure_layout(layout, seconds, interop_threads=1, input_size=224):
+        busy = layout['workers'] * layout['streams'] * layout['threads']
+        return {**layout, 'interop_threads': interop_threads,
+                'images_per_second': float(min(busy, 8) - max(0, busy - 8)), 'p50_ms': 50.0, 'p95_ms': 80.0}
+
+    monkeypatch.setattr(thread_tuning, 'measure_layout', measure_layout)
+
+
+def test_default_streams_match_parallel_models(monkeypatch):
+    monkeypatch.delenv('PARALLEL_MODELS', raising=False)
+    assert thread_tuning.serving_streams() == 3
+    monkeypatch.setenv('PARALLEL_MODELS', '0')
+    assert thread_tuning.serving_streams() == 1
+
+
+def test_fresh_profile_resolves_under_default_env(fake_host, tmp_path):
+    # No streams given: tuning must default to the shape the server looks up
+    profile = thread_tuning.ensure_profile(tmp_path / "thread_profile.json", seconds=0.01)
+    streams = thread_tuning.serving_streams()
+
+    tuned = thread_tuning.threads_for(profile, 1, streams)
+    assert tuned is not None
+    assert tuned['workers'] == 1 and tuned['streams'] == streams
+    # Saved and reloaded, as the other uvicorn workers will see it
+    assert thread_tuning.threads_for(thread_tuning.load_profile(tmp_path / "thread_profile.json"), 1, streams)
+
+
+def test_configure_torch_threads_applies_fresh_profile(fake_host, tmp_path, monkeypatch):
+    pytest.importorskip("torch")
+    import model_loader
+
+    real_ensure_profile = thread_tuning.ensure_profile
+    monkeypatch.setattr(model_loader, 'THREAD_AUTOTUNE', True)
+    monkeypatch.setattr(model_loader, 'ensure_profile',
+                        lambda **options: real_ensure_profile(tmp_path / "thread_profile.json",
+                                                              seconds=0.01, **options))
+
+    model_loader.configure_torch_threads()
+    assert model_loader.thread_settings['source'] == 'profile'
+    assert model_loader.thread_settings['streams'] == model_loader.MODEL_STREAMS
@@ -0,0 +1,80 @@
+"""
+Upload spooling: bodies are bounded while they stream in, kept in memory when
+small and spilled to a temp file past the threshold
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.upload_spool import UploadTooLargeError, spool_body, upload_chunks  # noqa: E402
+
+
+class CountingBody:
+    """Async chunk source that records how much of it was consumed"""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.consumed = 0
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+
+def spool(chunks, **limits):
+    return asyncio.run(spool_body(chunks.__aiter__(), **limits))
+
+
+def test_small_body_stays_in_memory():
+    body = spool(CountingBody([b"abc", b"def"]), max_bytes=100, max_memory=10)
+    assert isinstance(body, memoryview)
+    assert bytes(body) == b"abcdef"
+
+
+def test_large_body_spills_to_a_rewound_file():
+    body = spool(CountingBody([b"a" * 6, b"b" * 6, b"c" * 6]), max_bytes=100, max_memory=10)
+    try:
+        assert not isinstance(body, memoryview)
+        assert body.read() == b"a" * 6 + b"b" * 6 + b"c" * 6
+    finally:
+        body.close()
+
+
+@pytest.mark.parametrize("max_memory", [1000, 10])
+def test_oversized_body_is_rejected_while_streaming(max_memory):
+    body = CountingBody([b"x" * 10] * 10)
+    with pytest.raises(UploadTooLargeError):
+        spool(body, max_bytes=25, max_memory=max_memory)
+    assert body.consumed == 3  # Stopped at the chunk that crossed the limit
+
+
+def test_declared_length_is_checked_before_reading():
+    body = CountingBody([b"x"])
+    with pytest.raises(UploadTooLargeError, match="500 bytes"):
+        spool(body, max_bytes=100, max_memory=100, content_length=500)
+    assert body.consumed == 0
+
+
+def test_upload_chunks_reads_until_empty():
+    class Upload:
+        def __init__(self, data):
+            self.data = data
+
+        async def read(self, size):
+            chunk, self.data = self.data[:size], self.data[size:]
+            return chunk
+
+    async def run():
+        return [chunk async for chunk in upload_chunks(Upload(b"abcdefg"), chunk_size=3)]
+
+    assert asyncio.run(run()) == [b"abc", b"def", b"g"]
@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import time
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torch.optim as optim
+from torchvision import datasets, models, transforms
+from torch.utils.data import DataLoader
+
+# Knowledge distillation of the ResNet50 disease models into small students for
+# the backend's fast tier (DETECTION_TIER=fast). The student learns from the
+# teacher's softened outputs plus the true labels, on the same organized dataset
+# and the same preprocessing as its teacher, so the backend can hand the same
+# tensor to either. Writes the student checkpoint, its manifest
+# (<crop>_fast.json, with the accuracy delta vs the teacher) and a report.
+#
+#   python distill_student.py --crop rice
+#   python distill_student.py --crop plantdoc --student efficientnet_b0 --epochs 15
+#
+# Copy the .pth and the manifest to models/ and models/manifests/.
+
+# ============================== PATHS ==============================
+DATASET_DIRS = {
+    "maize":    ("Maize_Organized/train",    "Maize_Organized/val"),
+    "plantdoc": ("PlantDoc_Organized/train", "PlantDoc_Organized/val"),
+    "rice":     (r"C:\Users\admin\Desktop\Models\Rice_Organized\train",
+                 r"C:\Users\admin\Desktop\Models\Rice_Organized\val"),
+}
+MANIFEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "manifests")
+TEACHER_DIRS = ["exported_model", os.path.join(MANIFEST_DIR, "..")]
+EXPORT_DIR = "exported_model"
+
+os.makedirs(EXPORT_DIR, exist_ok=True)
+
+# Escalation thresholds tried on the validation split; the manifest gets the
+# lowest one whose cascade accuracy is within --max-accuracy-drop of the teacher
+THRESHOLDS = [0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+
+# ============================ ARGUMENTS ============================
+parser = argparse.ArgumentParser(description="Distill a disease model into a fast-tier student")
+parser.add_argument("--crop", choices=sorted(DATASET_DIRS), required=True)
+parser.add_argument("--student", choices=["mobilenet_v3_large", "mobilenet_v3_small", "efficientnet_b0"],
+                    default="mobilenet_v3_large")
+parser.add_argument("--epochs", type=int, default=12)
+parser.add_argument("--batch-size", type=int, default=32)
+parser.add_argument("--lr", type=float, default=0.001)
+parser.add_argument("--temperature", type=float, default=4.0, help="Softening of teacher and student logits")
+parser.add_argument("--alpha", type=float, default=0.7, help="Weight of the distillation loss vs the label loss")
+parser.add_argument("--max-accuracy-drop", type=float, default=0.005)
+parser.add_argument("--version", default="1.0.0")
+args = parser.parse_args()
+
+with open(os.path.join(MANIFEST_DIR, f"{args.crop}.json"), encoding="utf-8") as f:
+    teacher_manifest = json.load(f)
+
+# ========================== DATA AUGMENTATION ======================
+# The teacher's preprocessing (input size, normalization) is kept as is
+input_size = teacher_manifest["transform"]["input_size"]
+normalize = teacher_manifest["transform"].get("normalize")
+if normalize == "imagenet":
+    normalize = {"mean": [0.485, 0.456, 0.406], "std": [0.229, 0.224, 0.225]}
+to_input = [transforms.ToTensor()]
+if normalize is not None:
+    to_input.append(transforms.Normalize(normalize["mean"], normalize["std"]))
+
+train_transform = transforms.Compose([
+    transforms.Resize((input_size, input_size)),
+    transforms.RandomHorizontalFlip(),
+    transforms.RandomRotation(15),
+    transforms.ColorJitter(brightness=0.3, contrast=0.3, saturation=0.3),
+    *to_input,
+])
+
+val_transform = transforms.Compose([
+    transforms.Resize((input_size, input_size)),
+    *to_input,
+])
+
+# ============================= LOAD DATA ============================
+train_dir, val_dir = DATASET_DIRS[args.crop]
+train_data = datasets.ImageFolder(train_dir, transform=train_transform)
+val_data   = datasets.ImageFolder(val_dir, transform=val_transform)
+
+# ImageFolder sorts class folders, as the teachers were trained; check anyway
+classes = teacher_manifest["classes"]
+if train_data.classes != classes:
+    raise SystemExit(f"Dataset classes {train_data.classes} do not match the {args.crop} manifest")
+
+train_loader = DataLoader(train_data, batch_size=args.batch_size, shuffle=True)
+val_loader   = DataLoader(val_data, batch_size=args.batch_size, shuffle=False)
+
+print("\nClasses:", classes)
+print("Train Images:", len(train_data))
+print("Val Images  :", len(val_data))
+
+device = "cuda" if torch.cuda.is_available() else "cpu"
+
+# ============================= TEACHER ==============================
+def find_teacher_checkpoint():
+    for folder in TEACHER_DIRS:
+        path = os.path.join(folder, teacher_manifest["path"])
+        if os.path.exists(path):
+            return path
+    raise SystemExit(f"Teacher checkpoint {teacher_manifest['path']} not found in {TEACHER_DIRS}")
+
+teacher_path = find_teacher_checkpoint()
+if teacher_manifest.get("checkpoint_format") == "full_module":
+    teacher = torch.load(teacher_path, map_location=device, weights_only=False)
+else:
+    teacher = models.resnet50(weights=None)
+    teacher.fc = nn.Linear(teacher.fc.in_features, len(classes))
+    teacher.load_state_dict(torch.load(teacher_path, map_location=device))
+teacher.to(device)
+teacher.eval()
+for param in teacher.parameters():
+    param.requires_grad = False
+
+# ============================= STUDENT ==============================
+# ImageNet-pretrained backbone, new head (same layout as the backend's ARCHITECTURES)
+if args.student == "efficientnet_b0":
+    student = models.efficientnet_b0(weights=models.EfficientNet_B0_Weights.DEFAULT)
+    student.classifier[1] = nn.Linear(student.classifier[1].in_features, len(classes))
+elif args.student == "mobilenet_v3_small":
+    student = models.mobilenet_v3_small(weights=models.MobileNet_V3_Small_Weights.DEFAULT)
+    student.classifier[3] = nn.Linear(student.classifier[3].in_features, len(classes))
+else:
+    student = models.mobilenet_v3_large(weights=models.MobileNet_V3_Large_Weights.DEFAULT)
+    student.classifier[3] = nn.Linear(student.classifier[3].in_features, len(classes))
+student.to(device)
+
+optimizer = optim.Adam(student.parameters(), lr=args.lr)
+scheduler = optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=args.epochs)
+
+def distillation_loss(student_logits, teacher_logits, labels):
+    """Hinton et al.: KL between softened outputs (scaled by T^2) plus cross-entropy on the labels"""
+    T = args.temperature
+    soft = F.kl_div(
+        F.log_softmax(student_logits / T, dim=1), F.softmax(teacher_logits / T, dim=1), reduction="batchmean"
+    ) * (T * T)
+    return args.alpha * soft + (1 - args.alpha) * F.cross_entropy(student_logits, labels)
+
+# ============================ EVALUATION ============================
+def collect_probabilities(model):
+    """Softmax outputs and labels over the validation split"""
+    model.eval()
+    probs, labels = [], []
+    with torch.no_grad():
+        for imgs, lbl in val_loader:
+            probs.append(F.softmax(model(imgs.to(device)), dim=1).cpu())
+            labels.append(lbl)
+    return torch.cat(probs), torch.cat(labels)
+
+def cpu_latency_ms(model, runs=20):
+    """Single-image CPU latency, as the backend serves it"""
+    model = model.to("cpu").eval()
+    x = torch.zeros(1, 3, input_size, input_size)
+    with torch.no_grad():
+        for _ in range(3):
+            model(x)
+        start = time.perf_counter()
+        for _ in range(runs):
+            model(x)
+    model.to(device)
+    return (time.perf_counter() - start) * 1000 / runs
+
+# ========================== TRAINING LOOP ===========================
+save_path = os.path.join(EXPORT_DIR, f"{args.crop}_{args.student}_student.pth")
+best_acc = 0
+
+print(f"\nDistilling {args.crop} ResNet50 -> {args.student} on: {device}\n")
+
+for epoch in range(1, args.epochs + 1):
+    student.train()
+    running_loss = 0
+
+    for imgs, labels in train_loader:
+        imgs, labels = imgs.to(device), labels.to(device)
+        with torch.no_grad():
+            teacher_logits = teacher(imgs)
+
+        optimizer.zero_grad()
+        loss = distillation_loss(student(imgs), teacher_logits, labels)
+        loss.backward()
+        optimizer.step()
+        running_loss += loss.item()
+    scheduler.step()
+
+    student_probs, val_labels = collect_probabilities(student)
+    val_acc = (student_probs.argmax(1) == val_labels).float().mean().item()
+    print(f"Epoch {epoch}/{args.epochs} | Loss={running_loss:.2f} | Val Acc={val_acc:.4f}")
+
+    # save best model
+    if val_acc > best_acc:
+        best_acc = val_acc
+        torch.save(student.state_dict(), save_path)
+        print(f"💾 Student Updated & Saved (Best Acc={best_acc:.4f})")
+
+# ======================= ACCURACY DELTA REPORT ======================
+student.load_state_dict(torch.load(save_path, map_location=device))
+teacher_probs, val_labels = collect_probabilities(teacher)
+student_probs, _ = collect_probabilities(student)
+
+teacher_pred = teacher_probs.argmax(1)
+student_conf, student_pred = student_probs.max(1)
+teacher_acc = (teacher_pred == val_labels).float().mean().item()
+student_acc = (student_pred == val_labels).float().mean().item()
+
+# The served cascade: the student answers, the teacher below the threshold
+cascade = []
+for threshold in THRESHOLDS:
+    escalate = student_conf < threshold
+    served = torch.where(escalate, teacher_pred, student_pred)
+    cascade.append({
+        "threshold": threshold,
+        "accuracy": round((served == val_labels).float().mean().item(), 4),
+        "escalation_rate": round(escalate.float().mean().item(), 4),
+    })
+within = [row for row in cascade if teacher_acc - row["accuracy"] <= args.max_accuracy_drop]
+chosen = within[0] if within else cascade[-1]
+
+teacher_ms = cpu_latency_ms(teacher)
+student_ms = cpu_latency_ms(student)
+report = {
+    "teacher": args.crop,
+    "student_architecture": args.student,
+    "val_images": len(val_data),
+    "teacher_accuracy": round(teacher_acc, 4),
+    "student_accuracy": round(student_acc, 4),
+    "accuracy_delta": round(student_acc - teacher_acc, 4),
+    "agreement": round((student_pred == teacher_pred).float().mean().item(), 4),
+    "cascade_accuracy": chosen["accuracy"],
+    "cascade_accuracy_delta": round(chosen["accuracy"] - teacher_acc, 4),
+    "escalation_rate": chosen["escalation_rate"],
+    "teacher_cpu_ms": round(teacher_ms, 1),
+    "student_cpu_ms": round(student_ms, 1),
+    "speedup": round(teacher_ms / student_ms, 1),
+    "cascade": cascade,
+}
+
+student_manifest = {
+    "name": f"{args.crop}_fast",
+    "display_name": teacher_manifest.get("display_name", args.crop),
+    "version": args.version,
+    "path": os.path.basename(save_path),
+    "architecture": args.student,
+    "checkpoint_format": "state_dict",
+    "kind": "disease",
+    "teacher": args.crop,
+    "escalation_threshold": chosen["threshold"],
+    "distillation": {key: value for key, value in report.items() if key != "cascade"},
+    "transform": teacher_manifest["transform"],
+    "classes": classes,
+}
+manifest_path = os.path.join(EXPORT_DIR, f"{args.crop}_fast.json")
+with open(manifest_path, "w", encoding="utf-8") as f:
+    json.dump(student_manifest, f, indent=2)
+report_path = os.path.join(EXPORT_DIR, f"{args.crop}_distillation_report.json")
+with open(report_path, "w", encoding="utf-8") as f:
+    json.dump(report, f, indent=2)
+
+print(f"\n{'':<10} {'accuracy':>9} {'CPU ms':>8}")
+print(f"{'teacher':<10} {teacher_acc:>9.4f} {teacher_ms:>8.1f}")
+print(f"{'student':<10} {student_acc:>9.4f} {student_ms:>8.1f}  (delta {student_acc - teacher_acc:+.4f})")
+print(f"\n{'threshold':>9} {'cascade acc':>12} {'delta':>8} {'escalated':>10}")
+for row in cascade:
+    mark = "  <- manifest" if row is chosen else ""
+    print(f"{row['threshold']:>9.2f} {row['accuracy']:>12.4f} {row['accuracy'] - teacher_acc:>+8.4f} "
+          f"{row['escalation_rate']:>10.1%}{mark}")
+
+print(f"\n🎉 Distillation Completed — {report['speedup']}x faster on CPU")
+print(f"📁 Student saved at: {save_path}  (copy to models/)")
+print(f"📁 Manifest saved at: {manifest_path}  (copy to models/manifests/)")
@@ -0,0 +1,117 @@
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torchvision import datasets, models, transforms
+from torch.utils.data import DataLoader, ConcatDataset
+import os
+
+# Crop-family router for MultiModelDetector: a MobileNetV3-Small that tells which
+# specialist (maize / plantdoc / rice) an image belongs to, trained on the union
+# of the three organized datasets. Label = source dataset, not the disease class.
+
+# ============================== PATHS ==============================
+FAMILY_DIRS = {
+    "maize":    ("Maize_Organized/train",    "Maize_Organized/val"),
+    "plantdoc": ("PlantDoc_Organized/train", "PlantDoc_Organized/val"),
+    "rice":     ("Rice_Organized/train",     "Rice_Organized/val"),
+}
+save_path = r"exported_model/crop_router_mobilenetv3.pth"
+
+os.makedirs("exported_model", exist_ok=True)
+
+# Families in sorted order; must match the classes in models/manifests/router.json
+families = sorted(FAMILY_DIRS)
+
+# ========================== DATA AUGMENTATION ======================
+# Same input as PlantDoc/Maize so the router shares their preprocessed tensor
+train_transform = transforms.Compose([
+    transforms.Resize((224,224)),
+    transforms.RandomHorizontalFlip(),
+    transforms.RandomRotation(15),
+    transforms.ColorJitter(brightness=0.3, contrast=0.3, saturation=0.3),
+    transforms.ToTensor(),
+    transforms.Normalize([0.485,0.456,0.406],[0.229,0.224,0.225]),
+])
+
+val_transform = transforms.Compose([
+    transforms.Resize((224,224)),
+    transforms.ToTensor(),
+    transforms.Normalize([0.485,0.456,0.406],[0.229,0.224,0.225]),
+])
+
+# ============================= LOAD DATA ============================
+def family_dataset(split, transform):
+    parts = []
+    for label, family in enumerate(families):
+        root = FAMILY_DIRS[family][0 if split == "train" else 1]
+        # Replace the disease label with the family label
+        parts.append(datasets.ImageFolder(root, transform=transform,
+                                          target_transform=lambda _, label=label: label))
+    return ConcatDataset(parts)
+
+train_data = family_dataset("train", train_transform)
+val_data   = family_dataset("val", val_transform)
+
+train_loader = DataLoader(train_data, batch_size=32, shuffle=True)
+val_loader   = DataLoader(val_data, batch_size=32, shuffle=False)
+
+print("\nFamilies:", families)
+print("Train Images:", len(train_data))
+print("Val Images  :", len(val_data))
+
+# ============================= MODEL ================================
+from torchvision.models import MobileNet_V3_Small_Weights
+
+model = models.mobilenet_v3_small(weights=MobileNet_V3_Small_Weights.DEFAULT)
+model.classifier[3] = nn.Linear(model.classifier[3].in_features, len(families))
+
+device = "cuda" if torch.cuda.is_available() else "cpu"
+model.to(device)
+
+criterion = nn.CrossEntropyLoss()
+optimizer = optim.Adam(model.parameters(), lr=0.001)
+
+# ========================== TRAINING LOOP ===========================
+epochs = 8
+best_acc = 0
+
+print(f"\nTraining on: {device}\n")
+
+for epoch in range(1, epochs+1):
+    model.train()
+    running_loss = 0
+
+    for imgs, labels in train_loader:
+        imgs, labels = imgs.to(device), labels.to(device)
+
+        optimizer.zero_grad()
+        outputs = model(imgs)
+        loss = criterion(outputs, labels)
+        loss.backward()
+        optimizer.step()
+        running_loss += loss.item()
+
+    # ------------------ VALIDATION ------------------
+    model.eval()
+    correct = 0
+    total = 0
+
+    with torch.no_grad():
+        for imgs, labels in val_loader:
+            imgs, labels = imgs.to(device), labels.to(device)
+            outputs = model(imgs)
+            _, predicted = outputs.max(1)
+            total += labels.size(0)
+            correct += (predicted == labels).sum().item()
+
+    val_acc = correct / total
+    print(f"Epoch {epoch}/{epochs} | Loss={running_loss:.2f} | Val Acc={val_acc:.4f}")
+
+    # save best model
+    if val_acc > best_acc:
+        best_acc = val_acc
+        torch.save(model.state_dict(), save_path)
+        print(f"💾 Model Updated & Saved (Best Acc={best_acc:.4f})")
+
+print(f"\n🎉 Training Completed — Best Accuracy: {best_acc:.4f}")
+print(f"📁 Model saved at: {save_path}  (copy to models/crop_router_mobilenetv3.pth)")
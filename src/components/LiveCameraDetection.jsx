@@ -3,12 +3,77 @@ import React, { useRef, useState, useEffect } from 'react';
 import Webcam from 'react-webcam';
 import { Camera, X, Pause, Play, Loader2 } from 'lucide-react';
 
-export default function LiveCameraDetection({ onDetection, detectionMode = 'both', detectionInterval = 3000 }) {
+const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+const STREAM_URL = `${API_BASE_URL.replace(/^http/, 'ws')}/ws/detect-disease`;
+
+export default function LiveCameraDetection({
+    onDetection,
+    onResult,
+    detectionMode = 'both',
+    detectionInterval = 3000,
+    frameInterval = 500,
+    streamUrl = STREAM_URL
+}) {
     const webcamRef = useRef(null);
     const [isActive, setIsActive] = useState(false);
     const [isPaused, setIsPaused] = useState(false);
     const [isDetecting, setIsDetecting] = useState(false);
+    const [isStreaming, setIsStreaming] = useState(false);
     const intervalRef = useRef(null);
+    const socketRef = useRef(null);
+
+    // Streaming: send binary JPEG frames over a WebSocket. The server analyses only
+    // the newest frame, so a frame is sent only once the previous one has left the
+    // socket buffer. Falls back to HTTP polling when the socket cannot connect.
+    const sendFrame = () => {
+        const socket = socketRef.current;
+        if (!webcamRef.current || !socket || socket.readyState !== WebSocket.OPEN || socket.bufferedAmount > 0) return;
+
+        const canvas = webcamRef.current.getCanvas();
+        if (!canvas) return;
+        canvas.toBlob((blob) => {
+            if (blob && socket.readyState === WebSocket.OPEN) {
+                socket.send(blob);
+            }
+        }, 'image/jpeg', 0.8);
+    };
+
+    const startStreaming = () => {
+        let opened = false;
+        const socket = new WebSocket(streamUrl);
+        socketRef.current = socket;
+
+        socket.onopen = () => {
+            opened = true;
+            setIsStreaming(true);
+            intervalRef.current = setInterval(sendFrame, frameInterval);
+        };
+        socket.onmessage = (event) => {
+            const result = JSON.parse(event.data);
+            if (result.success && onResult) {
+                onResult(result);
+            }
+        };
+        socket.onclose = () => {
+            setIsStreaming(false);
+            if (intervalRef.current) {
+                clearInterval(intervalRef.current);
+            }
+            if (!opened && socketRef.current === socket) {
+                // Streaming unavailable: poll the HTTP endpoint instead
+                socketRef.current = null;
+                startPolling();
+            }
+        };
+    };
+
+    const stopStreaming = () => {
+        if (socketRef.current) {
+            const socket = socketRef.current;
+            socketRef.current = null;
+            socket.close();
+        }
+    };
 
     // Capture and send frame for detection
     const captureAndDetect = () => {
@@ -23,22 +88,31 @@ export default function LiveCameraDetection({ onDetection, detectionMode = 'both
         }
     };
 
+    const startPolling = () => {
+        // Initial detection
+        captureAndDetect();
+
+        // Set up interval for continuous detection
+        intervalRef.current = setInterval(captureAndDetect, detectionInterval);
+    };
+
     // Start continuous detection
     useEffect(() => {
         if (isActive && !isPaused) {
-            // Initial detection
-            captureAndDetect();
-
-            // Set up interval for continuous detection
-            intervalRef.current = setInterval(captureAndDetect, detectionInterval);
+            if (onResult) {
+                startStreaming();
+            } else {
+                startPolling();
+            }
         }
 
         return () => {
+            stopStreaming();
             if (intervalRef.current) {
                 clearInterval(intervalRef.current);
             }
         };
-    }, [isActive, isPaused, detectionInterval]);
+    }, [isActive, isPaused, detectionInterval, frameInterval]);
 
     const togglePause = () => {
         setIsPaused(!isPaused);
@@ -47,6 +121,7 @@ export default function LiveCameraDetection({ onDetection, detectionMode = 'both
     const stopCamera = () => {
         setIsActive(false);
         setIsPaused(false);
+        stopStreaming();
         if (intervalRef.current) {
             clearInterval(intervalRef.current);
         }
@@ -101,6 +176,12 @@ export default function LiveCameraDetection({ onDetection, detectionMode = 'both
                 />
 
                 {/* Detection indicator */}
+                {isStreaming && !isPaused && (
+                    <div className="absolute top-4 right-4 bg-green-600 text-white px-3 py-2 rounded-lg flex items-center">
+                        <span className="w-2 h-2 bg-white rounded-full animate-pulse mr-2" />
+                        Live
+                    </div>
+                )}
                 {isDetecting && (
                     <div className="absolute top-4 right-4 bg-blue-600 text-white px-3 py-2 rounded-lg flex items-center">
                         <Loader2 className="w-4 h-4 animate-spin mr-2" />
@@ -140,7 +221,11 @@ export default function LiveCameraDetection({ onDetection, detectionMode = 'both
             </div>
 
             <div className="mt-4 text-sm text-gray-600">
-                <p>• Detection runs every {detectionInterval / 1000} seconds</p>
+                <p>
+                    {isStreaming
+                        ? '• Streaming live: results update as frames are analysed'
+                        : `• Detection runs every ${detectionInterval / 1000} seconds`}
+                </p>
                 <p>• Mode: Disease Detection</p>
             </div>
         </div>
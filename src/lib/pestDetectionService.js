@@ -13,17 +13,18 @@ class DiseaseDetectionService {
 
     /**
      * Detect disease in an image
-     * @param {string} imageBase64 - Base64 encoded image
+     * @param {string|Blob} image - Base64 data URL or an image Blob/File
      * @returns {Promise<Object>} Detection result
      */
-    async detectDisease(imageBase64) {
+    async detectDisease(image) {
         try {
-            const formData = new FormData();
-            formData.append('image_base64', imageBase64);
+            // Send the encoded image as the raw request body (no base64 or multipart overhead)
+            const blob = typeof image === 'string' ? await (await fetch(image)).blob() : image;
 
             const response = await fetch(`${API_BASE_URL}/detect-disease`, {
                 method: 'POST',
-                body: formData,
+                headers: { 'Content-Type': blob.type || 'application/octet-stream' },
+                body: blob,
             });
 
             if (!response.ok) {
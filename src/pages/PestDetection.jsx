@@ -71,6 +71,16 @@ export default function DiseaseDetection() {
         return analyzeImage(imageData);
     };
 
+    // Streamed live results: show the temporally smoothed prediction without
+    // saving every frame to history
+    const handleLiveResult = (analysis) => {
+        setResult({
+            ...analysis,
+            prediction: analysis.smoothed_prediction || analysis.prediction,
+            confidence: analysis.smoothed_confidence ?? analysis.confidence
+        });
+    };
+
     const getTreatmentRecommendations = async () => {
         if (!result || !result.prediction) {
             console.error('No result or prediction available');
@@ -313,6 +323,7 @@ export default function DiseaseDetection() {
                     ) : (
                         <LiveCameraDetection
                             onDetection={handleLiveDetection}
+                            onResult={handleLiveResult}
                             detectionMode="disease"
                             detectionInterval={3000}
                         />